@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Agent, AgentProfile
+from .models import Agent, AgentProfile, AgentPolicySale
 
 
 @admin.register(Agent)
@@ -24,3 +24,9 @@ class AgentProfileAdmin(admin.ModelAdmin):
     get_agent_profile_picture_url.short_description = 'agent_profile_picture'
     get_agent_first_name.short_description = 'agent_first_name'
     get_agent_last_name.short_description = 'agent_last_name'
+
+
+@admin.register(AgentPolicySale)
+class AgentPolicySaleAdmin(admin.ModelAdmin):
+    list_display = ('quote_code', 'merchant_code', 'product', 'product_type', 'premium', 'sold_at')
+    search_fields = ('quote_code', 'merchant_code', 'superpool_policy_id')
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0002_agent_merchant_code_agent_tenant_id'),
+        ('insurer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgentPolicySale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product', models.CharField(choices=[('Travel', 'Travel'), ('Motor', 'Motor'), ('Shipment', 'Shipment')], help_text='Sell endpoint the sale came through', max_length=20)),
+                ('product_type', models.CharField(blank=True, default='', max_length=100)),
+                ('quote_code', models.CharField(help_text='Superpool quote the policy was sold from', max_length=100)),
+                ('merchant_code', models.CharField(help_text='Agent merchant code at the time of sale', max_length=20)),
+                ('superpool_policy_id', models.CharField(blank=True, default='', help_text='Policy id on Superpool', max_length=100)),
+                ('premium', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True)),
+                ('sold_at', models.DateTimeField(auto_now_add=True)),
+                ('agent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='policy_sales', to='agents.agent')),
+                ('insurer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agent_policy_sales', to='insurer.insurer')),
+            ],
+            options={
+                'verbose_name': 'AGENT POLICY SALE',
+                'verbose_name_plural': 'AGENT POLICY SALES',
+            },
+        ),
+    ]
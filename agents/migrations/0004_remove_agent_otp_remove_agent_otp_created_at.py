@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0003_agentpolicysale'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='agent',
+            name='otp',
+        ),
+        migrations.RemoveField(
+            model_name='agent',
+            name='otp_created_at',
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agents', '0004_remove_agent_otp_remove_agent_otp_created_at'),
+        ('insurer', '0005_indexes_and_constraints'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agent',
+            index=models.Index(fields=['affiliated_company', 'user'], name='agent_company_user_idx'),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django_resized import ResizedImageField
 from django.db import models
 from django.conf import settings
 
+from user.models import PrincipalQuerySet
+
 
 class Agent(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -21,12 +23,16 @@ class Agent(models.Model):
     affiliated_company = models.ForeignKey('insurer.Insurer', on_delete=models.CASCADE, null=False, blank=True)
     unyte_unique_agent_id = models.CharField(max_length=70, unique=True, null=False, blank=False)
     agent_gamp_id = models.CharField(default='', blank=True, help_text='GAMP ID for users associated with GAMP')
-    otp = models.CharField(unique=True, max_length=6, blank=True, null=True)
-    otp_created_at = models.TimeField(blank=True, null=True)
+
+    objects = PrincipalQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'AGENT'
         verbose_name_plural = 'AGENTS'
+        indexes = [
+            # An insurer's agents, and their user ids when the insurer's cached principals are invalidated.
+            models.Index(fields=['affiliated_company', 'user'], name='agent_company_user_idx'),
+        ]
 
     def __str__(self):
         return f'{self.first_name}: {self.affiliated_company.business_name}'
@@ -43,3 +49,28 @@ class AgentProfile(models.Model):
     def __str__(self):
         return f'{self.agent} Profile'
 
+
+
+class AgentPolicySale(models.Model):
+    PRODUCT_CHOICES = (
+        ('Travel', 'Travel'),
+        ('Motor', 'Motor'),
+        ('Shipment', 'Shipment'),
+    )
+
+    agent = models.ForeignKey(Agent, on_delete=models.CASCADE, related_name='policy_sales')
+    insurer = models.ForeignKey('insurer.Insurer', on_delete=models.CASCADE, related_name='agent_policy_sales')
+    product = models.CharField(max_length=20, choices=PRODUCT_CHOICES, help_text='Sell endpoint the sale came through')
+    product_type = models.CharField(max_length=100, default='', blank=True)
+    quote_code = models.CharField(max_length=100, help_text='Superpool quote the policy was sold from')
+    merchant_code = models.CharField(max_length=20, help_text='Agent merchant code at the time of sale')
+    superpool_policy_id = models.CharField(max_length=100, default='', blank=True, help_text='Policy id on Superpool')
+    premium = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+    sold_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'AGENT POLICY SALE'
+        verbose_name_plural = 'AGENT POLICY SALES'
+
+    def __str__(self):
+        return f'{self.agent.first_name}: {self.quote_code}'
@@ -13,10 +13,17 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError, AuthenticationFailed
 
 from user.models import CustomUser
+from user.uniqueness import conflict_error, conflicting_fields
 
 from .utils import CustomValidationError
 from .models import Agent
 
+AGENT_CONFLICT_MESSAGES = {
+    'email': 'Email already exists!',
+    'home_address': 'Home address already exists',
+    'bvn': 'bvn already exists',
+    'bank_account': 'bank_account already exists',
+}
 
 class CreateAgentSerializer(serializers.Serializer):
     first_name = serializers.CharField(
@@ -85,18 +92,16 @@ class CreateAgentSerializer(serializers.Serializer):
         #     if Agent.objects.filter(email=email).exists():
         #         raise CustomValidationError({"error": "Email already exists"})
 
-        if CustomUser.objects.filter(email=email).exists():
-            # print(CustomUser.)
-            raise CustomValidationError({'error': 'Email already exists!'})
-
-        if Agent.objects.filter(home_address=home_address).exists():
-            raise CustomValidationError({'error': 'Home address already exists'})
-
-        if Agent.objects.filter(bvn=bvn).exists():
-            raise CustomValidationError({'error': 'bvn already exists'})
-
-        if Agent.objects.filter(bank_account=bank_account).exists():
-            raise CustomValidationError({'error': 'bank_account already exists'})
+        conflicts = conflicting_fields(
+            {
+                'email': CustomUser.objects.filter(email=email),
+                'home_address': Agent.objects.filter(home_address=home_address),
+                'bvn': Agent.objects.filter(bvn=bvn),
+                'bank_account': Agent.objects.filter(bank_account=bank_account),
+            }
+        )
+        if conflicts:
+            raise CustomValidationError(conflict_error(conflicts, AGENT_CONFLICT_MESSAGES))
 
         #     return attrs
         #
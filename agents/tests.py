@@ -1,13 +1,25 @@
+import uuid
 import urllib.parse
+from unittest import mock
 
+from rest_framework import serializers
+
+from django.db import connection
 from django.test import TestCase
+from django.core.cache import cache
 from django.urls import reverse
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
-from insurer.models import Insurer
+from django.test.utils import CaptureQueriesContext
+from insurer.models import Insurer, InvitedAgents
 from user.models import CustomUser
+from user.testing import INSURER_ID, jwt_client, create_agent, create_insurer
+from superpool_proxy.testing import SuperpoolStub
+from superpool_proxy.async_superpool_client import AsyncSuperpoolClient
+from . import views
+from .utils import CustomValidationError
 from .models import Agent
-import urllib.parse
+from .serializer import CreateAgentSerializer
 
 
 class AgentAppTestCase(TestCase):
@@ -57,3 +69,159 @@ class AgentAppTestCase(TestCase):
         insurer = get_object_or_404(Insurer, user=user)
         insurer_uuid = insurer.unyte_unique_insurer_id
         print(route + '?' + urllib.parse.urlencode({'invite': insurer_uuid}))
+
+
+class AgentSignUpTestCase(TestCase):
+    """
+    Sign-up checks for conflicts with one query and for the invite with one indexed lookup, so its query
+    count does not grow with the insurer's invitations.
+    """
+
+    SUPERPOOL_MERCHANT = {'data': {'short_code': 'MER-12345', 'tenant_id': '9249517e-3db5-4e8c-8ffd-28839ea8d815'}}
+
+    def setUp(self) -> None:
+        stub = SuperpoolStub({('POST', '/merchants/'): (201, self.SUPERPOOL_MERCHANT)}).__enter__()
+        self.addCleanup(stub.__exit__)
+        patcher = mock.patch('agents.utils.SUPERPOOL_BACKEND_URL', stub.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def payload(email: str, number: str) -> dict:
+        return {
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'middle_name': 'Jane',
+            'home_address': f'{number} john doe lane',
+            'email': email,
+            'bank_account': f'{number:0>10}',
+            'bvn': f'{number:0>11}',
+            'password': 'testing321',
+        }
+
+    def sign_up(self, insurer: Insurer, email: str, number: str):
+        query = urllib.parse.urlencode({'invite': insurer.unyte_unique_insurer_id})
+        route = f"{reverse('agents:register-agent')}?{query}"
+        return self.client.post(route, self.payload(email, number), content_type='application/json')
+
+    def count_sign_up_queries(self, insurer: Insurer, email: str, number: str) -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.sign_up(insurer, email, number)
+        self.assertEqual(response.status_code, 201, response.content)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_invitations(self) -> None:
+        small = create_insurer()
+        InvitedAgents.objects.create(insurer=small, agent_email='one@example.com')
+        large = create_insurer(
+            'large@example.com',
+            insurer_id=uuid.uuid4(),
+            business_name='Large',
+            business_registration_number='87654321',
+            unyte_unique_insurer_id='Large+4321+unyte.com',
+        )
+        InvitedAgents.objects.bulk_create(
+            InvitedAgents(insurer=large, agent_email=f'agent{number}@example.com') for number in range(500)
+        )
+
+        self.assertEqual(
+            self.count_sign_up_queries(small, 'one@example.com', '1'),
+            self.count_sign_up_queries(large, 'agent7@example.com', '2'),
+        )
+
+    def test_uninvited_email_is_rejected(self) -> None:
+        response = self.sign_up(create_insurer(), 'stranger@example.com', '1')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CustomUser.objects.filter(email='stranger@example.com').exists())
+
+    def test_every_conflict_is_reported_with_one_query(self) -> None:
+        insurer = create_insurer()
+        create_agent(insurer, 'taken@example.com', bvn='12345678901')
+        serializer = CreateAgentSerializer(data={**self.payload('taken@example.com', '2'), 'bvn': '12345678901'})
+
+        with self.assertNumQueries(1), self.assertRaises(CustomValidationError) as raised:
+            serializer.is_valid()
+        self.assertEqual(raised.exception.detail['conflicts'], ['email', 'bvn'])
+        self.assertEqual(raised.exception.detail['error'], 'Email already exists!, bvn already exists')
+
+
+def example_payload(serializer: serializers.Serializer) -> dict:
+    """
+    A request body built from the example defaults the policy serializers carry for Swagger.
+    """
+    payload = {}
+    for name, field in serializer.fields.items():
+        if isinstance(field, serializers.Serializer):
+            payload[name] = example_payload(field)
+        elif field.default is not serializers.empty:
+            payload[name] = field.default
+        elif isinstance(field, serializers.DateField):
+            payload[name] = '2025-01-01'
+        elif isinstance(field, serializers.DictField):
+            payload[name] = {}
+        elif isinstance(field, serializers.EmailField):
+            payload[name] = 'customer@example.com'
+        else:
+            payload[name] = '1'
+    return payload
+
+
+class AgentEndpointQueryCountTestCase(TestCase):
+    """
+    The agent and its insurer are resolved once per token, so after the first request these endpoints only
+    run the queries of their own work.
+    """
+
+    DASHBOARD = f'/dashboard/insurers/{INSURER_ID}'
+    QUOTES = [{'provider': 'Unyte', 'product': 'Travel Basic', 'premium': '2500.00'}]
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.agent = create_agent(create_insurer())
+        self.client = jwt_client(self.agent.user)
+        routes = {
+            ('GET', f'{self.DASHBOARD}/products'): (200, [{'id': 1, 'name': 'Travel Basic'}]),
+            ('GET', f'{self.DASHBOARD}/policies'): (200, [{'id': 'pol_1'}]),
+            ('GET', f'{self.DASHBOARD}/claims'): (200, [{'id': 'clm_1'}]),
+            ('POST', '/quotes'): (200, {'data': self.QUOTES}),
+            ('POST', '/policies'): (201, {'data': {'id': 'pol_2', 'premium': '2500.00'}}),
+        }
+        stub = SuperpoolStub(routes).__enter__()
+        self.addCleanup(stub.__exit__)
+        client = AsyncSuperpoolClient(base_url=stub.url, cache=None, quote_cache=None)
+        patcher = mock.patch.object(views, 'SUPERPPOOL_HANDLER', client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertQueriesPerRequest(self, method: str, route: str, queries: int, data=None, status_code=200):  # noqa: N802
+        getattr(self.client, method)(route, data, format='json')
+        with self.assertNumQueries(queries):
+            response = getattr(self.client, method)(route, data, format='json')
+        self.assertEqual(response.status_code, status_code, response.content)
+
+    def test_dashboards(self) -> None:
+        for route in ('products', 'policies', 'claims'):
+            self.assertQueriesPerRequest('get', f'/api/agent/{route}', 0)
+
+    def test_quotes(self) -> None:
+        serializers_by_product = {
+            'travel': views.TravelPolicySerializer,
+            'gadget': views.GadgetPolicySerializer,
+            'motor': views.MotorPolicySerializer,
+            'bike': views.BikePolicySerializer,
+            'shipment': views.ShipmentPolicySerializer,
+        }
+        for product, serializer in serializers_by_product.items():
+            data = example_payload(serializer())
+            self.assertQueriesPerRequest('post', f'/api/agent/quotes/{product}/Travel Basic', 0, data)
+
+    def test_sales_only_record_the_sale(self) -> None:
+        serializers_by_product = {
+            'travel': views.SellTravelPolicySerializer,
+            'shipment': views.SellShipmentPolicySerializer,
+            'motor': views.SellMotorPolicySerializer,
+        }
+        for product, serializer in serializers_by_product.items():
+            data = example_payload(serializer())
+            self.assertQueriesPerRequest('post', f'/api/agent/sell-policy/{product}', 1, data, status_code=201)
+
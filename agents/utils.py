@@ -1,12 +1,9 @@
 import os
-from datetime import datetime
 
-import pyotp
 import requests as r
 from dotenv import find_dotenv, load_dotenv
 
 from django.forms import ValidationError
-from django.utils import timezone
 
 from rest_framework.exceptions import APIException
 
@@ -29,23 +26,6 @@ class CustomValidationError(APIException):
         self.detail = detail
 
 
-def generate_otp() -> str:
-    totp = pyotp.TOTP(pyotp.random_base32(), interval=60)
-    return totp.now()
-
-
-def verify_otp(otp_created_at) -> bool:
-    current_time = timezone.now().time()
-    today = timezone.now().today()
-
-    otp_created_time_datetime = datetime.combine(today, otp_created_at)
-    current_datetime = datetime.combine(today, current_time)
-
-    time_delta = current_datetime - otp_created_time_datetime
-
-    return not time_delta.total_seconds() >= 120
-
-
 def gen_absolute_url(id_base64, token):
     if os.getenv('ENV') != 'dev':
         return f'https://{FRONTED_URL}/agent/reset-password/{id_base64}/{token}'
@@ -2,10 +2,11 @@ from pprint import pprint
 
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from adrf.decorators import api_view
+from reconciliation_backend.replicas import reads_from_replica
 
 from django.conf import settings
 from django.utils import timezone
-from django.core.mail import send_mail
 from django.shortcuts import get_object_or_404
 from django.utils.html import strip_tags
 from django.template.loader import render_to_string
@@ -13,17 +14,28 @@ from django.template.loader import render_to_string
 from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import permission_classes
 from rest_framework.permissions import IsAuthenticated
 
 from insurer.models import Insurer, InvitedAgents
 
 from user.models import CustomUser
-
-from superpool_proxy.superpool_client import SuperpoolClient
-
-from .utils import add_string_to_all_fields_in_travel_serializer, generate_otp, create_merchant_on_superpool, generate_unyte_unique_agent_id
-from .models import Agent
+from user.principal import aget_principal
+
+from notifications.outbox import queue_mail
+from superpool_proxy.quotes import QuoteIndex
+from superpool_proxy.mirror import fetch_dashboard
+from superpool_proxy.conditional import dashboard_validators
+from superpool_proxy.passthrough import data_response
+from superpool_proxy.reconciliation import to_decimal
+from superpool_proxy.async_superpool_client import AsyncSuperpoolClient
+
+from .utils import (
+    create_merchant_on_superpool,
+    generate_unyte_unique_agent_id,
+    add_string_to_all_fields_in_travel_serializer,
+)
+from .models import Agent, AgentPolicySale
 from .serializer import (
     BikePolicySerializer,
     CreateAgentSerializer,
@@ -39,7 +51,57 @@ from .response_serializers import (
     SuccessfulCreateAgentSerializer,
 )
 
-SUPERPPOOL_HANDLER = SuperpoolClient()
+SUPERPPOOL_HANDLER = AsyncSuperpoolClient()
+
+
+async def record_policy_sale(agent: Agent, product: str, product_type, quote_code, sold_policy) -> AgentPolicySale:
+    """
+    Keep a local copy of every policy an agent sells so it can be reconciled against Superpool later.
+    """
+    if isinstance(sold_policy, dict) and isinstance(sold_policy.get('data'), dict):
+        sold_policy = sold_policy['data']
+    sold_policy = sold_policy if isinstance(sold_policy, dict) else {}
+    return await AgentPolicySale.objects.acreate(
+        agent=agent,
+        insurer=agent.affiliated_company,
+        product=product,
+        product_type=product_type or '',
+        quote_code=quote_code,
+        merchant_code=agent.merchant_code,
+        superpool_policy_id=str(sold_policy.get('id') or sold_policy.get('policy_id') or ''),
+        premium=to_decimal(sold_policy.get('premium')),
+    )
+
+
+async def quote_for_insurer_product(
+    request: Request, product_name: str, serializer: type, *, first_only: bool = False
+) -> Response:
+    """
+    Shared body of the generate_*_quotes views: fetch quotes from Superpool and return the ones the agent's
+    insurer offers for ``product_name``, either all of them or just the first.
+    """
+    insurer = (await aget_principal(request)).get_agent().affiliated_company
+    serializer_class = serializer(data=request.data)
+    if not serializer_class.is_valid():
+        return Response(serializer_class.errors, status.HTTP_400_BAD_REQUEST)
+    customer_metadata = serializer_class.validated_data.get('customer_metadata')
+    insurance_details = serializer_class.validated_data.get('insurance_details')
+    response = await SUPERPPOOL_HANDLER.get_quote(customer_metadata, insurance_details, coverage_preferences={})
+    status_code = response.get('status_code')
+
+    if status_code != 200:
+        return Response(response.get('error'), status.HTTP_400_BAD_REQUEST)
+
+    result = QuoteIndex.from_response(response).find(insurer.business_name, product_name)
+    if not first_only:
+        return Response({"data": result}, status.HTTP_200_OK)
+    if not result:
+        return Response({
+            'error': f'{insurer.business_name} has no quote for {product_name}'
+        }, status.HTTP_404_NOT_FOUND)
+
+    return Response({"data": result[0]}, status.HTTP_200_OK)
+
 
 @swagger_auto_schema(
     method='POST',
@@ -81,10 +143,7 @@ def create_agent(request) -> Response:
         """
         Check to see if the agent who is attempting to register is under the list of invited agents.
         """
-        insurer_invited_agents_objs = InvitedAgents.objects.filter(insurer=insurer).values()
-        insurer_invited_agents = [email.get('agent_email') for email in insurer_invited_agents_objs]
-
-        if user_email not in insurer_invited_agents:
+        if not InvitedAgents.objects.filter(insurer=insurer, agent_email=user_email).exists():
             return Response({
                 "error": "Unauthorized email. No Insurer has invited an agent with this email"
             }, status.HTTP_400_BAD_REQUEST)
@@ -121,11 +180,9 @@ def create_agent(request) -> Response:
             bvn=bvn,
             affiliated_company=insurer,
             unyte_unique_agent_id=uuad,
-            otp=generate_otp(),
             merchant_code = superpool_merchant.get('result').get('data').get('short_code'),
             tenant_id = superpool_merchant.get('result').get('data').get('tenant_id'),
             user=user,
-            otp_created_at=timezone.now().time(),
         )
         agent.save()
         current_year = timezone.now().year
@@ -134,7 +191,7 @@ def create_agent(request) -> Response:
         html_message = render_to_string('agents/welcome.html', context=context)
         plain_html_message = strip_tags(html_message)
 
-        send_mail(
+        queue_mail(
             subject='Welcome email',
             message=plain_html_message,
             from_email=settings.EMAIL_HOST_USER,
@@ -158,23 +215,28 @@ def create_agent(request) -> Response:
     },
     tags=['Agent'],
 )
+@reads_from_replica
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def view_products_for_insurer(request: Request):
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    agent = get_object_or_404(Agent, user=user)
-    insurer = get_object_or_404(Insurer, pk=agent.affiliated_company_id)
+async def view_products_for_insurer(request: Request):
+    agent = (await aget_principal(request)).get_agent()
 
     # TODO: Change insurer_id to added insurer UUID for proper fetching of insurer from DB after syncing with superpool
-    response = SUPERPPOOL_HANDLER.get_all_products_for_one_insurer(insurer_id=insurer.insurer_id)
+    response = await fetch_dashboard(
+        SUPERPPOOL_HANDLER, 'insurer', 'products', agent.affiliated_company.insurer_id, request
+    )
     status_code = response.get('status_code')
     error = response.get('error')
-    data = response.get('data')
 
     if status_code != 200:
         return Response(error, status.HTTP_400_BAD_REQUEST)
 
-    return Response(data, status.HTTP_200_OK)
+    validators = dashboard_validators(request, response)
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+
+    return validators.apply(data_response(request, response))
 
 @swagger_auto_schema(
     method='GET',
@@ -185,23 +247,28 @@ def view_products_for_insurer(request: Request):
     },
     tags=['Agent'],
 )
+@reads_from_replica
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def view_policies_for_insurer(request: Request):
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    agent = get_object_or_404(Agent, user=user)
-    insurer = get_object_or_404(Insurer, pk=agent.affiliated_company_id)
+async def view_policies_for_insurer(request: Request):
+    agent = (await aget_principal(request)).get_agent()
 
     # TODO: Change insurer_id to added insurer UUID for proper fetching of insurer from DB after syncing with superpool
-    response = SUPERPPOOL_HANDLER.get_all_policies_for_one_insurer(insurer_id=insurer.insurer_id)
+    response = await fetch_dashboard(
+        SUPERPPOOL_HANDLER, 'insurer', 'policies', agent.affiliated_company.insurer_id, request
+    )
     status_code = response.get('status_code')
     error = response.get('error')
-    data = response.get('data')
 
     if status_code != 200:
         return Response(error, status.HTTP_400_BAD_REQUEST)
 
-    return Response(data, status.HTTP_200_OK)
+    validators = dashboard_validators(request, response)
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+
+    return validators.apply(data_response(request, response))
 
 
 @swagger_auto_schema(
@@ -213,24 +280,28 @@ def view_policies_for_insurer(request: Request):
     },
     tags=['Agent'],
 )
+@reads_from_replica
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def view_claims_for_insurer(request: Request):
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    agent = get_object_or_404(Agent, user=user)
-    agent = get_object_or_404(Agent, pk=request.user.id)
-    insurer = get_object_or_404(Insurer, pk=agent.affiliated_company_id)
+async def view_claims_for_insurer(request: Request):
+    agent = (await aget_principal(request)).get_agent()
 
     # TODO: Change insurer_id to added insurer UUID for proper fetching of insurer from DB after syncing with superpool
-    response = SUPERPPOOL_HANDLER.get_all_claims_for_one_insurer(insurer_id=insurer.insurer_id)
+    response = await fetch_dashboard(
+        SUPERPPOOL_HANDLER, 'insurer', 'claims', agent.affiliated_company.insurer_id, request
+    )
     status_code = response.get('status_code')
     error = response.get('error')
-    data = response.get('data')
 
     if status_code != 200:
         return Response(error, status.HTTP_400_BAD_REQUEST)
 
-    return Response(data, status.HTTP_200_OK)
+    validators = dashboard_validators(request, response)
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+
+    return validators.apply(data_response(request, response))
 
 
 @swagger_auto_schema(
@@ -245,34 +316,8 @@ def view_claims_for_insurer(request: Request):
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def generate_travel_quotes(request: Request, product_name: str):
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    agents = get_object_or_404(Agent, user=user.id)
-    insurer = get_object_or_404(Insurer, pk=agents.affiliated_company_id)
-    insurer_business_name = insurer.business_name
-    serializer_class = TravelPolicySerializer(data=request.data)
-    if not serializer_class.is_valid():
-        return Response(serializer_class.errors, status.HTTP_400_BAD_REQUEST)
-    customer_metadata = serializer_class.validated_data.get('customer_metadata')
-    insurance_details = serializer_class.validated_data.get('insurance_details')
-    response = SUPERPPOOL_HANDLER.get_quote(customer_metadata, insurance_details, coverage_preferences={})
-    status_code = response.get('status_code')
-
-    if status_code != 200:
-        return Response(response.get('error'), status.HTTP_400_BAD_REQUEST)
-
-    quotes = response.get('data').get('data')
-    insurer_quotes = []
-    result = []
-    for product in quotes:
-        if insurer_business_name == product.get('provider'):
-            insurer_quotes.append(product)  # noqa: PERF401
-
-    for policy in insurer_quotes:
-        if policy.get('product') == product_name:
-            result.append(policy)  # noqa: PERF401
-
-    return Response({"data": result[0]}, status.HTTP_200_OK)
+async def generate_travel_quotes(request: Request, product_name: str):
+    return await quote_for_insurer_product(request, product_name, TravelPolicySerializer, first_only=True)
 
 
 @swagger_auto_schema(
@@ -287,35 +332,8 @@ def generate_travel_quotes(request: Request, product_name: str):
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def generate_motor_quotes(request: Request, product_name: str):
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    agents = get_object_or_404(Agent, user=user.id)
-    insurer = get_object_or_404(Insurer, pk=agents.affiliated_company_id)
-    insurer_business_name = insurer.business_name
-    serializer_class = MotorPolicySerializer(data=request.data)
-    if not serializer_class.is_valid():
-        return Response(serializer_class.errors, status.HTTP_400_BAD_REQUEST)
-    customer_metadata = serializer_class.validated_data.get('customer_metadata')
-    insurance_details = serializer_class.validated_data.get('insurance_details')
-    response = SUPERPPOOL_HANDLER.get_quote(customer_metadata, insurance_details, coverage_preferences={})
-    status_code = response.get('status_code')
-
-    if status_code != 200:
-        return Response(response.get('error'), status.HTTP_400_BAD_REQUEST)
-
-    quotes = response.get('data').get('data')
-    insurer_quotes = []
-    result = []
-
-    for product in quotes:
-        if insurer_business_name == product.get('provider'):
-            insurer_quotes.append(product)  # noqa: PERF401
-
-    for policy in insurer_quotes:
-        if policy.get('product') == product_name:
-            result.append(policy)  # noqa: PERF401
-
-    return Response({"data": result}, status.HTTP_200_OK)
+async def generate_motor_quotes(request: Request, product_name: str):
+    return await quote_for_insurer_product(request, product_name, MotorPolicySerializer)
 
 
 
@@ -331,34 +349,8 @@ def generate_motor_quotes(request: Request, product_name: str):
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def generate_gadget_quotes(request: Request, product_name: str):
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    agents = get_object_or_404(Agent, user=user.id)
-    insurer = get_object_or_404(Insurer, pk=agents.affiliated_company_id)
-    insurer_business_name = insurer.business_name
-    serializer_class = GadgetPolicySerializer(data=request.data)
-    if not serializer_class.is_valid():
-        return Response(serializer_class.errors, status.HTTP_400_BAD_REQUEST)
-    customer_metadata = serializer_class.validated_data.get('customer_metadata')
-    insurance_details = serializer_class.validated_data.get('insurance_details')
-    response = SUPERPPOOL_HANDLER.get_quote(customer_metadata, insurance_details, coverage_preferences={})
-    status_code = response.get('status_code')
-
-    if status_code != 200:
-        return Response(response.get('error'), status.HTTP_400_BAD_REQUEST)
-
-    quotes = response.get('data').get('data')
-    insurer_quotes = []
-    result = []
-    for product in quotes:
-        if insurer_business_name == product.get('provider'):
-            insurer_quotes.append(product)  # noqa: PERF401
-
-    for policy in insurer_quotes:
-        if policy.get('product') == product_name:
-            result.append(policy)  # noqa: PERF401
-
-    return Response({"data": result[0]}, status.HTTP_200_OK)
+async def generate_gadget_quotes(request: Request, product_name: str):
+    return await quote_for_insurer_product(request, product_name, GadgetPolicySerializer, first_only=True)
 
 
 @swagger_auto_schema(
@@ -373,34 +365,8 @@ def generate_gadget_quotes(request: Request, product_name: str):
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def generate_bike_quotes(request: Request, product_name: str):
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    agents = get_object_or_404(Agent, user=user.id)
-    insurer = get_object_or_404(Insurer, pk=agents.affiliated_company_id)
-    insurer_business_name = insurer.business_name
-    serializer_class = BikePolicySerializer(data=request.data)
-    if not serializer_class.is_valid():
-        return Response(serializer_class.errors, status.HTTP_400_BAD_REQUEST)
-    customer_metadata = serializer_class.validated_data.get('customer_metadata')
-    insurance_details = serializer_class.validated_data.get('insurance_details')
-    response = SUPERPPOOL_HANDLER.get_quote(customer_metadata, insurance_details, coverage_preferences={})
-    status_code = response.get('status_code')
-
-    if status_code != 200:
-        return Response(response.get('error'), status.HTTP_400_BAD_REQUEST)
-
-    quotes = response.get('data').get('data')
-    insurer_quotes = []
-    result = []
-    for product in quotes:
-        if insurer_business_name == product.get('provider'):
-            insurer_quotes.append(product)  # noqa: PERF401
-
-    for policy in insurer_quotes:
-        if policy.get('product') == product_name:
-            result.append(policy)  # noqa: PERF401
-
-    return Response({"data": result}, status.HTTP_200_OK)
+async def generate_bike_quotes(request: Request, product_name: str):
+    return await quote_for_insurer_product(request, product_name, BikePolicySerializer)
 
 
 
@@ -416,34 +382,8 @@ def generate_bike_quotes(request: Request, product_name: str):
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def generate_shipment_quotes(request: Request, product_name: str):
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    agents = get_object_or_404(Agent, user=user.id)
-    insurer = get_object_or_404(Insurer, pk=agents.affiliated_company_id)
-    insurer_business_name = insurer.business_name
-    serializer_class = ShipmentPolicySerializer(data=request.data)
-    if not serializer_class.is_valid():
-        return Response(serializer_class.errors, status.HTTP_400_BAD_REQUEST)
-    customer_metadata = serializer_class.validated_data.get('customer_metadata')
-    insurance_details = serializer_class.validated_data.get('insurance_details')
-    response = SUPERPPOOL_HANDLER.get_quote(customer_metadata, insurance_details, coverage_preferences={})
-    status_code = response.get('status_code')
-
-    if status_code != 200:
-        return Response(response.get('error'), status.HTTP_400_BAD_REQUEST)
-
-    quotes = response.get('data').get('data')
-    insurer_quotes = []
-    result = []
-    for product in quotes:
-        if insurer_business_name == product.get('provider'):
-            insurer_quotes.append(product)  # noqa: PERF401
-
-    for policy in insurer_quotes:
-        if policy.get('product') == product_name:
-            result.append(policy)  # noqa: PERF401
-
-    return Response({"data": result}, status.HTTP_200_OK)
+async def generate_shipment_quotes(request: Request, product_name: str):
+    return await quote_for_insurer_product(request, product_name, ShipmentPolicySerializer)
 
 
 @swagger_auto_schema(
@@ -458,9 +398,8 @@ def generate_shipment_quotes(request: Request, product_name: str):
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def sell_travel_policy(request: Request):
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    agent = get_object_or_404(Agent, user=user)
+async def sell_travel_policy(request: Request):
+    agent = (await aget_principal(request)).get_agent()
     serializer_class = SellTravelPolicySerializer(data=request.data)
 
     if not serializer_class.is_valid():
@@ -472,19 +411,22 @@ def sell_travel_policy(request: Request):
     quote_code = data.get('quote_code')
     product_type = data.get('product_type')
 
-    response = SUPERPPOOL_HANDLER.sell_policy(
+    response = await SUPERPPOOL_HANDLER.sell_policy(
         customer_metadata=customer_metadata,
         additional_information=additional_information,
         quote_code=quote_code,
         product_type=product_type,
         merchant_code=agent.merchant_code,
-        activation_metadata=activation_metadata
+        activation_metadata=activation_metadata,
+        invalidate_tenants=(agent.tenant_id, agent.affiliated_company.insurer_id),
     )
     if response.get('status_code') != 201:
         return Response({
             "error": response.get('error')
         }, status.HTTP_400_BAD_REQUEST)
 
+    await record_policy_sale(agent, 'Travel', product_type, quote_code, response.get('data'))
+
     return Response({
         "message": response.get('data')
     }, status.HTTP_201_CREATED)
@@ -503,9 +445,8 @@ def sell_travel_policy(request: Request):
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def sell_shipment_policy(request: Request):
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    agent = get_object_or_404(Agent, user=user)
+async def sell_shipment_policy(request: Request):
+    agent = (await aget_principal(request)).get_agent()
     serializer_class = SellShipmentPolicySerializer(data=request.data)
 
     if not serializer_class.is_valid():
@@ -517,19 +458,22 @@ def sell_shipment_policy(request: Request):
     quote_code = data.get('quote_code')
     product_type = data.get('product_type')
 
-    response = SUPERPPOOL_HANDLER.sell_policy(
+    response = await SUPERPPOOL_HANDLER.sell_policy(
         customer_metadata=customer_metadata,
         additional_information=additional_information,
         quote_code=quote_code,
         product_type=product_type,
         merchant_code=agent.merchant_code,
-        activation_metadata=activation_metadata
+        activation_metadata=activation_metadata,
+        invalidate_tenants=(agent.tenant_id, agent.affiliated_company.insurer_id),
     )
     if response.get('status_code') != 201:
         return Response({
             "error": response.get('error')
         }, status.HTTP_400_BAD_REQUEST)
 
+    await record_policy_sale(agent, 'Shipment', product_type, quote_code, response.get('data'))
+
     return Response({
         "message": response.get('data')
     }, status.HTTP_201_CREATED)
@@ -549,9 +493,8 @@ def sell_shipment_policy(request: Request):
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
-def sell_motor_policy(request: Request):
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    agent = get_object_or_404(Agent, user=user)
+async def sell_motor_policy(request: Request):
+    agent = (await aget_principal(request)).get_agent()
     serializer_class = SellMotorPolicySerializer(data=request.data)
 
     if not serializer_class.is_valid():
@@ -563,19 +506,22 @@ def sell_motor_policy(request: Request):
     quote_code = data.get('quote_code')
     product_type = data.get('product_type')
 
-    response = SUPERPPOOL_HANDLER.sell_policy(
+    response = await SUPERPPOOL_HANDLER.sell_policy(
         customer_metadata=customer_metadata,
         additional_information=additional_information,
         quote_code=quote_code,
         product_type=product_type,
         merchant_code=agent.merchant_code,
-        activation_metadata=activation_metadata
+        activation_metadata=activation_metadata,
+        invalidate_tenants=(agent.tenant_id, agent.affiliated_company.insurer_id),
     )
     if response.get('status_code') != 201:
         return Response({
             "error": response.get('error')
         }, status.HTTP_400_BAD_REQUEST)
 
+    await record_policy_sale(agent, 'Motor', product_type, quote_code, response.get('data'))
+
     return Response({
         "message": response.get('data')
     }, status.HTTP_201_CREATED)
@@ -0,0 +1,78 @@
+"""
+Load test an endpoint that queries the database on every request, against backends running with different
+``DB_POOL_MODE`` settings, and report requests per second and latency for each.
+
+    docker compose --profile pgbouncer up -d
+    python -m benchmarks.db_pooling --token "$ACCESS_TOKEN" \\
+        --target off=http://localhost:8080 --target pgbouncer=http://localhost:8081
+
+The ``reconciliation-backend`` service runs under ASGI with pooling off (a new Postgres connection per
+request) and ``reconciliation-backend-pgbouncer`` connects through the local pgbouncer. Start a backend
+with ``DB_POOL_MODE=persistent`` under a sync gunicorn worker to compare persistent connections too. The
+token is an insurer's access token, since the default path loads the insurer profile.
+"""
+
+import time
+import asyncio
+import argparse
+import statistics
+
+import httpx
+
+
+def percentiles(samples: list[float]) -> tuple[float, float]:
+    cut_points = statistics.quantiles(samples, n=100)
+    return cut_points[49], cut_points[98]
+
+
+async def load(url: str, token: str, concurrency: int, duration: float) -> tuple[float, list[float], int]:
+    """
+    Requests per second, latencies in ms and failed requests of ``concurrency`` clients calling ``url`` back to
+    back for ``duration`` seconds.
+    """
+    samples, failures = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(headers={'Authorization': f'Bearer {token}'}, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker() -> None:
+            nonlocal failures
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(url)
+                samples.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return len(samples) / elapsed, samples, failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', action='append', required=True, help='name=base url, repeat for each backend')
+    parser.add_argument('--token', required=True)
+    parser.add_argument('--path', default='/api/user/user-profile')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=3)
+    args = parser.parse_args()
+
+    print(f'GET {args.path} with {args.concurrency} concurrent clients for {args.duration:.0f}s')  # noqa: T201
+    for target in args.target:
+        name, base_url = target.split('=', 1)
+        url = f'{base_url.rstrip("/")}{args.path}'
+        asyncio.run(load(url, args.token, args.concurrency, args.warmup))
+        rate, samples, failures = asyncio.run(load(url, args.token, args.concurrency, args.duration))
+        p50, p99 = percentiles(samples)
+        print(  # noqa: T201
+            f'{name:<12} {rate:8.1f} req/s  p50={p50:7.2f}ms  p99={p99:7.2f}ms  failed={failures}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Time the insurer summary aggregation on ``--policies`` synthetic policies: building the column arrays
+once, then the per-request group-by over cached columns.
+
+    python -m benchmarks.insurer_summary --policies 500000
+"""
+
+import time
+import argparse
+import statistics
+
+from superpool_proxy.aggregation import PolicyColumns
+from benchmarks.reconciliation_engine import PRODUCT_TYPES, SyntheticInsurer
+
+PRODUCTS = ['Travel Cover', 'Motor Registration', 'Device Protection', 'Credit Life', 'Logistics']
+
+
+def synthetic_policies(insurer: SyntheticInsurer) -> list[dict]:
+    policies = []
+    for index, policy in enumerate(insurer.policies()):
+        product_type = PRODUCT_TYPES[index % len(PRODUCT_TYPES)]
+        policy['product_name'] = PRODUCTS[index % len(PRODUCTS)]
+        policy['broker_commission'] = product_type['broker_commission']
+        policy['created_at'] = f'2024-{index % 12 + 1:02d}-15T09:00:00Z'
+        policies.append(policy)
+    return policies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--policies', type=int, default=500_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    insurer = SyntheticInsurer(args.policies)
+    policies = synthetic_policies(insurer)
+    claims = list(insurer.claims())
+
+    started = time.perf_counter()
+    columns = PolicyColumns.from_records(policies, claims)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    samples = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        columns.summary()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    print(f'{columns.size} policies, {len(claims)} claims')  # noqa: T201
+    print(f'column build (once per data version): {build_ms:.0f} ms')  # noqa: T201
+    median_ms = statistics.median(samples)
+    print(f'summary over cached columns: median {median_ms:.1f} ms, max {max(samples):.1f} ms')  # noqa: T201
+
+
+if __name__ == '__main__':
+    main()
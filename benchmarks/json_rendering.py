@@ -0,0 +1,113 @@
+"""
+Time the JSON work of the API with DRF's renderer and parser against the orjson ones (``FAST_JSON``), and
+the cost of sending a cached Superpool list with ``SUPERPOOL_RAW_PASSTHROUGH`` against rendering it again.
+
+    python -m benchmarks.json_rendering --policies 20000
+"""
+
+import io
+import json
+import time
+import argparse
+import statistics
+
+from django.conf import settings
+
+# DRF reads its settings when the renderers are imported; its defaults are what is measured
+settings.configure()
+
+from reconciliation_backend.renderers import ORJSONParser, ORJSONRenderer  # noqa: E402
+
+from django.http import HttpResponse  # noqa: E402
+
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+
+def superpool_policies(count: int) -> list[dict]:
+    return [
+        {
+            'id': f'pol_{index}',
+            'quote_code': f'QUO-{index:08d}',
+            'merchant_code': f'MER{index % 40:03d}',
+            'product_type': ('Travel', 'Motor', 'Health', 'Gadget')[index % 4],
+            'product_name': 'Travel Cover',
+            'premium': f'{1000 + index % 5000}.00',
+            'broker_commission': '0.10',
+            'customer': {'first_name': 'Ada', 'last_name': 'Obi', 'email': f'customer{index}@example.com'},
+            'created_at': f'2024-{index % 12 + 1:02d}-15T09:00:00Z',
+            'updated_at': f'2024-{index % 12 + 1:02d}-16T09:00:00Z',
+        }
+        for index in range(count)
+    ]
+
+
+def sell_body() -> bytes:
+    """
+    A body shaped like the agents' motor sell request: customer, vehicle and coverage details nested a few
+    levels deep.
+    """
+    return json.dumps({
+        'quote_code': 'QUO-00000001',
+        'customer_metadata': {
+            'first_name': 'Ada',
+            'last_name': 'Obi',
+            'email': 'ada@example.com',
+            'phone': '+2348000000000',
+            'residential_address': {'street': '1 Marina', 'city': 'Lagos', 'state': 'Lagos', 'country': 'NG'},
+            'identity': {'id_type': 'NIN', 'id_number': '12345678901', 'expiry_date': '2030-01-01'},
+        },
+        'insurance_details': {
+            'vehicle': {
+                'make': 'Toyota',
+                'model': 'Corolla',
+                'year': 2020,
+                'registration_number': 'LAG-123-XY',
+                'drivers': [{'name': f'Driver {index}', 'licence': f'LIC{index}'} for index in range(3)],
+            },
+            'additional_information': {f'field_{index}': f'value {index}' for index in range(20)},
+        },
+        'coverage_preferences': {'coverage_type': 'Comprehensive', 'excess': '50000.00', 'extras': ['towing']},
+    }).encode()
+
+
+def median_ms(call, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--policies', type=int, default=20_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--bodies', type=int, default=10_000, help='Sell bodies parsed per sample')
+    args = parser.parse_args()
+
+    policies = superpool_policies(args.policies)
+    raw = json.dumps(policies).encode()
+    body = sell_body()
+
+    def parse_all(json_parser) -> None:
+        for _ in range(args.bodies):
+            json_parser.parse(io.BytesIO(body))
+
+    results = {
+        f'render {args.policies} policies, DRF': median_ms(lambda: JSONRenderer().render(policies), args.repeat),
+        f'render {args.policies} policies, orjson': median_ms(lambda: ORJSONRenderer().render(policies), args.repeat),
+        f'send {args.policies} policies, raw passthrough': median_ms(lambda: HttpResponse(raw), args.repeat),
+        f'parse {args.bodies} sell bodies, DRF': median_ms(lambda: parse_all(JSONParser()), args.repeat),
+        f'parse {args.bodies} sell bodies, orjson': median_ms(lambda: parse_all(ORJSONParser()), args.repeat),
+    }
+
+    print(f'{len(raw) / 1024 / 1024:.1f} MB of policies, {len(body)} byte sell body')  # noqa: T201
+    width = max(map(len, results))
+    for name, ms in results.items():
+        print(f'{name:<{width}}  median {ms:8.2f} ms')  # noqa: T201
+
+
+if __name__ == '__main__':
+    main()
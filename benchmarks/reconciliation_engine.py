@@ -0,0 +1,101 @@
+"""
+Reconcile a synthetic insurer with ``--rows`` Superpool policies against its agents' sales and report
+throughput and peak memory, with and without hash-partitioning the join.
+
+    python -m benchmarks.reconciliation_engine --rows 1000000
+    python -m benchmarks.reconciliation_engine --rows 1000000 --partitions 16
+
+The data is generated lazily, one row at a time, from the same Faker setup and product types that
+``main.py`` seeds the dev database with, so the inputs themselves never sit in memory.
+"""
+
+import time
+import random
+import argparse
+import resource
+
+from faker import Faker
+
+from superpool_proxy.reconciliation import reconcile, summarize
+
+# Same shape as RandomDataDBLoader.product_type in main.py, which cannot be imported without a database.
+PRODUCT_TYPES = [
+    {'type': 'Basic', 'premium': '2000.00', 'flat_fee': 'YES', 'broker_commission': 20},
+    {'type': 'Standard', 'premium': '3000.00', 'flat_fee': 'NO', 'broker_commission': 15},
+    {'type': 'Premium', 'premium': '5000.00', 'flat_fee': 'YES', 'broker_commission': 25},
+    {'type': 'Gold', 'premium': '7000.00', 'flat_fee': 'NO', 'broker_commission': 18},
+    {'type': 'Platinum', 'premium': '10000.00', 'flat_fee': 'YES', 'broker_commission': 22},
+    {'type': 'Silver', 'premium': '1500.00', 'flat_fee': 'NO', 'broker_commission': 10},
+    {'type': 'Family', 'premium': '3500.00', 'flat_fee': 'YES', 'broker_commission': 12},
+    {'type': 'Travel', 'premium': '2500.00', 'flat_fee': 'NO', 'broker_commission': 17},
+    {'type': 'Student', 'premium': '1200.00', 'flat_fee': 'YES', 'broker_commission': 8},
+    {'type': 'Executive', 'premium': '8000.00', 'flat_fee': 'NO', 'broker_commission': 30},
+]
+
+# Out of every 100 sales: 3 have no policy on Superpool, 2 were repriced upstream; 3 policies have no sale.
+NO_POLICY = frozenset({7, 41, 88})
+REPRICED = frozenset({13, 62})
+NO_SALE = frozenset({25, 51, 77})
+
+
+class SyntheticInsurer:
+    def __init__(self, rows: int, agents: int = 500, seed: int = 0):
+        Faker.seed(seed)
+        faker = Faker()
+        self.rows = rows
+        self.merchant_codes = [faker.unique.bothify('MER-#####') for _ in range(agents)]
+        self.seed = seed
+
+    def _policy(self, index: int) -> dict:
+        product_type = PRODUCT_TYPES[index % len(PRODUCT_TYPES)]
+        return {
+            'id': f'pol_{index:09d}',
+            'quote_code': f'Quo_{index:09d}',
+            'merchant_code': self.merchant_codes[index % len(self.merchant_codes)],
+            'product_type': product_type['type'],
+            'premium': product_type['premium'],
+        }
+
+    def policies(self):
+        for index in range(self.rows):
+            if index % 100 not in NO_POLICY:
+                yield self._policy(index)
+
+    def sales(self):
+        for index in range(self.rows):
+            if index % 100 in NO_SALE:
+                continue
+            sale = self._policy(index)
+            sale['superpool_policy_id'] = sale.pop('id') if index % 2 else ''
+            if index % 100 in REPRICED:
+                sale['premium'] = '999.00'
+            yield sale
+
+    def claims(self):
+        rng = random.Random(self.seed)  # noqa: S311
+        for index in range(0, self.rows, 7):
+            yield {'policy_id': f'pol_{index:09d}', 'claim_amount': str(rng.randint(100, 2000))}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--partitions', type=int, default=1)
+    args = parser.parse_args()
+
+    insurer = SyntheticInsurer(args.rows)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    report = summarize(reconcile(insurer.policies(), insurer.sales(), insurer.claims(), partitions=args.partitions))
+    elapsed = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    throughput = args.rows / elapsed
+    print(f'{args.rows} rows, {args.partitions} partition(s): {elapsed:.2f}s, {throughput:,.0f} rows/s')  # noqa: T201
+    print(f'peak RSS grew by {(rss_after - rss_before) / 1024:.0f} MiB')  # noqa: T201
+    for bucket, totals in report.as_dict().items():
+        print(f'  {bucket:<22} {totals["count"]:>10}  premium {totals["policy_premium"]:>16}')  # noqa: T201
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Compare Superpool call latency with a fresh connection per request (the old module-level ``requests.get``)
+against the pooled keep-alive session used by ``SuperpoolClient``.
+
+    python -m benchmarks.superpool_client_latency --requests 500
+    python -m benchmarks.superpool_client_latency --certfile cert.pem --keyfile key.pem  # over TLS
+"""
+
+import time
+import argparse
+import statistics
+
+import requests as r
+
+from superpool_proxy.testing import SuperpoolStub
+from superpool_proxy.superpool_client import SuperpoolClient, build_session
+
+PRODUCTS = [{'id': i, 'name': f'Product {i}', 'premium': '2000.00'} for i in range(50)]
+ROUTES = {('GET', '/dashboard/products'): (200, PRODUCTS)}
+
+
+def percentiles(samples: list[float]) -> tuple[float, float]:
+    cut_points = statistics.quantiles(samples, n=100)
+    return cut_points[49], cut_points[98]
+
+
+def time_calls(call, count: int) -> list[float]:
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def pooled(client: SuperpoolClient) -> None:
+    response = client.get_all_products()
+    if response.get('status_code') != 200:
+        raise RuntimeError(response.get('error'))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--certfile')
+    parser.add_argument('--keyfile')
+    args = parser.parse_args()
+
+    with SuperpoolStub(ROUTES, certfile=args.certfile, keyfile=args.keyfile) as stub:
+        url = f'{stub.url}/dashboard/products'
+        verify = args.certfile or True
+
+        def unpooled():
+            response = r.get(url, timeout=10, verify=verify, headers={'Connection': 'close'})
+            response.raise_for_status()
+
+        session = build_session()
+        session.verify = verify
+        session.trust_env = False
+        client = SuperpoolClient(base_url=stub.url, session=session)
+
+        results = {
+            'before (new connection per call)': time_calls(unpooled, args.requests),
+            'after (pooled keep-alive session)': time_calls(lambda: pooled(client), args.requests),
+        }
+
+    print(f'{args.requests} sequential GET /dashboard/products against {stub.url}')  # noqa: T201
+    for label, samples in results.items():
+        p50, p99 = percentiles(samples)
+        print(f'{label:<36} p50={p50:7.3f}ms  p99={p99:7.3f}ms')  # noqa: T201
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Insurer, InvitedAgents, InsurerProfile
+from .models import Insurer, InvitationJob, InvitedAgents, InsurerProfile
 
 
 @admin.register(Insurer)
@@ -43,3 +43,9 @@ class InvitedAgentsModelAdmin(admin.ModelAdmin):
         return obj.insurer.business_name
 
     get_insurer_business_name.short_description = 'INSURER_BUSINESS_NAME'
+
+
+@admin.register(InvitationJob)
+class InvitationJobModelAdmin(admin.ModelAdmin):
+    list_display = ('insurer', 'status', 'total', 'invited', 'skipped', 'failed', 'created_at', 'finished_at')
+    list_filter = ('status',)
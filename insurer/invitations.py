@@ -0,0 +1,207 @@
+import csv
+from io import TextIOWrapper
+from datetime import timedelta
+from itertools import islice
+from collections.abc import Iterable, Iterator
+
+from django.db import connection, transaction
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+from django.db.models import Q
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.template.loader import get_template
+from django.db.models.functions import Lower
+
+from notifications.models import OutboundEmail
+from notifications.outbox import queue_mass_mail
+
+from .utils import gen_sign_up_url_for_agent
+from .models import Insurer, InvitationJob, InvitedAgents
+
+CSV_NAME_HEADERS = ('name', 'names')
+CSV_EMAIL_HEADERS = ('email', 'emails')
+INVITATION_SUBJECT = 'Agent SignUp Link'
+
+
+def agent_sign_up_link(insurer: Insurer) -> str:
+    relative_link = reverse('agents:register-agent').replace('/api/', '/')
+    return gen_sign_up_url_for_agent(relative_link, insurer.unyte_unique_insurer_id)
+
+
+def open_csv(binary_file) -> TextIOWrapper:
+    # utf-8-sig so a byte order mark written by Excel does not end up in the name header.
+    return TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+
+
+def csv_header_error(header: list) -> str | None:
+    """
+    Check an agents CSV header row, returning the error to show the insurer or None if it is usable.
+    """
+    if len(header) < 2:
+        return 'CSV file must have a name and an email column'
+    if header[0].strip() not in CSV_NAME_HEADERS:
+        return f'Invalid header {header[0]}'
+    if header[1].strip() not in CSV_EMAIL_HEADERS:
+        return f'Invalid header {header[1]}'
+    return None
+
+
+def iter_csv_agents(binary_file) -> Iterator[tuple[str, str]]:
+    """
+    Yield ``(name, email)`` for each row of an agents CSV, reading one line at a time.
+    """
+    reader = csv.reader(open_csv(binary_file), delimiter=',')
+    next(reader, None)
+    for row in reader:
+        if not any(row):
+            continue
+        yield row[0].strip(), row[1].strip() if len(row) > 1 else ''
+
+
+def iter_job_agents(job: InvitationJob) -> Iterator[tuple[str, str]]:
+    if job.agents_csv:
+        with job.agents_csv.open('rb') as agents_csv:
+            yield from iter_csv_agents(agents_csv)
+    else:
+        for agent in job.agents:
+            yield agent.get('names', ''), agent.get('emails', '')
+
+
+def chunked(rows: Iterable, size: int) -> Iterator[list]:
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def is_valid_email(email: str) -> bool:
+    try:
+        validate_email(email)
+    except ValidationError:
+        return False
+    return True
+
+
+def run_job(job: InvitationJob, chunk_size: int | None = None) -> InvitationJob:
+    """
+    Invite every agent in ``job``. Existing invites for the insurer are loaded once into a set, so each row
+    is a set lookup; new invites are inserted and their emails queued in one transaction per chunk, and the
+    job's counters are saved with each chunk so the progress endpoint can follow along.
+
+    Rerunning a job that died half way is safe: rows invited the first time are now existing invites and
+    are skipped. So are rows another job for the insurer invited while this one ran, which each chunk checks
+    for under the insurer's row lock before inserting, so only invites actually inserted are emailed and
+    counted.
+    """
+    insurer = job.insurer
+    template = get_template('invitation.html')
+    link = agent_sign_up_link(insurer)
+    recipients_cc = [settings.TO_EMAIL] if job.copy_to_admin and settings.TO_EMAIL else []
+    context = {
+        'current_year': timezone.now().year,
+        'company_name': insurer.business_name,
+        'unyte_unique_insurer_id': insurer.unyte_unique_insurer_id,
+    }
+
+    invited = {
+        email.lower()
+        for email in InvitedAgents.objects.filter(insurer=insurer).values_list('agent_email', flat=True)
+    }
+    job.total = job.invited = job.skipped = job.failed = 0
+
+    for chunk in chunked(iter_job_agents(job), chunk_size or settings.INVITATION_CHUNK_SIZE):
+        invites, emails = [], []
+        for name, email in chunk:
+            job.total += 1
+            if not is_valid_email(email):
+                job.failed += 1
+                continue
+            if email.lower() in invited:
+                job.skipped += 1
+                continue
+            invited.add(email.lower())
+            invites.append(InvitedAgents(insurer=insurer, agent_email=email))
+            emails.append(
+                OutboundEmail(
+                    subject=INVITATION_SUBJECT,
+                    body=link,
+                    html_body=template.render({**context, 'name': name}),
+                    from_email=settings.EMAIL_HOST_USER or '',
+                    recipients=[email, *recipients_cc],
+                )
+            )
+
+        with transaction.atomic():
+            # A concurrent job for the same insurer may have invited some of these emails since the set was
+            # loaded. Jobs hold the insurer's row lock from here to commit, so its invites are visible now.
+            Insurer.objects.select_for_update().only('pk').get(pk=insurer.pk)
+            taken = set(
+                InvitedAgents.objects.filter(insurer=insurer)
+                .annotate(email=Lower('agent_email'))
+                .filter(email__in=[invite.agent_email.lower() for invite in invites])
+                .values_list('email', flat=True)
+            )
+            if taken:
+                pending = [
+                    (invite, email)
+                    for invite, email in zip(invites, emails, strict=True)
+                    if invite.agent_email.lower() not in taken
+                ]
+                job.skipped += len(invites) - len(pending)
+                invites, emails = [invite for invite, _ in pending], [email for _, email in pending]
+            job.invited += len(invites)
+
+            InvitedAgents.objects.bulk_create(invites)
+            queue_mass_mail(emails)
+            InvitationJob.objects.filter(pk=job.pk).update(
+                total=job.total,
+                invited=job.invited,
+                skipped=job.skipped,
+                failed=job.failed,
+                updated_at=timezone.now(),
+            )
+
+    job.status = InvitationJob.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'total', 'invited', 'skipped', 'failed', 'finished_at', 'updated_at'])
+    if job.agents_csv:
+        job.agents_csv.delete(save=True)
+    return job
+
+
+def claim_job() -> InvitationJob | None:
+    """
+    Take the oldest pending job, or a running one whose worker stopped reporting progress for
+    ``INVITATION_LEASE_SECONDS``.
+    """
+    now = timezone.now()
+    stalled = now - timedelta(seconds=settings.INVITATION_LEASE_SECONDS)
+    with transaction.atomic():
+        # The redundant status__in lets the planner search the status index instead of scanning finished jobs.
+        jobs = InvitationJob.objects.filter(
+            Q(status=InvitationJob.PENDING) | Q(status=InvitationJob.RUNNING, updated_at__lte=stalled),
+            status__in=InvitationJob.OPEN_STATUSES,
+        ).select_related('insurer').order_by('created_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            jobs = jobs.select_for_update(skip_locked=True, of=('self',))
+        job = jobs.first()
+        if job is None:
+            return None
+        InvitationJob.objects.filter(pk=job.pk).update(status=InvitationJob.RUNNING, updated_at=now)
+    job.status = InvitationJob.RUNNING
+    return job
+
+
+def process_next_job(chunk_size: int | None = None) -> InvitationJob | None:
+    job = claim_job()
+    if job is None:
+        return None
+    try:
+        return run_job(job, chunk_size)
+    except Exception as error:
+        job.status = InvitationJob.FAILED
+        job.error = f'{type(error).__name__}: {error}'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+        return job
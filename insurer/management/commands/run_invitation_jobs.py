@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from insurer.invitations import process_next_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued agent invitation jobs. Runs until stopped unless --once is given.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run every queued job once and exit')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Defaults to INVITATION_CHUNK_SIZE')
+        parser.add_argument('--idle-sleep', type=float, default=2.0, help='Seconds to wait when nothing is queued')
+
+    def handle(self, *args, **options):
+        while True:
+            job = process_next_job(options['chunk_size'])
+            if job is not None:
+                self.stdout.write(
+                    f'job {job.pk} {job.status}: invited {job.invited}, skipped {job.skipped}, failed {job.failed}'
+                )
+                continue
+            if options['once']:
+                return
+            time.sleep(options['idle_sleep'])
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('insurer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvitationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('agents', models.JSONField(blank=True, default=list, help_text='Agents submitted as a list, if any')),
+                ('agents_csv', models.FileField(blank=True, help_text='Agents submitted as a CSV, if any', upload_to='invitations')),
+                ('copy_to_admin', models.BooleanField(default=False, help_text='Also send every invitation to TO_EMAIL')),
+                ('total', models.PositiveIntegerField(default=0, help_text='Rows read so far')),
+                ('invited', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0, help_text='Rows already invited by this insurer')),
+                ('failed', models.PositiveIntegerField(default=0, help_text='Rows without a valid email')),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('insurer', models.ForeignKey(help_text='Insurer sending the invitations', on_delete=django.db.models.deletion.CASCADE, to='insurer.insurer')),
+            ],
+            options={
+                'verbose_name': 'INVITATION JOB',
+                'verbose_name_plural': 'INVITATION JOBS',
+            },
+        ),
+    ]
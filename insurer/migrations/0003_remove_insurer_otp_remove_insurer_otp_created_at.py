@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('insurer', '0002_invitationjob'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='insurer',
+            name='otp',
+        ),
+        migrations.RemoveField(
+            model_name='insurer',
+            name='otp_created_at',
+        ),
+    ]
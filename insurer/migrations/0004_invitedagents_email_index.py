@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('insurer', '0003_remove_insurer_otp_remove_insurer_otp_created_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invitedagents',
+            index=models.Index(fields=['insurer', 'agent_email'], name='invited_agent_email_idx'),
+        ),
+    ]
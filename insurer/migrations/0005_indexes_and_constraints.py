@@ -0,0 +1,45 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def remove_duplicate_invites(apps, schema_editor):
+    InvitedAgents = apps.get_model('insurer', 'InvitedAgents')
+    duplicates = (
+        InvitedAgents.objects.values('insurer_id', 'agent_email')
+        .annotate(keep=models.Min('id'), count=models.Count('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        InvitedAgents.objects.filter(
+            insurer_id=duplicate['insurer_id'], agent_email=duplicate['agent_email']
+        ).exclude(id=duplicate['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('insurer', '0004_invitedagents_email_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invitationjob',
+            index=models.Index(fields=['status', 'created_at'], name='invitation_job_open_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='insurer',
+            constraint=models.UniqueConstraint(condition=models.Q(('insurer_id__isnull', False)), fields=('insurer_id',), name='unique_insurer_superpool_id'),
+        ),
+        migrations.RunPython(remove_duplicate_invites, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='invitedagents',
+            constraint=models.UniqueConstraint(fields=('insurer', 'agent_email'), name='unique_invited_agent_email'),
+        ),
+        migrations.RemoveIndex(
+            model_name='invitedagents',
+            name='invited_agent_email_idx',
+        ),
+    ]
@@ -3,6 +3,13 @@ from django_resized import ResizedImageField
 from django.db import models
 from django.conf import settings
 
+from user.models import PrincipalQuerySet
+
+
+class InsurerQuerySet(PrincipalQuerySet):
+    # An agent's principal carries the insurer it is affiliated with
+    principal_users = ('user', 'agent__user')
+
 
 class Insurer(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -22,12 +29,17 @@ class Insurer(models.Model):
     )
     insurer_gamp_id = models.CharField(default='', blank=True, help_text='GAMP ID for users associated with GAMP')
     unyte_unique_insurer_id = models.CharField(max_length=70, unique=True, null=False, blank=False)
-    otp = models.CharField(unique=True, max_length=6, blank=True, null=True)
-    otp_created_at = models.TimeField(blank=True, null=True)
+
+    objects = InsurerQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'INSURER'
         verbose_name_plural = 'INSURERS'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['insurer_id'], condition=models.Q(insurer_id__isnull=False), name='unique_insurer_superpool_id'
+            ),
+        ]
 
     def __str__(self):
         return self.business_name
@@ -39,10 +51,50 @@ class InvitedAgents(models.Model):
     class Meta:
         verbose_name = 'INVITED AGENT'
         verbose_name_plural = 'INVITED AGENTS'
+        constraints = [models.UniqueConstraint(fields=['insurer', 'agent_email'], name='unique_invited_agent_email')]
 
     def __str__(self):
         return self.agent_email
 
+
+class InvitationJob(models.Model):
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    OPEN_STATUSES = (PENDING, RUNNING)
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    insurer = models.ForeignKey(Insurer, on_delete=models.CASCADE, help_text='Insurer sending the invitations')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    agents = models.JSONField(default=list, blank=True, help_text='Agents submitted as a list, if any')
+    agents_csv = models.FileField(upload_to='invitations', blank=True, help_text='Agents submitted as a CSV, if any')
+    copy_to_admin = models.BooleanField(default=False, help_text='Also send every invitation to TO_EMAIL')
+    total = models.PositiveIntegerField(default=0, help_text='Rows read so far')
+    invited = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0, help_text='Rows already invited by this insurer')
+    failed = models.PositiveIntegerField(default=0, help_text='Rows without a valid email')
+    error = models.TextField(default='', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'INVITATION JOB'
+        verbose_name_plural = 'INVITATION JOBS'
+        indexes = [
+            # Only pending and running jobs are ever claimed, and they are a small slice of the table.
+            models.Index(fields=['status', 'created_at'], name='invitation_job_open_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.insurer} invitations ({self.status})'
+
 class InsurerProfile(models.Model):
     insurer = models.OneToOneField(Insurer, on_delete=models.CASCADE)
     profile_image = ResizedImageField(size=[400, 400], default='profile_pic/default.png', upload_to='profile_pic')
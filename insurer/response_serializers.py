@@ -190,21 +190,23 @@ class SuccessfulInsurerPoliciesSerializer(serializers.Serializer):
 class SuccessfulInsurerAgentSignupSerializer(serializers.Serializer):
     message = serializers.CharField(
         default=f'http://{FRONTED_URL}/agent/sign-up?invite=<insurer.unyte_unique_insurer_id>',
-        help_text='success message after email has been sent to agent(s) email(s)',
+        help_text='success message after the invitations have been queued',
     )
+    job_id = serializers.IntegerField(default=1, help_text='id of the invitation job, for the progress endpoint')
 
     class Meta:
-        fields = ['message']
+        fields = ['message', 'job_id']
 
 
 class SuccessfulInsurerAgentSignupCSVSerializer(serializers.Serializer):
     message = serializers.CharField(
-        default='Successfully sent out invite links to <number_of_agents> agent(s)',
-        help_text='success message after email has been sent to agent(s) email(s)',
+        default='Invite links are being sent out to the agents in <file_name>',
+        help_text='success message after the invitations have been queued',
     )
+    job_id = serializers.IntegerField(default=1, help_text='id of the invitation job, for the progress endpoint')
 
     class Meta:
-        fields = ['message']
+        fields = ['message', 'job_id']
 
 
 class SuccessfulCreateProductSerializer(serializers.Serializer):
@@ -1,4 +1,3 @@
-from django.utils import timezone
 from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth import get_user_model
 from django.utils.encoding import force_str
@@ -11,12 +10,19 @@ from rest_framework.exceptions import ValidationError, AuthenticationFailed
 from agents.models import Agent
 
 from user.models import CustomUser
+from user.uniqueness import conflict_error, conflicting_fields
 
-from .utils import CustomValidationError, generate_otp, generate_unyte_unique_insurer_id
-from .models import Insurer, InsurerProfile
+from .utils import CustomValidationError, generate_unyte_unique_insurer_id
+from .models import Insurer, InvitationJob, InsurerProfile
 
 custom_user = get_user_model()
 
+INSURER_CONFLICT_MESSAGES = {
+    'email': 'Email already exists',
+    'business_registration_number': 'Business Registration number already exists',
+    'business_name': 'Business Name already exists',
+}
+
 
 class CreateInsurerSerializer(serializers.Serializer):
     business_name = serializers.CharField(
@@ -56,17 +62,15 @@ class CreateInsurerSerializer(serializers.Serializer):
         email = attrs.get('email')
 
         # if insurer_gamp_id == '':
-        if custom_user.objects.filter(email=email).exists():
-            raise CustomValidationError({'error': 'Email already exists'})
-
-        if custom_user.objects.filter(email=email).exists():
-            raise CustomValidationError({'error': 'Email already exists'})
-
-        if Insurer.objects.filter(business_registration_number=business_reg_num).exists():
-            raise CustomValidationError({'error': 'Business Registration number already exists'})
-
-        if Insurer.objects.filter(business_name=business_name).exists():
-            raise CustomValidationError({'error': 'Business Name  already exists'})
+        conflicts = conflicting_fields(
+            {
+                'email': custom_user.objects.filter(email=email),
+                'business_registration_number': Insurer.objects.filter(business_registration_number=business_reg_num),
+                'business_name': Insurer.objects.filter(business_name=business_name),
+            }
+        )
+        if conflicts:
+            raise CustomValidationError(conflict_error(conflicts, INSURER_CONFLICT_MESSAGES))
 
         # return attrs
 
@@ -109,8 +113,6 @@ class CreateInsurerSerializer(serializers.Serializer):
             business_registration_number=business_reg_num,
             unyte_unique_insurer_id=unyte_unique_insurer_id,
             admin_name=admin_name,
-            otp=generate_otp(),
-            otp_created_at=timezone.now().time(),
             user=user,
         )
         insurer.save()
@@ -250,6 +252,14 @@ class UpdateProfileImageSerializer(serializers.ModelSerializer):
         return instance
 
 
+class InvitationJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.IntegerField(source='id')
+
+    class Meta:
+        model = InvitationJob
+        fields = ['job_id', 'status', 'total', 'invited', 'skipped', 'failed', 'error', 'created_at', 'finished_at']
+
+
 class UploadCSVFileSerializer(serializers.Serializer):
     otp = serializers.CharField()
     agents_csv = serializers.FileField()
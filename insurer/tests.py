@@ -1,5 +1,25 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from rest_framework.test import APIClient
+
+from user.otp import OTP_SERVICE
+from user.models import CustomUser
+from user.testing import jwt_client, create_agent, create_insurer
+
+from notifications.models import OutboundEmail
+
+from .models import Insurer, InvitationJob, InvitedAgents
+from .invitations import process_next_job
 
 
 class InsurerAppTest(TestCase):
@@ -24,3 +44,166 @@ class InsurerAppTest(TestCase):
 
         response = self.client.post(route, data, format='json')
         assert response.status_code == 201
+
+
+    def test_sign_up_reports_every_conflict_with_one_query(self) -> None:
+        create_insurer('testing321@gmail.com', business_name='Unyte')
+        data = {**self.INSURER_DICT, 'business_registration_number': '87654321'}
+
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('insurer:register_insurer'), data, format='json')
+        assert response.status_code == 400
+        assert response.json() == {
+            'error': 'Email already exists, Business Name already exists',
+            'conflicts': ['email', 'business_name'],
+        }
+
+
+@override_settings(TO_EMAIL='admin@unyte.com', EMAIL_HOST_USER='noreply@unyte.com', MEDIA_ROOT=tempfile.gettempdir())
+class InvitationJobTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        user = CustomUser.objects.create_user(email='insurer@example.com', password='password', is_insurer=True)
+        self.insurer = Insurer.objects.create(
+            user=user,
+            business_name='Unyte',
+            admin_name='unyte_admin',
+            business_registration_number='12345678',
+            unyte_unique_insurer_id='Unyte+5678+unyte.com',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def upload(self, content: str, otp: str | None = None):
+        if otp is None:
+            otp = OTP_SERVICE.issue(self.insurer.user_id)
+        agents_csv = SimpleUploadedFile('agents.csv', content.encode(), content_type='text/csv')
+        return self.client.post(
+            reverse('insurer:generate-signup-link-for-agent-csv'),
+            {'otp': otp, 'agents_csv': agents_csv},
+            format='multipart',
+        )
+
+    def test_csv_invitations_are_deduped_and_batched(self) -> None:
+        InvitedAgents.objects.create(insurer=self.insurer, agent_email='taken@example.com')
+        rows = ['names,emails', 'Taken,TAKEN@example.com', 'Twice,twice@example.com', 'Again,twice@example.com']
+        rows += ['Broken,not-an-email', *(f'Agent {index},agent{index}@example.com' for index in range(10))]
+
+        response = self.upload('\n'.join(rows))
+        assert response.status_code == 202
+        job_id = response.json()['job_id']
+        assert InvitationJob.objects.get(pk=job_id).status == InvitationJob.PENDING
+
+        # 14 rows in chunks of 4: one INSERT for the invites and one for the emails per chunk.
+        with CaptureQueriesContext(connection) as queries:
+            job = process_next_job(chunk_size=4)
+        assert job.status == InvitationJob.DONE
+        assert len([query for query in queries if query['sql'].startswith('INSERT')]) == 2 * 4
+
+        assert (job.total, job.invited, job.skipped, job.failed) == (14, 11, 2, 1)
+        assert not job.agents_csv
+        assert InvitedAgents.objects.filter(insurer=self.insurer).count() == 12
+        email = next(email for email in OutboundEmail.objects.all() if 'agent3@example.com' in email.recipients)
+        assert email.recipients == ['agent3@example.com', 'admin@unyte.com']
+        assert 'Agent 3' in email.html_body
+        assert 'Unyte+5678+unyte.com' in email.body
+
+        progress = self.client.get(reverse('insurer:view-invitation-job', args=[job_id]))
+        assert progress.status_code == 200
+        assert progress.json()['status'] == InvitationJob.DONE
+        assert progress.json()['invited'] == 11
+
+    def test_csv_header_is_checked_before_queueing(self) -> None:
+        response = self.upload('first_name,emails\nAgent,agent@example.com')
+        assert response.status_code == 400
+        assert response.json() == {'error': 'Invalid header first_name'}
+        assert not InvitationJob.objects.exists()
+
+    def test_csv_upload_needs_a_current_otp(self) -> None:
+        otp = OTP_SERVICE.issue(self.insurer.user_id)
+        wrong_otp = '000000' if otp != '000000' else '111111'
+
+        response = self.upload('names,emails\nAgent,agent@example.com', otp=wrong_otp)
+        assert response.json() == {'error': 'Invalid OTP'}
+        assert self.upload('names,emails\nAgent,agent@example.com', otp=otp).status_code == 202
+
+        # The code was used up by the upload.
+        response = self.upload('names,emails\nAgent,agent@example.com', otp=otp)
+        assert response.json() == {'error': 'OTP has expired'}
+
+    def test_list_invitations_run_as_a_job(self) -> None:
+        data = {'agents_list': [{'names': 'Agent', 'emails': 'agent@example.com'}]}
+        response = self.client.post(reverse('insurer:generate-signup-link-for-agent'), data, format='json')
+        assert response.status_code == 202
+
+        job = process_next_job()
+        assert job.pk == response.json()['job_id']
+        assert job.invited == 1
+        assert OutboundEmail.objects.get().recipients == ['agent@example.com']
+        assert process_next_job() is None
+
+    def test_emails_invited_by_another_job_meanwhile_are_skipped(self) -> None:
+        job = InvitationJob.objects.create(insurer=self.insurer)
+
+        def agents(_job):
+            # Another job invites the second agent after this one loaded the insurer's invites.
+            InvitedAgents.objects.create(insurer=self.insurer, agent_email='b@example.com')
+            yield from [('A', 'a@example.com'), ('B', 'b@example.com')]
+
+        with mock.patch('insurer.invitations.iter_job_agents', agents):
+            job = process_next_job()
+
+        assert (job.status, job.invited, job.skipped) == (InvitationJob.DONE, 1, 1)
+        assert OutboundEmail.objects.get().recipients == ['a@example.com']
+
+    def test_an_email_is_invited_once_per_insurer(self) -> None:
+        InvitedAgents.objects.create(insurer=self.insurer, agent_email='agent@example.com')
+        with self.assertRaises(IntegrityError):
+            InvitedAgents.objects.create(insurer=self.insurer, agent_email='agent@example.com')
+
+    def test_stalled_job_is_picked_up_again(self) -> None:
+        job = InvitationJob.objects.create(
+            insurer=self.insurer, status=InvitationJob.RUNNING, agents=[{'names': 'A', 'emails': 'a@example.com'}]
+        )
+        assert process_next_job() is None
+
+        InvitationJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        assert process_next_job().status == InvitationJob.DONE
+
+
+class InsurerEndpointQueryCountTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.insurer = create_insurer()
+        create_agent(self.insurer)
+        self.client = jwt_client(self.insurer.user)
+
+    def assertQueriesPerRequest(self, request, queries: int, status_code: int = 200) -> None:  # noqa: N802
+        request()
+        with self.assertNumQueries(queries):
+            response = request()
+        self.assertEqual(response.status_code, status_code, response.content)
+
+    def test_list_agents(self) -> None:
+        self.assertQueriesPerRequest(lambda: self.client.get(reverse('insurer:all-insurer-agents')), 1)
+
+    def test_invite_agents_only_queues_the_job(self) -> None:
+        data = {'agents_list': [{'names': 'Agent', 'emails': 'new-agent@example.com'}]}
+        route = reverse('insurer:generate-signup-link-for-agent')
+        self.assertQueriesPerRequest(lambda: self.client.post(route, data, format='json'), 1, 202)
+
+    def test_invite_agents_csv_only_queues_the_job(self) -> None:
+        def upload():
+            otp = OTP_SERVICE.issue(self.insurer.user_id)
+            agents_csv = SimpleUploadedFile('agents.csv', b'names,emails\nAgent,new-agent@example.com')
+            route = reverse('insurer:generate-signup-link-for-agent-csv')
+            return self.client.post(route, {'otp': otp, 'agents_csv': agents_csv}, format='multipart')
+
+        with self.settings(MEDIA_ROOT=tempfile.gettempdir()):
+            self.assertQueriesPerRequest(upload, 1, 202)
+
+    def test_view_invitation_job(self) -> None:
+        job = InvitationJob.objects.create(insurer=self.insurer)
+        route = reverse('insurer:view-invitation-job', args=[job.pk])
+        self.assertQueriesPerRequest(lambda: self.client.get(route), 1)
+
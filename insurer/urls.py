@@ -7,4 +7,5 @@ urlpatterns = [
     path('all-agents', views.list_all_agents_for_insurer, name='all-insurer-agents'),
     path('generate-agent-sign-up', views.invite_agents, name='generate-signup-link-for-agent'),
     path('generate-agent-sign-up-csv', views.invite_agents_csv, name='generate-signup-link-for-agent-csv'),
+    path('invitation-jobs/<int:job_id>', views.view_invitation_job, name='view-invitation-job'),
 ]
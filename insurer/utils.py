@@ -1,11 +1,7 @@
 import os
-from datetime import datetime
 
-import pyotp
 from dotenv import find_dotenv, load_dotenv
 
-from django.utils import timezone
-
 from rest_framework.exceptions import APIException
 
 load_dotenv(find_dotenv())
@@ -14,11 +10,6 @@ load_dotenv(find_dotenv())
 FRONTED_URL = os.getenv('FRONTEND_URL', 'unyte-reconciliations-frontend-dev-ynoamqpukq-uc.a.run.app')
 
 
-def generate_otp() -> str:
-    totp = pyotp.TOTP(pyotp.random_base32(), interval=60)
-    return totp.now()
-
-
 class CustomValidationError(APIException):
     status_code = 400
     default_detail = 'Invalid input.'
@@ -30,18 +21,6 @@ class CustomValidationError(APIException):
         self.detail = detail
 
 
-def verify_otp(otp_created_at) -> bool:
-    current_time = timezone.now().time()
-    today = timezone.now().today()
-
-    otp_created_time_datetime = datetime.combine(today, otp_created_at)
-    current_datetime = datetime.combine(today, current_time)
-
-    time_delta = current_datetime - otp_created_time_datetime
-
-    return not time_delta.total_seconds() >= 120
-
-
 def gen_absolute_url(id_base64, token):
     if os.getenv('ENV') != 'dev':
         return f'https://{FRONTED_URL}/company/reset-password/{id_base64}/{token}'
@@ -1,14 +1,12 @@
 import csv
-from io import TextIOWrapper
 
 from dotenv import find_dotenv, load_dotenv
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from reconciliation_backend.replicas import reads_from_replica
 
 from django.conf import settings
-from django.urls import reverse
 from django.utils import timezone
-from django.core.mail import send_mail
 from django.shortcuts import get_object_or_404
 from django.template.loader import render_to_string
 
@@ -18,18 +16,23 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 
+from user.otp import VALID, INCORRECT, OTP_ERRORS, OTP_SERVICE
 from user.models import CustomUser
+from user.principal import get_principal
 
-from .utils import verify_otp, gen_sign_up_url_for_agent
-from .models import Insurer, InvitedAgents, InsurerProfile
+from notifications.outbox import queue_mail
+
+from .models import InvitationJob, InsurerProfile
 from .serializer import (
     AgentSerializer,
     CustomAgentSerializer,
     CreateInsurerSerializer,
+    InvitationJobSerializer,
     UploadCSVFileSerializer,
     InsurerProfileSerializer,
     UpdateProfileImageSerializer,
 )
+from .invitations import open_csv, csv_header_error, agent_sign_up_link
 from .response_serializers import (
     SuccessfulCreateInsurerSerializer,
     SuccessfulListAllAgentsSerializer,
@@ -84,7 +87,7 @@ def create_insurer(request: Request) -> Response:
 
         html_message = render_to_string('welcome.html', context)
 
-        send_mail(
+        queue_mail(
             subject='Welcome email',
             message='Welcome',
             from_email=settings.EMAIL_HOST_USER,
@@ -116,16 +119,16 @@ def create_insurer(request: Request) -> Response:
     },
     tags=['Insurer'],
 )
+@reads_from_replica
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def list_all_agents_for_insurer(request: Request):
-    user_id = request.user.id
-    user = get_object_or_404(CustomUser, pk=user_id)
+    principal = get_principal(request)
 
-    if not user.is_insurer:
+    if not principal.is_insurer:
         return Response({'error': 'This user is not an insurer'}, status.HTTP_400_BAD_REQUEST)
 
-    insurer = get_object_or_404(Insurer, user=user)
+    insurer = principal.get_insurer()
     query_set = insurer.agent_set.all()
 
     serializer_class = AgentSerializer(query_set, many=True)
@@ -134,11 +137,12 @@ def list_all_agents_for_insurer(request: Request):
 
 @swagger_auto_schema(
     method='POST',
-    operation_description='Generate SignUp Link for Agents',
+    operation_description='Generate SignUp Link for Agents. Invitations are sent by a background job; follow '
+    'its progress with the returned job_id.',
     request_body=CustomAgentSerializer,
     responses={
-        200: openapi.Response(
-            'OK',
+        202: openapi.Response(
+            'Accepted',
             SuccessfulInsurerAgentSignupSerializer,
         ),
         400: 'Bad Request',
@@ -150,66 +154,33 @@ def list_all_agents_for_insurer(request: Request):
 @permission_classes([IsAuthenticated])
 def invite_agents(request):
     serializer_class = CustomAgentSerializer(data=request.data)
-    user_id = request.user.id
-    user = get_object_or_404(CustomUser, pk=user_id)
+    principal = get_principal(request)
 
-    if not user.is_insurer:
+    if not principal.is_insurer:
         return Response({'error': 'This user is not an insurer'}, status.HTTP_400_BAD_REQUEST)
 
-    insurer = get_object_or_404(Insurer, user=user)
-    unyte_unique_insurer_id = insurer.unyte_unique_insurer_id
+    insurer = principal.get_insurer()
 
     if not serializer_class.is_valid():
         return Response(serializer_class.errors, status.HTTP_400_BAD_REQUEST)
 
     agent_list = serializer_class.validated_data.get('agents_list')
-    email_recipients = []
-
-    relative_link = reverse('agents:register-agent')
-    relative_link = relative_link.replace('/api/', '/')
-    link = gen_sign_up_url_for_agent(relative_link, unyte_unique_insurer_id)
-
-    current_year = timezone.now().year
-    company_name = insurer.business_name
-
-    for agent in agent_list:
-        name = agent['names']
-        email = agent['emails']
-
-        context = {
-            'current_year': current_year,
-            'company_name': company_name,
-            'unyte_unique_insurer_id': unyte_unique_insurer_id,
-            'name': name,
-        }
-        invited_agents = InvitedAgents.objects.create(
-            insurer=insurer,
-            agent_email=email
-        )
-        invited_agents.save()
-        html_message = render_to_string('invitation.html', context)
-        email_recipients.append(email)
-        """
-        Sends email to the email of agents
-        """
-        send_mail(
-            subject='Agent SignUp Link',
-            message=f'{link}',
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=email_recipients,
-            html_message=html_message,
-        )
-        email_recipients.pop(0)
+    job = InvitationJob.objects.create(
+        insurer=insurer,
+        agents=[{'names': agent['names'], 'emails': agent['emails']} for agent in agent_list],
+    )
+    link = agent_sign_up_link(insurer)
 
-    return Response({'message': f'Link generated: {link}'})
+    return Response({'message': f'Link generated: {link}', 'job_id': job.id}, status.HTTP_202_ACCEPTED)
 
 
 @swagger_auto_schema(
     method='POST',
-    operation_description='Generate SignUp Link for Agents through CSV file',
+    operation_description='Generate SignUp Link for Agents through CSV file. Invitations are sent by a background '
+    'job; follow its progress with the returned job_id.',
     responses={
-        200: openapi.Response(
-            'OK',
+        202: openapi.Response(
+            'Accepted',
             SuccessfulInsurerAgentSignupCSVSerializer,
         ),
         400: 'Bad Request',
@@ -220,8 +191,8 @@ def invite_agents(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def invite_agents_csv(request):
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    if not user.is_insurer:
+    principal = get_principal(request)
+    if not principal.is_insurer:
         return Response({'error': 'This user is not an insurer'}, status.HTTP_400_BAD_REQUEST)
 
     serializer_class = UploadCSVFileSerializer(data=request.data)
@@ -229,26 +200,18 @@ def invite_agents_csv(request):
     if not serializer_class.is_valid():
         return Response(serializer_class.errors, status.HTTP_400_BAD_REQUEST)
 
-    insurer = get_object_or_404(Insurer, user=user)
-    unyte_unique_insurer_id = insurer.unyte_unique_insurer_id
-    company_name = insurer.business_name
-    current_year = timezone.now().year
-
-    relative_link = reverse('agents:register-agent')
-    relative_link = relative_link.replace('/api/', '/')
-    link = gen_sign_up_url_for_agent(relative_link, unyte_unique_insurer_id)
+    insurer = principal.get_insurer()
 
     try:
         otp = serializer_class.validated_data.get('otp')
 
-        if otp != insurer.otp:
-            return Response({'error': 'Invalid OTP'}, status.HTTP_400_BAD_REQUEST)
+        verified = OTP_SERVICE.verify(insurer.user_id, otp)
 
-        otp_created_time = insurer.otp_created_at
-        verify = verify_otp(otp_created_time)
+        if verified == INCORRECT:
+            return Response({'error': 'Invalid OTP'}, status.HTTP_400_BAD_REQUEST)
 
-        if not verify:
-            message = {'error': 'OTP has expired'}
+        if verified != VALID:
+            message = {'error': OTP_ERRORS[verified]}
             return Response(message, status=status.HTTP_400_BAD_REQUEST)
 
         file = request.FILES['agents_csv']
@@ -258,73 +221,61 @@ def invite_agents_csv(request):
                 {'error': f'Unacceptable file format {file_extension}. Must be a csv file'},
                 status.HTTP_400_BAD_REQUEST,
             )
-        csv_file = TextIOWrapper(file.file, encoding='utf-8')
-        csv_reader = csv.reader(csv_file, delimiter=',')
-        all_rows = list(csv_reader)
-        name_header = all_rows[0][0]
-        email_header = all_rows[0][1]
 
         """
-        Check csv file headers for correct agent invitation header format.
+        Check csv file headers for correct agent invitation header format. Only the header is read here;
+        the rows are streamed by the invitation job.
         """
-        if name_header not in ['name', 'names']:
-            return Response({
-                "error": f"Invalid header {name_header}"
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-        if email_header not in ['email', 'emails']:
-            return Response({
-                "error": f"Invalid header {email_header}"
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-        for agent in range(len(all_rows)):
-            if agent == 0:
-                pass
-            else:
-                agent_name = all_rows[agent][0]
-                agent_email = all_rows[agent][1]
-
-                context = {
-                    'current_year': current_year,
-                    'company_name': company_name,
-                    'unyte_unique_insurer_id': unyte_unique_insurer_id,
-                    'name': agent_name,
-                }
-                html_message = render_to_string('invitation.html', context)
-                invited_agents = InvitedAgents.objects.create(
-                    insurer=insurer,
-                    agent_email=agent_email
-                )
-                invited_agents.save()
-                """
-                Sends email to the email of agents
-                """
-                send_mail(
-                    subject='Agent SignUp Link',
-                    message=f'{link}',
-                    from_email=settings.EMAIL_HOST_USER,
-                    recipient_list=[agent_email, settings.TO_EMAIL],
-                    html_message=html_message,
-                )
-        return Response({'message': f'Successfully sent out invite links to {len(all_rows) - 1} agent(s)'})
+        csv_file = open_csv(file.file)
+        header = next(csv.reader(csv_file, delimiter=','), [])
+        csv_file.detach()
+        file.seek(0)
+
+        header_error = csv_header_error(header)
+        if header_error is not None:
+            return Response({'error': header_error}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = InvitationJob.objects.create(insurer=insurer, agents_csv=file, copy_to_admin=True)
+        return Response(
+            {'message': f'Invite links are being sent out to the agents in {file.name}', 'job_id': job.id},
+            status.HTTP_202_ACCEPTED,
+        )
     except Exception as e:
         return Response({'error': f'{e.__str__()}'}, status.HTTP_400_BAD_REQUEST)
 
 
+@swagger_auto_schema(
+    method='GET',
+    operation_description='Progress of an agent invitation job',
+    responses={200: openapi.Response('OK', InvitationJobSerializer), 400: 'Bad Request', 404: 'Not Found'},
+    tags=['Insurer'],
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def view_invitation_job(request, job_id: int) -> Response:
+    principal = get_principal(request)
+    if not principal.is_insurer:
+        return Response({'error': 'This user is not an insurer'}, status.HTTP_400_BAD_REQUEST)
+
+    job = get_object_or_404(InvitationJob, pk=job_id, insurer=principal.get_insurer())
+    return Response(InvitationJobSerializer(job).data, status.HTTP_200_OK)
+
+
 @swagger_auto_schema(
     method='GET',
     operation_description='View Insurer Profile',
     responses={200: 'OK', 400: 'Bad Request', 404: 'Not Found'},
     tags=['Insurer'],
 )
+@reads_from_replica
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def view_insurer_profile(request) -> Response:
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    insurer = get_object_or_404(Insurer, user=user)
+    principal = get_principal(request)
+    insurer = principal.get_insurer()
     insurer_profile = get_object_or_404(InsurerProfile, insurer=insurer)
 
-    insurer_email = user.email
+    insurer_email = principal.user.email
     insurer_business_name = insurer.business_name
     insurer_profile_pic = insurer_profile.profile_image.url
 
@@ -348,12 +299,12 @@ def view_insurer_profile(request) -> Response:
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def update_profile_image(request) -> Response:
-    user = get_object_or_404(CustomUser, pk=request.user.id)
+    principal = get_principal(request)
 
-    if not user.is_insurer:
+    if not principal.is_insurer:
         return Response({'error': 'This user is not an insurer'}, status.HTTP_400_BAD_REQUEST)
 
-    insurer = get_object_or_404(Insurer, user=user)
+    insurer = principal.get_insurer()
     insurer_profile_obj = get_object_or_404(InsurerProfile, insurer=insurer)
     serializer_class = UpdateProfileImageSerializer(insurer_profile_obj, data=request.data, partial=True)
     if not serializer_class.is_valid():
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merchants', '0002_merchant_merchant_code'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='merchant',
+            name='otp',
+        ),
+        migrations.RemoveField(
+            model_name='merchant',
+            name='otp_created_at',
+        ),
+    ]
@@ -5,6 +5,8 @@ from django_resized import ResizedImageField
 from django.db import models
 from django.conf import settings
 
+from user.models import PrincipalQuerySet
+
 
 class Merchant(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -72,8 +74,8 @@ class Merchant(models.Model):
         default='MER-123',
         help_text='Agent merchant code for merchant representation on superpool'
     )
-    otp = models.CharField(unique=True, max_length=6, blank=True, null=True)
-    otp_created_at = models.TimeField(blank=True, null=True)
+
+    objects = PrincipalQuerySet.as_manager()
 
 
 class MerchantProfile(models.Model):
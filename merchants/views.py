@@ -1,12 +1,13 @@
 from django.conf import settings
 from django.utils import timezone
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 
 from rest_framework import status
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 
+from notifications.outbox import queue_mail
+
 from .serializers import MerchantSerializer, CreateMerchantSerializer
 
 
@@ -35,7 +36,7 @@ class CreateMerchantAPIView(GenericAPIView):
 
             html_message = render_to_string('merchants/welcome.html', context)
 
-            send_mail(
+            queue_mail(
                 subject='Welcome email',
                 message='Welcome',
                 from_email=settings.EMAIL_HOST_USER,
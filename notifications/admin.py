@@ -0,0 +1,18 @@
+from django.utils import timezone
+from django.contrib import admin
+
+from .models import OutboundEmail
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients')
+    actions = ('requeue',)
+
+    @admin.action(description='Requeue selected emails')
+    def requeue(self, request, queryset):
+        queryset.exclude(status=OutboundEmail.SENT).update(
+            status=OutboundEmail.PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import process_batch
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbound email. Runs until stopped unless --once is given.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the outbox once and exit')
+        parser.add_argument('--batch-size', type=int, default=None, help='Defaults to OUTBOX_BATCH_SIZE')
+        parser.add_argument('--idle-sleep', type=float, default=2.0, help='Seconds to wait when nothing is due')
+
+    def handle(self, *args, **options):
+        while True:
+            counts = process_batch(options['batch_size'])
+            if any(counts.values()):
+                self.stdout.write(
+                    f'sent {counts["sent"]}, will retry {counts["retried"]}, dead-lettered {counts["dead"]}'
+                )
+                continue
+            if options['once']:
+                return
+            time.sleep(options['idle_sleep'])
@@ -0,0 +1,39 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboundEmail(models.Model):
+    PENDING = 'PENDING'
+    SENDING = 'SENDING'
+    SENT = 'SENT'
+    DEAD = 'DEAD'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (DEAD, 'Dead'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField(help_text='Plain text body')
+    html_body = models.TextField(default='', blank=True, help_text='HTML alternative, if any')
+    from_email = models.CharField(max_length=254, default='', blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(default='', blank=True)
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now, help_text='When the worker may next pick this email up'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'OUTBOUND EMAIL'
+        verbose_name_plural = 'OUTBOUND EMAILS'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} -> {", ".join(self.recipients)}'
@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+from django.db import connection as db_connection, transaction
+from django.conf import settings
+from django.utils import timezone
+from django.core.mail import EmailMultiAlternatives, get_connection
+
+from .models import OutboundEmail
+
+
+def queue_mail(
+    subject: str,
+    message: str,
+    from_email: str | None,
+    recipient_list: list,
+    html_message: str | None = None,
+) -> OutboundEmail:
+    """
+    Drop-in replacement for ``django.core.mail.send_mail`` that stores the email in the outbox and returns
+    straight away. The ``send_queued_mail`` worker delivers it.
+    """
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        html_body=html_message or '',
+        from_email=from_email or '',
+        recipients=[recipient for recipient in recipient_list if recipient],
+    )
+
+
+def queue_mass_mail(emails: list[OutboundEmail], batch_size: int = 1000) -> list[OutboundEmail]:
+    """
+    Queue many unsaved ``OutboundEmail`` rows with one INSERT per ``batch_size``.
+    """
+    return OutboundEmail.objects.bulk_create(emails, batch_size=batch_size)
+
+
+def claim_batch(batch_size: int | None = None) -> list[OutboundEmail]:
+    """
+    Lease up to ``batch_size`` due emails to this worker. Leased rows are marked SENDING until
+    ``OUTBOX_LEASE_SECONDS`` from now; if the worker dies before finishing, they become due again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = OutboundEmail.objects.filter(
+            status__in=(OutboundEmail.PENDING, OutboundEmail.SENDING), next_attempt_at__lte=now
+        ).order_by('next_attempt_at', 'id')
+        if db_connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        emails = list(due[:batch_size or settings.OUTBOX_BATCH_SIZE])
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            status=OutboundEmail.SENDING, next_attempt_at=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+        )
+    return emails
+
+
+def _as_message(email: OutboundEmail, connection) -> EmailMultiAlternatives:
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or None,
+        to=email.recipients,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def _mark_failed(email: OutboundEmail, error: Exception) -> None:
+    email.attempts += 1
+    email.last_error = f'{type(error).__name__}: {error}'
+    if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        email.status = OutboundEmail.DEAD
+    else:
+        email.status = OutboundEmail.PENDING
+        backoff = settings.OUTBOX_RETRY_BACKOFF * 2 ** (email.attempts - 1)
+        email.next_attempt_at = timezone.now() + timedelta(seconds=backoff)
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def deliver(emails: list[OutboundEmail], backend: str | None = None) -> dict:
+    """
+    Send ``emails`` over one mail connection, reopening it only after a failure. Each email is settled on
+    its own: SENT, back to PENDING with exponential backoff, or DEAD once it runs out of attempts. When the
+    connection cannot be opened at all, every email counts a failed attempt.
+    """
+    counts = {'sent': 0, 'retried': 0, 'dead': 0}
+    if not emails:
+        return counts
+
+    connection = get_connection(backend or settings.OUTBOX_EMAIL_BACKEND)
+    try:
+        connection.open()
+    except Exception as error:
+        for email in emails:
+            _mark_failed(email, error)
+            counts['dead' if email.status == OutboundEmail.DEAD else 'retried'] += 1
+        return counts
+
+    try:
+        for email in emails:
+            try:
+                _as_message(email, connection).send()
+            except Exception as error:
+                _mark_failed(email, error)
+                counts['dead' if email.status == OutboundEmail.DEAD else 'retried'] += 1
+                connection.close()
+                continue
+            email.status = OutboundEmail.SENT
+            email.sent_at = timezone.now()
+            email.save(update_fields=['status', 'sent_at'])
+            counts['sent'] += 1
+    finally:
+        connection.close()
+    return counts
+
+
+def process_batch(batch_size: int | None = None, backend: str | None = None) -> dict:
+    return deliver(claim_batch(batch_size), backend=backend)
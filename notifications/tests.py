@@ -0,0 +1,103 @@
+from io import StringIO
+from smtplib import SMTPServerDisconnected
+from datetime import timedelta
+
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.core.management import call_command
+from django.core.mail.backends.locmem import EmailBackend
+
+from .models import OutboundEmail
+from .outbox import queue_mail, process_batch
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+
+class FlakyBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise SMTPServerDisconnected('Connection unexpectedly closed')
+
+
+class UnreachableBackend(EmailBackend):
+    def open(self):
+        raise ConnectionRefusedError(111, 'Connection refused')
+
+
+@override_settings(
+    OUTBOX_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    OUTBOX_MAX_ATTEMPTS=2,
+    OUTBOX_RETRY_BACKOFF=60,
+)
+class OutboxTestCase(TestCase):
+    def queue(self, count=1):
+        return [
+            queue_mail(
+                subject='Login OTP',
+                message='123456',
+                from_email='noreply@unyte.com',
+                recipient_list=[None, f'insurer{index}@example.com'],
+                html_message='<b>123456</b>',
+            )
+            for index in range(count)
+        ]
+
+    def test_queue_mail_only_stores_the_email(self):
+        email = self.queue()[0]
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(email.status, OutboundEmail.PENDING)
+        self.assertEqual(email.recipients, ['insurer0@example.com'])
+
+    def test_worker_sends_due_emails_over_one_connection(self):
+        self.queue(5)
+        CountingBackend.opened = 0
+
+        counts = process_batch(backend='notifications.tests.CountingBackend')
+
+        self.assertEqual(counts, {'sent': 5, 'retried': 0, 'dead': 0})
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(mail.outbox[0].alternatives, [('<b>123456</b>', 'text/html')])
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.SENT).exists())
+
+    def test_failures_back_off_then_dead_letter(self):
+        email = self.queue()[0]
+
+        self.assertEqual(process_batch(backend='notifications.tests.FlakyBackend')['retried'], 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.PENDING)
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        self.assertIn('SMTPServerDisconnected', email.last_error)
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_batch(backend='notifications.tests.FlakyBackend')['dead'], 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.DEAD)
+
+    def test_unreachable_server_backs_off_the_whole_batch(self):
+        self.queue(3)
+
+        counts = process_batch(backend='notifications.tests.UnreachableBackend')
+
+        self.assertEqual(counts, {'sent': 0, 'retried': 3, 'dead': 0})
+        for email in OutboundEmail.objects.all():
+            self.assertEqual(email.status, OutboundEmail.PENDING)
+            self.assertEqual(email.attempts, 1)
+            self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+            self.assertIn('ConnectionRefusedError', email.last_error)
+
+    def test_expired_leases_are_picked_up_again(self):
+        email = self.queue()[0]
+        OutboundEmail.objects.update(status=OutboundEmail.SENDING, next_attempt_at=timezone.now())
+
+        call_command('send_queued_mail', '--once', stdout=StringIO())
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.SENT)
+        self.assertEqual(len(mail.outbox), 1)
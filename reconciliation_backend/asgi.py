@@ -2,6 +2,8 @@
 ASGI config for reconciliation_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The Superpool proxy endpoints are async views, so serving through this module lets
+one worker keep many upstream calls in flight instead of blocking on each one.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -9,8 +11,26 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 
 import os
 
+from dotenv import find_dotenv, load_dotenv
+
+from django.conf import settings
 from django.core.asgi import get_asgi_application
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+
+load_dotenv(find_dotenv())
+
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reconciliation_backend.settings')
+env = os.getenv('ENV')
+if env == 'dev':
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reconciliation_backend.settings.dev')
+if env == 'staging':
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reconciliation_backend.settings.staging')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reconciliation_backend.settings.prod')
+# Requests run their sync code on a new thread each under ASGI, so connections must not outlive the request
+# here; set DB_POOL_MODE to pgbouncer to pool them.
+os.environ.setdefault('DB_POOL_MODE', 'off')
 
 application = get_asgi_application()
+# As runserver does; in deployments the static files are served in front of Django
+if settings.DEBUG:
+    application = ASGIStaticFilesHandler(application)
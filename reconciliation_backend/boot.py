@@ -0,0 +1,114 @@
+"""
+Where the time goes when a process starts: importing the settings, populating the app registry (importing
+every app and its models and running their ``ready()``) and loading the URLconf, which imports the views.
+
+The boot is measured in a fresh interpreter run with ``-X importtime``, so modules the calling process has
+already imported are counted, and every module's import time is attributed to the chain of imports that
+pulled it in. ``BootProfile.folded`` writes them as folded stacks, the input format of flamegraph.pl and
+speedscope.
+"""
+
+import os
+import sys
+import json
+import subprocess
+from collections import Counter
+from dataclasses import dataclass
+
+# Runs in the child interpreter and prints the duration of each phase, in seconds, as its last line.
+BOOT_SCRIPT = """
+import json, time
+started = time.perf_counter()
+from django.conf import settings
+settings.INSTALLED_APPS
+settings_loaded = time.perf_counter()
+import django
+django.setup()
+apps_ready = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls_loaded = time.perf_counter()
+print(json.dumps({
+    'settings': settings_loaded - started,
+    'apps': apps_ready - settings_loaded,
+    'urls': urls_loaded - apps_ready,
+}))
+"""
+
+IMPORTTIME_PREFIX = 'import time:'
+
+
+@dataclass(frozen=True)
+class ImportRecord:
+    """
+    One module's import, with the modules that imported it first in ``stack``.
+    """
+
+    stack: tuple[str, ...]
+    self_us: int
+    cumulative_us: int
+
+    @property
+    def module(self) -> str:
+        return self.stack[-1]
+
+
+@dataclass(frozen=True)
+class BootProfile:
+    settings_module: str
+    # Seconds spent in each phase, in the order they run
+    phases: dict[str, float]
+    imports: list[ImportRecord]
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.phases.values()) * 1000
+
+    def slowest_packages(self, count: int) -> list[tuple[str, int]]:
+        """
+        The ``count`` top level packages whose modules took longest to import, with the microseconds they took.
+        """
+        totals = Counter()
+        for record in self.imports:
+            totals[record.module.split('.')[0]] += record.self_us
+        return totals.most_common(count)
+
+    def folded(self) -> str:
+        return ''.join(f'{";".join(record.stack)} {record.self_us}\n' for record in self.imports)
+
+
+def parse_importtime(output: str) -> list[ImportRecord]:
+    """
+    The imports reported on stderr by ``python -X importtime``. Python prints a module after the modules it
+    imported, indented by two spaces per level, so reading the lines backwards visits every parent first.
+    """
+    records = []
+    stack: list[str] = []
+    for line in reversed(output.splitlines()):
+        if not line.startswith(IMPORTTIME_PREFIX):
+            continue
+        self_us, cumulative_us, name = line.removeprefix(IMPORTTIME_PREFIX).split('|')
+        if not self_us.strip().isdigit():
+            # The header line
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        stack = [*stack[:depth], name.strip()]
+        records.append(ImportRecord(tuple(stack), int(self_us), int(cumulative_us)))
+    records.reverse()
+    return records
+
+
+def profile_boot(settings_module: str, python: str = sys.executable) -> BootProfile:
+    """
+    Boot a new interpreter with ``settings_module`` and profile it. Raises RuntimeError if it fails to boot.
+    """
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module}
+    result = subprocess.run(  # noqa: S603
+        [python, '-X', 'importtime', '-c', BOOT_SCRIPT], env=env, capture_output=True, text=True, check=False
+    )
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith(IMPORTTIME_PREFIX)]
+        msg = f'Booting {settings_module} failed:\n' + '\n'.join(errors[-20:])
+        raise RuntimeError(msg)
+    phases = json.loads(result.stdout.strip().splitlines()[-1])
+    return BootProfile(settings_module, phases, parse_importtime(result.stderr))
@@ -0,0 +1,213 @@
+"""
+Brotli and gzip compression of API responses. Only the types in ``COMPRESSION_CONTENT_TYPES`` are
+compressed: JSON, NDJSON and CSV, which shrink many times over. HTML is left alone, so pages carrying a CSRF
+token are not open to BREACH. Bodies shorter than ``COMPRESSION_MIN_LENGTH`` are not worth the CPU.
+
+Superpool bytes sent on unchanged (``superpool_proxy.passthrough``) are compressed when they are stored in
+the dashboard cache, with ``precompress``, and the view hands the result to the middleware as the response's
+``precompressed`` bodies. Any other response with a strong ETag has the same bytes every time it is sent,
+so its compressed body is kept under that ETag the first time it is sent and reused on later requests: each
+rendered Superpool list and page of it while it stays cached (their ETags come from
+``superpool_proxy.conditional``), and the OpenAPI schema. Streamed responses, such as the exports, are
+compressed a chunk at a time.
+"""
+
+import gzip
+import zlib
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator, AsyncIterator
+
+import brotli
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+# In order of preference when a client accepts both
+ENCODINGS = ('br', 'gzip')
+
+
+def accepted_encoding(accept_encoding: str) -> str | None:
+    """
+    The encoding to use for a request with this Accept-Encoding header, or None for none.
+    """
+    weights = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        weight = 1.0
+        name, _, value = params.strip().partition('=')
+        if name.strip() == 'q':
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    for encoding in ENCODINGS:
+        if weights.get(encoding, weights.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    # mtime=0 so the same content always compresses to the same bytes
+    return gzip.compress(content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def precompress(content: bytes) -> dict[str, bytes]:
+    """
+    ``content`` in each of ``ENCODINGS``, for a body that is stored once and sent many times. Empty when
+    ``content`` is too short to be compressed.
+    """
+    if len(content) < settings.COMPRESSION_MIN_LENGTH:
+        return {}
+    return {encoding: compress(content, encoding) for encoding in ENCODINGS}
+
+
+class _StreamCompressor:
+    """
+    Compresses a stream one chunk at a time, flushing after each so a chunk reaches the client as soon as
+    it is produced rather than when the compressor's buffer fills.
+    """
+
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, content: bytes) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.process(content) + self._compressor.flush()
+        return self._compressor.compress(content) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish() if self.encoding == 'br' else self._compressor.flush()
+
+
+def compress_stream(chunks: Iterator[bytes], encoding: str) -> Iterator[bytes]:
+    compressor = _StreamCompressor(encoding)
+    for chunk in chunks:
+        compressed = compressor.chunk(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.finish()
+
+
+async def acompress_stream(chunks: AsyncIterator[bytes], encoding: str) -> AsyncIterator[bytes]:
+    compressor = _StreamCompressor(encoding)
+    async for chunk in chunks:
+        compressed = compressor.chunk(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.finish()
+
+
+class CompressedBodies:
+    """
+    LRU of compressed bodies keyed by path, strong ETag and encoding, bounded by the bytes it holds.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> bytes | None:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key: tuple, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            self.size += len(body) - (len(previous) if previous is not None else 0)
+            self._entries[key] = body
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+COMPRESSED_BODIES = CompressedBodies(settings.COMPRESSION_CACHE_MAX_BYTES)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, whichever the client prefers, reusing compressed bodies by ETag.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if response.has_header('Content-Encoding') or content_type not in settings.COMPRESSION_CONTENT_TYPES:
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_LENGTH:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = accepted_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            compressed = self.compressed_body(request, response, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            # The compressed bytes differ from the identity ones, so the ETag no longer names them exactly
+            response['ETag'] = f'W/{etag}'
+        response['Content-Encoding'] = encoding
+        return response
+
+    def compressed_body(self, request, response, encoding: str) -> bytes:
+        precompressed = getattr(response, 'precompressed', None) or {}
+        if encoding in precompressed:
+            return precompressed[encoding]
+        etag = response.get('ETag')
+        if response.status_code != 200 or not etag or not etag.startswith('"'):
+            return compress(response.content, encoding)
+        key = (request.path, etag, encoding)
+        compressed = COMPRESSED_BODIES.get(key)
+        if compressed is None:
+            compressed = compress(response.content, encoding)
+            COMPRESSED_BODIES.set(key, compressed)
+        return compressed
@@ -0,0 +1,60 @@
+"""
+Connection handling for the Postgres databases in the settings modules, chosen with ``DB_POOL_MODE``:
+
+- ``off``: Django's default, a new connection per request. The ASGI entrypoint defaults to this, because
+  under ASGI every request runs its sync code on a fresh thread and a persistent connection would be
+  left open per thread.
+- ``persistent``: keep each connection open for ``DB_CONN_MAX_AGE`` seconds and check it is still alive
+  before reusing it. For gunicorn sync workers and the management command workers.
+- ``pgbouncer``: connect through pgbouncer running in transaction pooling mode. Django opens a cheap
+  connection to pgbouncer per request and pgbouncer hands out server connections per transaction, so it
+  suits the ASGI path. Server-side cursors are disabled because they do not survive the end of a
+  transaction in that mode.
+
+A read replica, see ``reconciliation_backend.replicas``, uses the same settings as the primary apart from
+its host and port.
+"""
+
+from django.db import DEFAULT_DB_ALIAS
+from django.core.exceptions import ImproperlyConfigured
+
+OFF = 'off'
+PERSISTENT = 'persistent'
+PGBOUNCER = 'pgbouncer'
+
+POOL_MODES = (OFF, PERSISTENT, PGBOUNCER)
+
+
+def postgres_database(
+    database: dict,
+    mode: str,
+    conn_max_age: int = 60,
+    pgbouncer_host: str | None = None,
+    pgbouncer_port: str | None = None,
+) -> dict:
+    """
+    ``database`` with the connection settings of pooling ``mode`` applied.
+    """
+    if mode not in POOL_MODES:
+        msg = f'DB_POOL_MODE must be one of {", ".join(POOL_MODES)}, not {mode!r}'
+        raise ImproperlyConfigured(msg)
+
+    database = dict(database)
+    if mode == OFF:
+        database['CONN_MAX_AGE'] = 0
+    elif mode == PERSISTENT:
+        database['CONN_MAX_AGE'] = conn_max_age
+        database['CONN_HEALTH_CHECKS'] = True
+    else:
+        if not pgbouncer_host:
+            raise ImproperlyConfigured('DB_POOL_MODE=pgbouncer needs PGBOUNCER_HOST')
+        database.update(HOST=pgbouncer_host, PORT=pgbouncer_port or '6432', CONN_MAX_AGE=0)
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+    return database
+
+
+def replica_database(primary: dict, host: str, port: str | None = None) -> dict:
+    """
+    The settings of a read replica of ``primary`` at ``host``. Tests read from the primary instead.
+    """
+    return {**primary, 'HOST': host, 'PORT': port or primary.get('PORT'), 'TEST': {'MIRROR': DEFAULT_DB_ALIAS}}
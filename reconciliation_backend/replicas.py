@@ -0,0 +1,132 @@
+"""
+Read replica routing. Views marked with ``reads_from_replica`` send their reads for safe methods to the
+``replica`` database, when one is configured; everything else, including management commands and the
+workers, uses ``default``.
+
+Once a request writes, the rest of it reads from ``default``, and so do the next ``REPLICA_PIN_SECONDS``
+of requests made with the same Authorization header, so a client sees its own writes while the replica
+catches up.
+"""
+
+import hashlib
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.conf import settings
+from django.core.cache import cache
+
+REPLICA_DB_ALIAS = 'replica'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingState:
+    """
+    Routing decisions for one request. Shared by reference with the threads the request's sync code runs
+    on, so a write made on any of them pins the whole request.
+    """
+
+    def __init__(self, pin_key: str | None) -> None:
+        self.pin_key = pin_key
+        self.use_replica = False
+        self.wrote = False
+
+
+_state: ContextVar[RoutingState | None] = ContextVar('replica_routing_state', default=None)
+
+
+def reads_from_replica(view):
+    """
+    Let ``view`` read from the replica for GET, HEAD and OPTIONS. Apply it above ``api_view``.
+    """
+    view.reads_from_replica = True
+    return view
+
+
+def replica_configured() -> bool:
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def _pin_key(request) -> str | None:
+    authorization = request.headers.get('Authorization')
+    if not authorization:
+        return None
+    return f'replica:pin:{hashlib.sha256(authorization.encode()).hexdigest()}'
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return DEFAULT_DB_ALIAS
+        # Reads inside a transaction must see what it has written and the replica cannot, nor can it see a
+        # test case's data.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        # Explicitly, so that rows read from the replica are not saved back to it.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same rows.
+        aliases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        if {obj1._state.db, obj2._state.db} <= aliases:  # noqa: SLF001
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is kept up to date by replication.
+        return db != REPLICA_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Track reads and writes per request for ``ReplicaRouter`` and pin clients to ``default`` after they write.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = RoutingState(_pin_key(request))
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and state.pin_key:
+            cache.set(state.pin_key, 1, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState(_pin_key(request))
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and state.pin_key:
+            await cache.aset(state.pin_key, 1, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs) -> None:
+        state = _state.get()
+        if state is None or not replica_configured():
+            return
+        if request.method not in SAFE_METHODS or not getattr(view_func, 'reads_from_replica', False):
+            return
+        state.use_replica = state.pin_key is None or not cache.get(state.pin_key)
@@ -0,0 +1,113 @@
+"""
+The OpenAPI schema under ``docs/json/``, generated once at build time by ``manage.py generate_openapi_schema``
+rather than on every request, since introspecting the nested serializers of the agents and Superpool views
+takes hundreds of milliseconds.
+
+The file at ``OPENAPI_SCHEMA_PATH`` is versioned by its SHA-256. ``docs/json/`` serves it with that version as
+its ETag, to be revalidated on every use, and ``docs/json/<version>/``, which the Swagger and ReDoc pages load,
+as immutable. Without the file, dev settings (``OPENAPI_SCHEMA_LAZY``) generate it on the first request.
+"""
+
+import hashlib
+import threading
+from pathlib import Path
+from dataclasses import dataclass
+
+from drf_yasg import openapi, renderers
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.generators import OpenAPISchemaGenerator
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control, get_conditional_response
+from django.core.exceptions import ImproperlyConfigured
+from django.views.decorators.http import require_safe
+
+API_INFO = openapi.Info(
+    title='Reconciliation Dashboard API',
+    default_version='v1',
+    description='Reconciliation Dashboard for integrated Insurers and Agents',
+    terms_of_service='https://www.google.com/policies/terms/',
+    contact=openapi.Contact(email='somtochukwuuchegbu@gmail.com'),
+    license=openapi.License(name='BSD License'),
+)
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+@dataclass(frozen=True)
+class SchemaArtifact:
+    content: bytes
+
+    @property
+    def version(self) -> str:
+        return hashlib.sha256(self.content).hexdigest()[:16]
+
+
+def generate_schema() -> bytes:
+    """
+    The schema of every endpoint in the URLconf, as served to an anonymous client.
+    """
+    schema = OpenAPISchemaGenerator(API_INFO).get_schema(request=None, public=True)
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+_artifact: SchemaArtifact | None = None
+_artifact_lock = threading.Lock()
+
+
+def load_schema() -> SchemaArtifact:
+    global _artifact  # noqa: PLW0603
+    if _artifact is None:
+        with _artifact_lock:
+            if _artifact is None:
+                _artifact = SchemaArtifact(_read_or_generate())
+    return _artifact
+
+
+def _read_or_generate() -> bytes:
+    try:
+        return Path(settings.OPENAPI_SCHEMA_PATH).read_bytes()
+    except FileNotFoundError:
+        if not settings.OPENAPI_SCHEMA_LAZY:
+            msg = f'{settings.OPENAPI_SCHEMA_PATH} is missing, run `manage.py generate_openapi_schema` when building'
+            raise ImproperlyConfigured(msg) from None
+    return generate_schema()
+
+
+def reset_schema() -> None:
+    """
+    Forget the loaded schema, so the next request reads or generates it again.
+    """
+    global _artifact  # noqa: PLW0603
+    _artifact = None
+
+
+@require_safe
+def schema_json(request, version=None):
+    schema = load_schema()
+    if version is not None and version != schema.version:
+        raise Http404
+
+    response = HttpResponse(schema.content, content_type='application/json')
+    response['ETag'] = f'"{schema.version}"'
+    if version is None:
+        patch_cache_control(response, public=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+def versioned_schema_url() -> str:
+    return reverse('schema-json-version', args=[load_schema().version])
+
+
+class SwaggerUIRenderer(renderers.SwaggerUIRenderer):
+    def get_swagger_ui_settings(self):
+        return {**super().get_swagger_ui_settings(), 'url': versioned_schema_url()}
+
+
+class ReDocRenderer(renderers.ReDocRenderer):
+    def get_redoc_settings(self):
+        return {**super().get_redoc_settings(), 'url': versioned_schema_url()}
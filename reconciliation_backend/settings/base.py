@@ -4,9 +4,6 @@ import os
 from pathlib import Path
 from datetime import timedelta
 
-from google.cloud import storage
-from google.oauth2 import service_account
-
 from django.conf import settings
 
 settings.configure()
@@ -29,23 +26,37 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
-    'drf_yasg',
     'user',
     'insurer',
     'agents',
     'merchants',
-    'django_extensions',
+    'superpool_proxy',
+    'notifications',
 ]
 
+# Apps only needed by people working on the API, which production can leave out to start faster (see
+# `manage.py boot_profile`): django_extensions with DEV_TOOLS_ENABLED, and drf_yasg, which serves the Swagger and
+# ReDoc pages under docs/, with API_DOCS_ENABLED. The views and docs/json/ use drf_yasg either way.
+DEV_TOOLS_ENABLED = os.getenv('DEV_TOOLS_ENABLED', 'True').lower() in ('true', '1')
+API_DOCS_ENABLED = os.getenv('API_DOCS_ENABLED', 'True').lower() in ('true', '1')
+OPTIONAL_APPS = {'drf_yasg': API_DOCS_ENABLED, 'django_extensions': DEV_TOOLS_ENABLED}
+INSTALLED_APPS += [app for app, enabled in OPTIONAL_APPS.items() if enabled]
+
+# Milliseconds a process may take to import its settings, populate the app registry and load the URLconf,
+# checked by `manage.py boot_profile` and the test suite
+BOOT_TIME_BUDGET_MS = float(os.getenv('BOOT_TIME_BUDGET_MS', '3000'))
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'reconciliation_backend.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'reconciliation_backend.replicas.ReplicaRoutingMiddleware',
 ]
 
 AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
@@ -93,18 +104,79 @@ SWAGGER_SETTINGS = {
     'SUPPORTED_SUBMIT_METHODS': ['get', 'post', 'put', 'delete', 'patch'],
 }
 
+# The OpenAPI schema served under docs/json/, written when the image is built by `manage.py generate_openapi_schema`,
+# see reconciliation_backend.schema. With OPENAPI_SCHEMA_LAZY a missing file is generated on the first request.
+OPENAPI_SCHEMA_PATH = BASE_DIR / 'openapi-schema.json'
+OPENAPI_SCHEMA_LAZY = False
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    # Tokens carry a hash of the password they were issued for, so resetting it revokes them
+    'CHECK_REVOKE_TOKEN': True,
 }
 
+# Brotli or gzip compression of the responses below, see reconciliation_backend.compression. Compressed bodies of
+# responses with an ETag are kept in each process, up to COMPRESSION_CACHE_MAX_BYTES.
+COMPRESSION_CONTENT_TYPES = ['application/json', 'application/x-ndjson', 'text/csv']
+COMPRESSION_MIN_LENGTH = int(os.getenv('COMPRESSION_MIN_LENGTH', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv('COMPRESSION_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+# Shared by every process so that principals cached or invalidated by one worker are seen by the others.
+# Without REDIS_URL each process falls back to Django's in-memory cache, which only dev and tests allow:
+# staging and prod refuse to start without it.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+
+# In-process cache of authenticated tokens in front of the shared cache; the TTL bounds how long an
+# invalidation made by another process takes to be seen
+PRINCIPAL_LOCAL_CACHE_MAX_ENTRIES = int(os.getenv('PRINCIPAL_LOCAL_CACHE_MAX_ENTRIES', '4096'))
+PRINCIPAL_LOCAL_CACHE_TTL = float(os.getenv('PRINCIPAL_LOCAL_CACHE_TTL', '30'))
+
+# Sign in OTPs live in the cache above, see user.otp
+OTP_TTL_SECONDS = int(os.getenv('OTP_TTL_SECONDS', '120'))
+OTP_MAX_ATTEMPTS = int(os.getenv('OTP_MAX_ATTEMPTS', '5'))
+
+# Postgres connection handling for the dev, staging and prod databases, see reconciliation_backend.database.
+# The ASGI entrypoint defaults DB_POOL_MODE to off.
+DB_POOL = {
+    'mode': os.getenv('DB_POOL_MODE', 'persistent'),
+    'conn_max_age': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+    'pgbouncer_host': os.getenv('PGBOUNCER_HOST'),
+    'pgbouncer_port': os.getenv('PGBOUNCER_PORT'),
+}
+
+# Views marked with reads_from_replica read from DATABASES['replica'] when DB_REPLICA_HOST is set, see
+# reconciliation_backend.replicas. A client reads from the primary for REPLICA_PIN_SECONDS after it writes.
+DATABASE_ROUTERS = ['reconciliation_backend.replicas.ReplicaRouter']
+DB_REPLICA = {'host': os.getenv('DB_REPLICA_HOST'), 'port': os.getenv('DB_REPLICA_PORT')}
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
+# Render and parse the API's JSON with orjson, see reconciliation_backend.renderers
+FAST_JSON = os.getenv('FAST_JSON', 'True').lower() in ('true', '1')
+
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': ('rest_framework_simplejwt.authentication.JWTAuthentication',),
+    'DEFAULT_AUTHENTICATION_CLASSES': ('user.authentication.PrincipalJWTAuthentication',),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'reconciliation_backend.renderers.ORJSONRenderer' if FAST_JSON else 'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'reconciliation_backend.renderers.ORJSONParser' if FAST_JSON else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Serve dashboard reads from the local Superpool mirror (see `manage.py sync_superpool`) once a tenant is synced
+SUPERPOOL_MIRROR_READS = os.getenv('SUPERPOOL_MIRROR_READS', 'False').lower() in ('true', '1')
+
 ROOT_URLCONF = 'reconciliation_backend.urls'
 
 TEMPLATES = [
@@ -132,47 +204,31 @@ DATABASES = {
     }
 }
 
-DEFAULT_FILE_STORAGE = 'storages.backends.gcloud.GoogleCloudStorage'
-STATICFILES_STORAGE = 'storages.backends.gcloud.GoogleCloudStorage'
+# Uploads and static files live on GCS. The service account credentials are loaded from GS_CREDENTIALS_PATH, a
+# local file or a gs:// URL, the first time the storage is used and cached on disk, see
+# reconciliation_backend.storage. An empty GS_CREDENTIALS_PATH uses the instance's default credentials.
+# FILE_STORAGE=local keeps files under MEDIA_ROOT and STATIC_ROOT instead, for offline development and tests.
+STORAGE_BACKENDS = {
+    'gcs': {
+        'default': {'BACKEND': 'reconciliation_backend.storage.LazyCredentialsGoogleCloudStorage'},
+        'staticfiles': {'BACKEND': 'reconciliation_backend.storage.LazyCredentialsGoogleCloudStorage'},
+    },
+    'local': {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+}
+FILE_STORAGE = os.getenv('FILE_STORAGE', 'gcs')
+STORAGES = STORAGE_BACKENDS[FILE_STORAGE]
 
+GS_PROJECT_ID = 'unyte-project'
 GS_BUCKET_NAME = 'reconciliations-dashboard'
-STATIC_URL = 'https://storage.googleapis.com/reconciliations-dashboard/static/'
-
-# Read the environment variable for the credentials file path
-credentials_file_path = os.getenv('GS_CREDENTIALS_PATH')
-
-if not credentials_file_path:
-    credentials_file_path = os.environ.setdefault(
-        'GS_CREDENTIALS_PATH', 'gs://reconciliations-dashboard/new-.json-sa.json'
-    )
-
-# Download the service account file from GCS if it's a GCS URL
-if credentials_file_path.startswith('gs://'):
-    bucket_name, blob_name = credentials_file_path.replace('gs://', '').split('/', 1)
-
-    # Define the temporary local file path
-    local_temp_file_path = Path('/tmp/service_account.json').resolve()
-
-    storage_client = storage.Client(project='unyte-project')
-
-    # Download the service account file from GCS
-    bucket = storage_client.bucket(bucket_name)
-    blob = bucket.blob(blob_name)
-    blob.download_to_filename(local_temp_file_path)
-
-    # Use the downloaded service account file to create credentials
-    GS_CREDENTIALS = service_account.Credentials.from_service_account_file(local_temp_file_path)
-
-    # Optionally, you can delete the temporary file after creating the credentials
-    local_temp_file_path.unlink()
-else:
-    # Use the credentials file directly if it's a local path
-    GS_CREDENTIALS = service_account.Credentials.from_service_account_file(credentials_file_path)
-
-# GS_CREDENTIALS = service_account.Credentials.from_service_account_file(
-#     os.path.join(BASE_DIR, 'unyte-project-b1cf8568d4c2.json')
-# )
-
+GS_CREDENTIALS_PATH = os.getenv('GS_CREDENTIALS_PATH', 'gs://reconciliations-dashboard/new-.json-sa.json')
+GS_CREDENTIALS_CACHE_DIR = os.getenv('GS_CREDENTIALS_CACHE_DIR', '/tmp/gcs-credentials')
+GS_CREDENTIALS_CACHE_TTL = int(os.getenv('GS_CREDENTIALS_CACHE_TTL', str(24 * 60 * 60)))
+STATIC_URL = (
+    'https://storage.googleapis.com/reconciliations-dashboard/static/' if FILE_STORAGE == 'gcs' else '/static/'
+)
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -210,3 +266,14 @@ TO_EMAIL = os.getenv('TO_EMAIL')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 EMAIL_PORT = os.getenv('EMAIL_PORT')
 EMAIL_USE_SSL = True
+
+# Outbound email is queued in the notifications outbox and delivered by `manage.py send_queued_mail`.
+# Point OUTBOX_EMAIL_BACKEND at django.core.mail.backends.console/filebased.EmailBackend to run it locally.
+OUTBOX_EMAIL_BACKEND = os.getenv('OUTBOX_EMAIL_BACKEND', EMAIL_BACKEND)
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_RETRY_BACKOFF = float(os.getenv('OUTBOX_RETRY_BACKOFF', '60'))
+OUTBOX_LEASE_SECONDS = int(os.getenv('OUTBOX_LEASE_SECONDS', '300'))
+INVITATION_CHUNK_SIZE = int(os.getenv('INVITATION_CHUNK_SIZE', '1000'))
+INVITATION_LEASE_SECONDS = int(os.getenv('INVITATION_LEASE_SECONDS', '300'))
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', BASE_DIR / 'sent_emails')
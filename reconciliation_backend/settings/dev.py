@@ -4,6 +4,7 @@
 import os
 
 from dotenv import find_dotenv, load_dotenv
+from reconciliation_backend.database import replica_database, postgres_database
 
 from .base import *
 
@@ -12,18 +13,23 @@ load_dotenv(find_dotenv())
 DEBUG = True
 ALLOWED_HOSTS = ['0.0.0.0', 'localhost']
 
+OPENAPI_SCHEMA_LAZY = True
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
-        'NAME': os.getenv('DB_NAME'),
-        'USER': os.getenv('DB_USER'),
-        'PASSWORD': os.getenv('DB_PASSWORD'),
-        'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT'),
-        'TEST': {
-            'NAME': 'testdb',
+    'default': postgres_database(
+        {
+            'ENGINE': 'django.db.backends.postgresql_psycopg2',
+            'NAME': os.getenv('DB_NAME'),
+            'USER': os.getenv('DB_USER'),
+            'PASSWORD': os.getenv('DB_PASSWORD'),
+            'HOST': os.getenv('DB_HOST'),
+            'PORT': os.getenv('DB_PORT'),
+            'TEST': {
+                'NAME': 'testdb',
+            },
         },
-    },
+        **DB_POOL,
+    ),
     'prod_db': {
         'ENGINE': 'django.db.backends.postgresql_psycopg2',
         'NAME': os.getenv('POSTGRES_NAME'),
@@ -34,5 +40,17 @@ DATABASES = {
     },
 }
 
+# Without a replica of its own, dev reads "replica" queries from a second connection to the same database, so
+# routing is exercised locally and in tests.
+DATABASES['replica'] = replica_database(
+    DATABASES['default'], DB_REPLICA['host'] or DATABASES['default']['HOST'], DB_REPLICA['port']
+)
+
+# Files stay on local disk unless FILE_STORAGE=gcs, so dev and the tests run offline.
+FILE_STORAGE = os.getenv('FILE_STORAGE', 'local')
+STORAGES = STORAGE_BACKENDS[FILE_STORAGE]
+if FILE_STORAGE == 'local':
+    STATIC_URL = '/static/'
+
 USE_X_FORWARDED_HOST = True
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -3,6 +3,9 @@
 import os
 
 from dotenv import find_dotenv, load_dotenv
+from reconciliation_backend.database import replica_database, postgres_database
+
+from django.core.exceptions import ImproperlyConfigured
 
 from .base import *
 
@@ -24,15 +27,28 @@ SWAGGER_SETTINGS = {
 }
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('DB_NAME'),
-        'USER': os.getenv('DB_USER'),
-        'PASSWORD': os.getenv('DB_PASS'),
-        'PORT': os.getenv('DB_PORT'),
-        'HOST': '/cloudsql/unyte-project:us-central1:dev-db',
-    }
+    'default': postgres_database(
+        {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME'),
+            'USER': os.getenv('DB_USER'),
+            'PASSWORD': os.getenv('DB_PASS'),
+            'PORT': os.getenv('DB_PORT'),
+            'HOST': '/cloudsql/unyte-project:us-central1:dev-db',
+        },
+        **DB_POOL,
+    )
 }
+if DB_REPLICA['host']:
+    DATABASES['replica'] = replica_database(DATABASES['default'], **DB_REPLICA)
+
+# Sign in OTPs and cached principals have to be seen by every process and instance, see user.otp and
+# user.principal, so the per-process fallback in base is not allowed here
+REDIS_URL = os.getenv('REDIS_URL')
+if not REDIS_URL:
+    msg = 'REDIS_URL must be set: without a shared cache each process keeps its own OTPs and principals'
+    raise ImproperlyConfigured(msg)
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
 
 LOGGING = {
     'version': 1,
@@ -0,0 +1,107 @@
+"""
+File storage on Google Cloud Storage, with the service account credentials loaded the first time the storage
+is used rather than when settings are imported, so starting a worker, running a management command or the
+test suite does not wait on a GCS download.
+
+A service account file at a ``gs://`` URL is downloaded once and kept in ``GS_CREDENTIALS_CACHE_DIR`` for
+``GS_CREDENTIALS_CACHE_TTL`` seconds, together with its SHA-256, so the other workers on the same instance
+read it from disk. A cached file whose checksum no longer matches is downloaded again.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+from google.cloud import storage
+from google.oauth2 import service_account
+from storages.backends.gcloud import GoogleCloudStorage
+
+from django.conf import settings
+
+
+class CredentialsCache:
+    def __init__(self, cache_dir, ttl: float, download=None, clock=time.time) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.download = download or download_blob
+        self.clock = clock
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        name = hashlib.sha256(url.encode()).hexdigest()
+        return self.cache_dir / f'{name}.json', self.cache_dir / f'{name}.meta'
+
+    def read(self, url: str) -> bytes | None:
+        """
+        The cached file for ``url``, or None if there is none, it expired or it does not match its checksum.
+        """
+        path, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text())
+            content = path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        if meta.get('url') != url or self.clock() - meta.get('fetched_at', 0) >= self.ttl:
+            return None
+        if hashlib.sha256(content).hexdigest() != meta.get('sha256'):
+            return None
+        return content
+
+    def write(self, url: str, content: bytes) -> None:
+        path, meta_path = self._paths(url)
+        meta = {'url': url, 'fetched_at': self.clock(), 'sha256': hashlib.sha256(content).hexdigest()}
+        self.cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # The file is written before its checksum, so a reader racing the write sees a mismatch, not a mix.
+        for target, data in ((path, content), (meta_path, json.dumps(meta).encode())):
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(data)
+            Path(tmp_path).replace(target)
+
+    def get(self, url: str) -> bytes:
+        content = self.read(url)
+        if content is None:
+            content = self.download(url)
+            self.write(url, content)
+        return content
+
+
+def download_blob(url: str) -> bytes:
+    bucket_name, blob_name = url.removeprefix('gs://').split('/', 1)
+    client = storage.Client(project=settings.GS_PROJECT_ID)
+    # Checked against the object's MD5 by the client.
+    return client.bucket(bucket_name).blob(blob_name).download_as_bytes()
+
+
+def load_credentials(path: str, cache: CredentialsCache | None = None):
+    """
+    Service account credentials from a local file or a ``gs://`` URL. None when ``path`` is empty, so the
+    client falls back to the instance's default credentials.
+    """
+    if not path:
+        return None
+    if not path.startswith('gs://'):
+        return service_account.Credentials.from_service_account_file(path)
+    if cache is None:
+        cache = CredentialsCache(settings.GS_CREDENTIALS_CACHE_DIR, settings.GS_CREDENTIALS_CACHE_TTL)
+    return service_account.Credentials.from_service_account_info(json.loads(cache.get(path)))
+
+
+_credentials_lock = threading.Lock()
+
+
+class LazyCredentialsGoogleCloudStorage(GoogleCloudStorage):
+    """
+    ``GoogleCloudStorage`` that loads ``GS_CREDENTIALS_PATH`` when it first needs a client.
+    """
+
+    @property
+    def client(self):
+        if self._client is None and self.credentials is None:
+            with _credentials_lock:
+                if self.credentials is None:
+                    self.credentials = load_credentials(settings.GS_CREDENTIALS_PATH)
+        return super().client
@@ -0,0 +1,268 @@
+import io
+import os
+import gzip
+import json
+import uuid
+import decimal
+import datetime
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import brotli
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.translation import gettext_lazy
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.exceptions import ParseError
+
+from .boot import BootProfile, ImportRecord, profile_boot, parse_importtime
+from .schema import SchemaArtifact, load_schema, reset_schema
+from .storage import CredentialsCache, LazyCredentialsGoogleCloudStorage
+from .renderers import ORJSONParser, ORJSONRenderer
+from .compression import COMPRESSED_BODIES, CompressionMiddleware, compress, accepted_encoding
+
+URL = 'gs://bucket/service-account.json'
+SERVICE_ACCOUNT = json.dumps({'type': 'service_account', 'client_email': 'sa@example.com'}).encode()
+
+
+class CredentialsCacheTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.now = 1000.0
+        self.download = mock.Mock(return_value=SERVICE_ACCOUNT)
+        self.cache = CredentialsCache(cache_dir.name, ttl=60, download=self.download, clock=lambda: self.now)
+
+    def test_file_is_downloaded_once_per_ttl(self) -> None:
+        self.assertEqual(self.cache.get(URL), SERVICE_ACCOUNT)
+
+        # Another worker on the same instance reads it from disk.
+        other_worker = CredentialsCache(self.cache.cache_dir, ttl=60, download=self.download, clock=lambda: self.now)
+        self.assertEqual(other_worker.get(URL), SERVICE_ACCOUNT)
+        self.assertEqual(self.download.call_count, 1)
+
+        self.now += 60
+        self.cache.get(URL)
+        self.assertEqual(self.download.call_count, 2)
+
+    def test_corrupted_file_is_downloaded_again(self) -> None:
+        self.cache.get(URL)
+        path, _ = self.cache._paths(URL)  # noqa: SLF001
+        path.write_bytes(b'{"type": "serv')
+
+        self.assertEqual(self.cache.get(URL), SERVICE_ACCOUNT)
+        self.assertEqual(self.download.call_count, 2)
+
+
+class LazyCredentialsGoogleCloudStorageTestCase(SimpleTestCase):
+    @override_settings(GS_CREDENTIALS=None, GS_CREDENTIALS_PATH=URL)
+    def test_credentials_are_loaded_on_first_use(self) -> None:
+        credentials = mock.Mock()
+        with mock.patch('reconciliation_backend.storage.load_credentials', return_value=credentials) as load:
+            storage = LazyCredentialsGoogleCloudStorage(bucket_name='bucket', project_id='project')
+            load.assert_not_called()
+
+            with mock.patch('storages.backends.gcloud.Client') as client:
+                storage.bucket  # noqa: B018
+                storage.bucket  # noqa: B018
+
+        load.assert_called_once_with(URL)
+        client.assert_called_once_with(project='project', credentials=credentials)
+
+
+IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _weakrefset
+import time:       300 |        420 |   threading
+import time:        80 |         80 |   json.decoder
+import time:       500 |       1000 | json
+import time:        40 |         40 | django
+"""
+
+
+class BootProfileTestCase(SimpleTestCase):
+    def test_imports_are_attributed_to_the_modules_that_imported_them(self) -> None:
+        self.assertEqual(
+            parse_importtime(IMPORTTIME),
+            [
+                ImportRecord(('json', 'threading', '_weakrefset'), 120, 120),
+                ImportRecord(('json', 'threading'), 300, 420),
+                ImportRecord(('json', 'json.decoder'), 80, 80),
+                ImportRecord(('json',), 500, 1000),
+                ImportRecord(('django',), 40, 40),
+            ],
+        )
+
+    def test_import_time_is_summed_per_package(self) -> None:
+        profile = BootProfile('settings', {'settings': 0.1}, parse_importtime(IMPORTTIME))
+
+        self.assertEqual(profile.slowest_packages(2), [('json', 580), ('threading', 300)])
+        self.assertEqual(profile.folded().splitlines()[0], 'json;threading;_weakrefset 120')
+
+    def test_boot_is_within_budget(self) -> None:
+        profile = profile_boot(os.environ['DJANGO_SETTINGS_MODULE'])
+
+        self.assertEqual(list(profile.phases), ['settings', 'apps', 'urls'])
+        slowest = ', '.join(f'{package} {us / 1000:.0f}ms' for package, us in profile.slowest_packages(5))
+        self.assertLessEqual(
+            profile.total_ms,
+            settings.BOOT_TIME_BUDGET_MS,
+            f'Boot took {profile.total_ms:.0f}ms; slowest packages: {slowest}. See `manage.py boot_profile`.',
+        )
+
+
+class OpenAPISchemaTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        schema_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(schema_dir.cleanup)
+        self.path = Path(schema_dir.name) / 'openapi-schema.json'
+        self.path.write_bytes(b'{"swagger": "2.0"}')
+        self.version = SchemaArtifact(b'{"swagger": "2.0"}').version
+
+        settings_override = override_settings(OPENAPI_SCHEMA_PATH=self.path, OPENAPI_SCHEMA_LAZY=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_schema()
+        self.addCleanup(reset_schema)
+
+    def test_schema_is_served_with_its_version_as_etag(self) -> None:
+        response = self.client.get(reverse('schema-json'))
+
+        self.assertEqual(response.content, b'{"swagger": "2.0"}')
+        self.assertEqual(response['ETag'], f'"{self.version}"')
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        response = self.client.get(reverse('schema-json'), headers={'If-None-Match': f'"{self.version}"'})
+        self.assertEqual(response.status_code, 304)
+
+    def test_versioned_schema_is_immutable(self) -> None:
+        response = self.client.get(reverse('schema-json-version', args=[self.version]))
+        self.assertEqual(response.content, b'{"swagger": "2.0"}')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(reverse('schema-json-version', args=['0' * 16]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(API_DOCS_ENABLED=True)
+    def test_swagger_page_loads_the_versioned_schema(self) -> None:
+        response = self.client.get('/docs/')
+
+        self.assertContains(response, reverse('schema-json-version', args=[self.version]))
+
+    def test_schema_is_only_generated_on_request_when_lazy(self) -> None:
+        self.path.unlink()
+        with self.assertRaises(ImproperlyConfigured):
+            load_schema()
+
+        with (
+            override_settings(OPENAPI_SCHEMA_LAZY=True),
+            mock.patch('reconciliation_backend.schema.generate_schema', return_value=b'{}') as generate,
+        ):
+            self.assertEqual(load_schema().content, b'{}')
+            load_schema()
+        generate.assert_called_once()
+
+
+class CompressionTestCase(SimpleTestCase):
+    BODY = json.dumps([{'id': i, 'name': 'Travel Basic', 'premium': '2000.00'} for i in range(200)]).encode()
+
+    def setUp(self) -> None:
+        COMPRESSED_BODIES.clear()
+        self.addCleanup(COMPRESSED_BODIES.clear)
+
+    def respond(self, response, accept_encoding: str = 'gzip, deflate, br'):
+        request = RequestFactory().get('/api/dashboard/products', headers={'Accept-Encoding': accept_encoding})
+        return CompressionMiddleware(lambda _: response)(request)
+
+    def test_preferred_encoding_is_chosen(self) -> None:
+        self.assertEqual(accepted_encoding('gzip, deflate, br'), 'br')
+        self.assertEqual(accepted_encoding('br;q=0, gzip;q=0.5'), 'gzip')
+        self.assertEqual(accepted_encoding('*'), 'br')
+        self.assertIsNone(accepted_encoding('identity'))
+        self.assertIsNone(accepted_encoding(''))
+
+    def test_json_is_compressed(self) -> None:
+        br = self.respond(HttpResponse(self.BODY, content_type='application/json'))
+        gz = self.respond(HttpResponse(self.BODY, content_type='application/json'), 'gzip')
+        identity = self.respond(HttpResponse(self.BODY, content_type='application/json'), 'identity')
+
+        self.assertEqual(br['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(br.content), self.BODY)
+        self.assertEqual(int(br['Content-Length']), len(br.content))
+        self.assertEqual(gz['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(gz.content), self.BODY)
+        self.assertEqual(identity.content, self.BODY)
+        self.assertFalse(identity.has_header('Content-Encoding'))
+        self.assertEqual(identity['Vary'], 'Accept-Encoding')
+
+    def test_small_and_html_responses_are_not_compressed(self) -> None:
+        small = self.respond(HttpResponse(b'{}', content_type='application/json'))
+        html = self.respond(HttpResponse(self.BODY, content_type='text/html'))
+
+        self.assertFalse(small.has_header('Content-Encoding'))
+        self.assertFalse(html.has_header('Content-Encoding'))
+
+    def test_body_with_an_etag_is_compressed_once(self) -> None:
+        with mock.patch('reconciliation_backend.compression.compress', wraps=compress) as compressor:
+            for _ in range(3):
+                response = self.respond(
+                    HttpResponse(self.BODY, content_type='application/json', headers={'ETag': '"v1"'})
+                )
+
+        compressor.assert_called_once()
+        self.assertEqual(brotli.decompress(response.content), self.BODY)
+        self.assertEqual(response['ETag'], 'W/"v1"')
+
+    async def test_streams_are_compressed_a_chunk_at_a_time(self) -> None:
+        chunks = [self.BODY[i : i + 1000] for i in range(0, len(self.BODY), 1000)]
+
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+
+        sync_response = self.respond(StreamingHttpResponse(iter(chunks), content_type='text/csv'), 'gzip')
+        async_response = self.respond(StreamingHttpResponse(stream(), content_type='application/x-ndjson'))
+
+        self.assertEqual(gzip.decompress(b''.join(sync_response.streaming_content)), self.BODY)
+        compressed = [chunk async for chunk in async_response.streaming_content]
+        self.assertEqual(brotli.decompress(b''.join(compressed)), self.BODY)
+        self.assertGreater(len(compressed), 1)
+
+
+class ORJSONTestCase(SimpleTestCase):
+    DATA = {
+        'id': uuid.UUID('1b7c6a52-4a7c-4b8e-9c0b-3f1f3a0f6e11'),
+        'premium': decimal.Decimal('1500.50'),
+        'created_at': datetime.datetime(2024, 6, 1, 10, 0, 0, 123456, tzinfo=datetime.UTC),
+        'updated_at': datetime.datetime(2024, 6, 1, 11, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=1))),
+        'start_date': datetime.date(2024, 6, 1),
+        'cover_starts': datetime.time(9, 30),
+        'duration': datetime.timedelta(days=30),
+        'label': gettext_lazy('Travel'),
+        'notes': 'Lagos \u2028 Accra \u00e9',
+        'counts': {1: 'one', 2: 'two'},
+        'items': [(1, 2), {'nested': [None, True, 1.5]}],
+    }
+
+    def test_renders_what_drf_renders(self) -> None:
+        self.assertEqual(ORJSONRenderer().render(self.DATA), JSONRenderer().render(self.DATA))
+
+    def test_indented_json_is_rendered_by_drf(self) -> None:
+        rendered = ORJSONRenderer().render(self.DATA, 'application/json; indent=4')
+
+        self.assertEqual(rendered, JSONRenderer().render(self.DATA, 'application/json; indent=4'))
+
+    def test_parses_what_drf_parses(self) -> None:
+        body = json.dumps({'customer_metadata': {'first_name': 'Ada'}, 'amount': 2 ** 70, 'rate': 0.1}).encode()
+
+        parsed = ORJSONParser().parse(io.BytesIO(body))
+
+        self.assertEqual(parsed, JSONParser().parse(io.BytesIO(body)))
+        with self.assertRaisesMessage(ParseError, 'JSON parse error'):
+            ORJSONParser().parse(io.BytesIO(b'{"amount": NaN}'))
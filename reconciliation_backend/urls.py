@@ -15,24 +15,20 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 
+from django.conf import settings
 from django.urls import path, include
 from django.contrib import admin
 
 from rest_framework import permissions
 from rest_framework.authentication import BasicAuthentication, TokenAuthentication, SessionAuthentication
 
+from .schema import API_INFO, ReDocRenderer, SwaggerUIRenderer, schema_json
+
+# Renders the Swagger and ReDoc pages, which load the schema from docs/json/<version>/
 schema_view = get_schema_view(
-    openapi.Info(
-        title='Reconciliation Dashboard API',
-        default_version='v1',
-        description='Reconciliation Dashboard for integrated Insurers and Agents',
-        terms_of_service='https://www.google.com/policies/terms/',
-        contact=openapi.Contact(email='somtochukwuuchegbu@gmail.com'),
-        license=openapi.License(name='BSD License'),
-    ),
+    API_INFO,
     public=True,
     permission_classes=[permissions.AllowAny],
     authentication_classes=[BasicAuthentication, SessionAuthentication, TokenAuthentication],
@@ -46,7 +42,13 @@ urlpatterns = [
     path('api/agent/', include(('agents.urls', 'agents'), namespace='agents')),
     path('api/user/', include(('user.urls', 'user'), namespace='user')),
     path('api/dashboard/', include(('superpool_proxy.urls', 'superpool_proxy'), namespace='superpool_proxy')),
-    path('docs/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('docs/redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-    path('docs/json/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
+    path('docs/json/', schema_json, name='schema-json'),
+    path('docs/json/<str:version>/', schema_json, name='schema-json-version'),
 ]
+
+# The Swagger and ReDoc pages are templates of the drf_yasg app, which is only installed with API_DOCS_ENABLED
+if settings.API_DOCS_ENABLED:
+    urlpatterns += [
+        path('docs/', schema_view.as_view(renderer_classes=[SwaggerUIRenderer]), name='schema-swagger-ui'),
+        path('docs/redoc/', schema_view.as_view(renderer_classes=[ReDocRenderer]), name='schema-redoc'),
+    ]
@@ -1,3 +1,29 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import MirroredClaim, MirroredPolicy, MirroredProduct, MirrorSyncState
+
+
+@admin.register(MirroredPolicy)
+class MirroredPolicyModelAdmin(admin.ModelAdmin):
+    list_display = (
+        'superpool_id', 'insurer_id', 'merchant_tenant_id', 'product_type', 'premium', 'upstream_updated_at'
+    )
+    search_fields = ('superpool_id', 'quote_code', 'merchant_code')
+
+
+@admin.register(MirroredClaim)
+class MirroredClaimModelAdmin(admin.ModelAdmin):
+    list_display = ('superpool_id', 'insurer_id', 'merchant_tenant_id', 'policy_superpool_id', 'claim_amount')
+    search_fields = ('superpool_id', 'policy_superpool_id')
+
+
+@admin.register(MirroredProduct)
+class MirroredProductModelAdmin(admin.ModelAdmin):
+    list_display = ('superpool_id', 'insurer_id', 'merchant_tenant_id', 'name', 'product_type')
+    search_fields = ('superpool_id', 'name')
+
+
+@admin.register(MirrorSyncState)
+class MirrorSyncStateModelAdmin(admin.ModelAdmin):
+    list_display = ('scope', 'resource', 'tenant_id', 'high_water_mark', 'last_synced_at')
+    list_filter = ('scope', 'resource')
@@ -0,0 +1,221 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+
+GROUP_BY = ('product', 'product_type', 'agent', 'month')
+COLUMN_CACHE_MAX_INSURERS = 64
+UNKNOWN = ''
+
+
+def factorize(values: list) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Turn a list of labels into ``(codes, labels)`` so that ``labels[codes[i]] == values[i]``.
+    """
+    index: dict = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int32, count=len(values))
+    return codes, np.asarray(list(index), dtype=str)
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def to_float_array(values: list) -> np.ndarray:
+    """
+    Values that are not numbers, such as a premium of ``'NIL'``, count as 0, as ``to_decimal`` reads them
+    as no amount in the reconciliation.
+    """
+    try:
+        array = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        array = np.fromiter(map(_to_float, values), dtype=np.float64, count=len(values))
+    return np.nan_to_num(array, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def to_minor_units(values: list) -> np.ndarray:
+    """
+    Money amounts as int64 kobo, so that totals are exact sums rather than float64 ones.
+    """
+    return np.rint(to_float_array(values) * 100).astype(np.int64)
+
+
+def group_sum(codes: np.ndarray, amounts: np.ndarray, groups: int) -> np.ndarray:
+    """
+    Sum int64 ``amounts`` per code. ``bincount`` would sum them as float64.
+    """
+    totals = np.zeros(groups, dtype=np.int64)
+    np.add.at(totals, codes, amounts)
+    return totals
+
+
+def to_naira(kobo) -> float:
+    return int(kobo) / 100
+
+
+@dataclass
+class PolicyColumns:
+    """
+    One insurer's policies as parallel column arrays. Each group-by key is stored as int32 codes into a label
+    array, so grouping is a ``bincount`` over the codes instead of a dict lookup per policy. Money columns
+    are in kobo.
+    """
+
+    codes: dict
+    labels: dict
+    premium: np.ndarray
+    commission: np.ndarray
+    claims_paid: np.ndarray
+
+    @property
+    def size(self) -> int:
+        return len(self.premium)
+
+    @classmethod
+    def from_records(cls, policies: list[dict], claims: list[dict]) -> 'PolicyColumns':
+        keys = {
+            'product': [policy.get('product_name') or policy.get('product') or UNKNOWN for policy in policies],
+            'product_type': [policy.get('product_type') or UNKNOWN for policy in policies],
+            'agent': [policy.get('merchant_code') or UNKNOWN for policy in policies],
+            'month': [str(policy.get('created_at') or policy.get('updated_at') or UNKNOWN)[:7] for policy in policies],
+        }
+        codes, labels = {}, {}
+        for key, values in keys.items():
+            codes[key], labels[key] = factorize(values)
+
+        premium = to_minor_units([policy.get('premium') or 0 for policy in policies])
+        commission_rate = to_float_array([policy.get('broker_commission') or 0 for policy in policies])
+        # Commission is rounded to the kobo per policy, as it is paid
+        commission = np.rint(premium * commission_rate / 100).astype(np.int64)
+
+        # Claims only carry a policy id; attribute each one to its policy's row so it groups with it.
+        row_of_policy = {str(policy.get('id')): row for row, policy in enumerate(policies)}
+        claim_rows, claim_amounts = [], []
+        for claim in claims:
+            row = row_of_policy.get(str(claim.get('policy_id')))
+            if row is not None:
+                claim_rows.append(row)
+                claim_amounts.append(claim.get('amount_paid') or claim.get('claim_amount') or 0)
+        claims_paid = group_sum(np.asarray(claim_rows, dtype=np.intp), to_minor_units(claim_amounts), len(policies))
+
+        return cls(codes, labels, premium, commission, claims_paid)
+
+    def group_by(self, key: str) -> list[dict]:
+        codes, labels = self.codes[key], self.labels[key]
+        groups = len(labels)
+        policies = np.bincount(codes, minlength=groups)
+        premium = group_sum(codes, self.premium, groups)
+        commission = group_sum(codes, self.commission, groups)
+        claims_paid = group_sum(codes, self.claims_paid, groups)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            loss_ratio = np.where(premium > 0, claims_paid / premium, 0.0)
+
+        order = np.argsort(-premium, kind='stable')
+        return [
+            {
+                key: str(labels[group]),
+                'policies': int(policies[group]),
+                'premium': to_naira(premium[group]),
+                'broker_commission': to_naira(commission[group]),
+                'claims_paid': to_naira(claims_paid[group]),
+                'loss_ratio': round(float(loss_ratio[group]), 4),
+            }
+            for group in order
+        ]
+
+    def summary(self) -> dict:
+        premium = int(self.premium.sum())
+        claims_paid = int(self.claims_paid.sum())
+        return {
+            'totals': {
+                'policies': self.size,
+                'premium': to_naira(premium),
+                'broker_commission': to_naira(self.commission.sum()),
+                'claims_paid': to_naira(claims_paid),
+                'loss_ratio': round(claims_paid / premium, 4) if premium else 0.0,
+            },
+            **{f'by_{key}': self.group_by(key) for key in GROUP_BY},
+        }
+
+
+class ColumnCache:
+    """
+    Keeps the last ``PolicyColumns`` built per insurer together with the version of the data it was built
+    from, so repeated summary requests only pay for the ``bincount`` calls.
+    """
+
+    def __init__(self, max_insurers: int = COLUMN_CACHE_MAX_INSURERS) -> None:
+        self.max_insurers = max_insurers
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, insurer_id, version) -> PolicyColumns | None:
+        with self._lock:
+            entry = self._entries.get(str(insurer_id))
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(str(insurer_id))
+            return entry[2]
+
+    def set(self, insurer_id, version, sources, columns: PolicyColumns) -> None:
+        with self._lock:
+            self._entries[str(insurer_id)] = (version, sources, columns)
+            self._entries.move_to_end(str(insurer_id))
+            while len(self._entries) > self.max_insurers:
+                self._entries.popitem(last=False)
+
+
+COLUMN_CACHE = ColumnCache()
+
+
+def _mirror_version(insurer_id) -> tuple | None:
+    from .models import MirrorSyncState
+
+    if not settings.SUPERPOOL_MIRROR_READS:
+        return None
+    states = MirrorSyncState.objects.filter(
+        scope='insurer', tenant_id=insurer_id, resource__in=('policies', 'claims')
+    ).order_by('resource').values_list('resource', 'last_synced_at')
+    states = tuple(states)
+    return states if len(states) == 2 else None
+
+
+async def insurer_summary(client, insurer_id, cache: ColumnCache = COLUMN_CACHE) -> dict:
+    """
+    Premium, broker commission, claims paid and loss ratio for one insurer, in total and per product,
+    product type, agent and month.
+    """
+    from .mirror import extract_records, fetch_dashboard
+
+    version = await sync_to_async(_mirror_version)(insurer_id)
+    if version is not None:
+        columns = cache.get(insurer_id, version)
+        if columns is not None:
+            return {'status_code': 200, 'data': columns.summary()}
+
+    policies = await fetch_dashboard(client, 'insurer', 'policies', insurer_id)
+    if policies.get('status_code') != 200:
+        return policies
+    claims = await fetch_dashboard(client, 'insurer', 'claims', insurer_id)
+    if claims.get('status_code') != 200:
+        return claims
+
+    sources = (policies.get('data'), claims.get('data'))
+    live = version is None
+    if live:
+        # Live reads come back from the dashboard cache as the same objects until they are refreshed.
+        version = tuple(map(id, sources))
+        columns = cache.get(insurer_id, version)
+        if columns is not None:
+            return {'status_code': 200, 'data': columns.summary()}
+
+    columns = PolicyColumns.from_records(extract_records(sources[0]), extract_records(sources[1]))
+    cache.set(insurer_id, version, sources if live else None, columns)
+    return {'status_code': 200, 'data': columns.summary()}
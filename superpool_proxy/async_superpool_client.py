@@ -0,0 +1,254 @@
+import os
+import asyncio
+import weakref
+
+import httpx
+
+from .cache import QUOTE_CACHE, DASHBOARD_CACHE, DashboardCache
+from .singleflight import QUOTE_METRICS, AsyncSingleFlight, request_fingerprint
+from .superpool_client import (
+    SUPERPOOL_API_KEY,
+    SUPERPOOL_POOL_SIZE,
+    SUPERPOOL_BACKEND_URL,
+    SUPERPOOL_MAX_RETRIES,
+    SUPERPOOL_READ_TIMEOUT,
+    SUPERPOOL_RETRY_BACKOFF,
+    SUPERPOOL_CONNECT_TIMEOUT,
+    SUPERPOOL_RAW_PASSTHROUGH,
+    upstream_validators,
+)
+
+SUPERPOOL_ASYNC_MAX_CONNECTIONS = int(os.getenv('SUPERPOOL_ASYNC_MAX_CONNECTIONS', '200'))
+RETRY_STATUS_CODES = frozenset({502, 503, 504})
+
+# httpx clients are bound to the event loop that opened their sockets, so keep one per running loop.
+_CLIENTS: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_QUOTE_FLIGHTS = AsyncSingleFlight(QUOTE_METRICS)
+
+
+def build_async_client(
+    max_connections: int = SUPERPOOL_ASYNC_MAX_CONNECTIONS,
+    max_keepalive_connections: int = SUPERPOOL_POOL_SIZE,
+) -> httpx.AsyncClient:
+    """
+    Build an AsyncClient that keeps up to ``max_connections`` Superpool calls in flight at once and
+    holds ``max_keepalive_connections`` idle sockets open between requests.
+    """
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections)
+    timeout = httpx.Timeout(SUPERPOOL_READ_TIMEOUT, connect=SUPERPOOL_CONNECT_TIMEOUT)
+    return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Return the AsyncClient shared by every AsyncSuperpoolClient running on the current event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _CLIENTS.get(loop)
+    if client is None or client.is_closed:
+        client = _CLIENTS[loop] = build_async_client()
+    return client
+
+
+class AsyncSuperpoolClient:
+    """
+    asyncio twin of SuperpoolClient. Every method has the same name, arguments and return shape,
+    it just has to be awaited.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        client: httpx.AsyncClient | None = None,
+        timeout=None,
+        max_retries: int = SUPERPOOL_MAX_RETRIES,
+        backoff_factor: float = SUPERPOOL_RETRY_BACKOFF,
+        cache: DashboardCache | None = DASHBOARD_CACHE,
+        quote_cache: DashboardCache | None = QUOTE_CACHE,
+        *,
+        passthrough: bool = SUPERPOOL_RAW_PASSTHROUGH,
+    ) -> None:
+        self.base_url = base_url or SUPERPOOL_BACKEND_URL
+        self._client = client
+        self.cache = cache
+        self.quote_cache = quote_cache
+        # Keep the bytes of successful GETs as `raw`, for views that send them on unchanged
+        self.passthrough = passthrough
+        self.timeout = timeout or (SUPERPOOL_CONNECT_TIMEOUT, SUPERPOOL_READ_TIMEOUT)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        # requests silently drops None-valued headers, httpx refuses them, so only send the key when it is set.
+        self.headers = {
+            'HTTP_X_BACKEND_API_KEY': SUPERPOOL_API_KEY
+        } if SUPERPOOL_API_KEY else {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_async_client()
+
+    def _timeout(self, timeout) -> httpx.Timeout:
+        connect, read = timeout or self.timeout
+        return httpx.Timeout(read, connect=connect)
+
+    async def _request(
+        self, method: str, endpoint: str, timeout=None, headers=None, **kwargs
+    ) -> httpx.Response | dict:
+        url = f'{self.base_url}/{endpoint}'
+        headers = {**self.headers, **headers} if headers else self.headers
+        try:
+            return await self.client.request(
+                method, url, headers=headers, timeout=self._timeout(timeout), **kwargs
+            )
+        except httpx.TimeoutException:
+            return {
+                'status_code': 504,
+                'error': 'Timed out waiting for Superpool'
+            }
+        except httpx.HTTPError:
+            return {
+                'status_code': 503,
+                'error': 'Could not connect to Superpool'
+            }
+
+    async def _get(self, endpoint: str, timeout=None, params: dict | None = None, cached: dict | None = None) -> dict:
+        headers = {'If-None-Match': cached['etag']} if cached and 'etag' in cached else None
+        for attempt in range(self.max_retries + 1):
+            response = await self._request('GET', endpoint, timeout=timeout, params=params, headers=headers)
+            status_code = response['status_code'] if isinstance(response, dict) else response.status_code
+            if status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                break
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+        if isinstance(response, dict):
+            return response
+        if response.status_code == 304 and headers:
+            return cached
+        if response.status_code >= 500:
+            return {
+                'status_code': response.status_code,
+                'error': 'Server error from Superpool'
+            }
+
+        result = {'status_code': 200, 'data': response.json(), **upstream_validators(response.headers)}
+        if self.passthrough:
+            result['raw'] = response.content
+        return result
+
+    async def _cached_get(self, scope: str, resource: str, tenant_id, endpoint: str, timeout=None) -> dict:
+        if self.cache is None:
+            return await self._get(endpoint, timeout=timeout)
+        key = self.cache.make_key(scope, resource, tenant_id)
+
+        async def fetch():
+            entry = self.cache.get(key)
+            return await self._get(endpoint, timeout=timeout, cached=entry.value if entry is not None else None)
+
+        return await self.cache.aget_or_fetch(key, fetch)
+
+    def invalidate_policies(self, tenant_ids) -> None:
+        if self.cache is None:
+            return
+        for tenant_id in tenant_ids:
+            if tenant_id is not None:
+                self.cache.invalidate(resource='policies', tenant_id=tenant_id)
+
+    async def _post(self, endpoint: str, payload: dict, expected_status: int, timeout=None) -> dict:
+        response = await self._request('POST', endpoint, timeout=timeout, json=payload)
+        if isinstance(response, dict):
+            return response
+        if response.status_code >= 500:
+            return {
+                'status_code': response.status_code,
+                'error': 'Server error from Superpool'
+            }
+        if response.status_code != expected_status:
+            return {
+                'status_code': response.status_code,
+                'error': response.json()
+            }
+        return {'status_code': expected_status, 'data': response.json()}
+
+    async def get_all_products(self, timeout=None, **kwargs) -> dict:
+        endpoint = kwargs.get('products', 'dashboard/products')
+        return await self._cached_get('all', 'products', endpoint, endpoint, timeout=timeout)
+
+    async def get_all_products_for_one_merchant(self, merchant_id, timeout=None) -> dict:
+        endpoint = f'dashboard/merchants/{merchant_id}/products'
+        return await self._cached_get('merchant', 'products', merchant_id, endpoint, timeout=timeout)
+
+    async def get_all_policies_for_one_merchant(self, merchant_id, timeout=None) -> dict:
+        endpoint = f'dashboard/merchants/{merchant_id}/policies'
+        return await self._cached_get('merchant', 'policies', merchant_id, endpoint, timeout=timeout)
+
+    async def get_all_claims_for_one_merchant(self, merchant_id, timeout=None) -> dict:
+        endpoint = f'dashboard/merchants/{merchant_id}/claims'
+        return await self._cached_get('merchant', 'claims', merchant_id, endpoint, timeout=timeout)
+
+    async def get_all_policies_for_one_insurer(self, insurer_id, timeout=None) -> dict:
+        endpoint = f'dashboard/insurers/{insurer_id}/policies'
+        return await self._cached_get('insurer', 'policies', insurer_id, endpoint, timeout=timeout)
+
+    async def get_all_claims_for_one_insurer(self, insurer_id, timeout=None) -> dict:
+        endpoint = f'dashboard/insurers/{insurer_id}/claims'
+        return await self._cached_get('insurer', 'claims', insurer_id, endpoint, timeout=timeout)
+
+    async def get_all_products_for_one_insurer(self, insurer_id, timeout=None) -> dict:
+        endpoint = f'dashboard/insurers/{insurer_id}/products'
+        return await self._cached_get('insurer', 'products', insurer_id, endpoint, timeout=timeout)
+
+    async def get_page(self, scope: str, resource: str, tenant_id, after=None, limit=None, timeout=None) -> dict:
+        endpoint = f'dashboard/{scope}s/{tenant_id}/{resource}'
+        params = {key: value for key, value in (('after', after), ('limit', limit)) if value is not None}
+        return await self._get(endpoint, timeout=timeout, params=params)
+
+    async def get_quote(
+        self, customer_metadata: dict, insurance_details: dict, coverage_preferences: dict, timeout=None
+    ) -> dict:
+        endpoint = 'quotes'
+        payload = {
+            'customer_metadata': customer_metadata,
+            'insurance_details': insurance_details,
+            'coverage_preferences': coverage_preferences
+        }
+        if self.quote_cache is None:
+            return await self._post(endpoint, payload, expected_status=200, timeout=timeout)
+
+        key = self.quote_cache.make_key('quote', 'quotes', request_fingerprint(payload))
+        cached = self.quote_cache.get_fresh(key)
+        if cached is not None:
+            QUOTE_METRICS.incr('cache_hits')
+            return cached
+
+        async def fetch():
+            response = await self._post(endpoint, payload, expected_status=200, timeout=timeout)
+            if response.get('status_code') == 200:
+                self.quote_cache.set(key, response)
+            return response
+
+        return await _QUOTE_FLIGHTS.do(key, fetch)
+
+    async def sell_policy(
+        self,
+        customer_metadata,
+        additional_information,
+        activation_metadata,
+        product_type,
+        merchant_code,
+        quote_code,
+        timeout=None,
+        invalidate_tenants=(),
+    ):
+        endpoint = 'policies'
+        payload = {
+            'quote_code': quote_code,
+            'product_type': product_type,
+            'use_existing_quote_information': False,
+            'customer_metadata': customer_metadata,
+            'merchant_code': merchant_code,
+            'additional_information': additional_information,
+            'activation_metadata': activation_metadata
+        }
+        response = await self._post(endpoint, payload, expected_status=201, timeout=timeout)
+        if response.get('status_code') == 201:
+            self.invalidate_policies(invalidate_tenants)
+        return response
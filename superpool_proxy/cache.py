@@ -0,0 +1,158 @@
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+SUPERPOOL_CACHE_MAX_ENTRIES = int(os.getenv('SUPERPOOL_CACHE_MAX_ENTRIES', '1024'))
+SUPERPOOL_CACHE_STALE_TTL = float(os.getenv('SUPERPOOL_CACHE_STALE_TTL', '300'))
+SUPERPOOL_CACHE_TTLS = {
+    'products': float(os.getenv('SUPERPOOL_CACHE_PRODUCTS_TTL', '300')),
+    'policies': float(os.getenv('SUPERPOOL_CACHE_POLICIES_TTL', '60')),
+    'claims': float(os.getenv('SUPERPOOL_CACHE_CLAIMS_TTL', '60')),
+}
+SUPERPOOL_QUOTE_CACHE_TTL = float(os.getenv('SUPERPOOL_QUOTE_CACHE_TTL', '30'))
+
+
+@dataclass
+class CacheEntry:
+    value: dict
+    fetched_at: float
+    ttl: float
+    stale_ttl: float
+
+    def is_fresh(self, now: float) -> bool:
+        return now - self.fetched_at < self.ttl
+
+    def is_servable(self, now: float) -> bool:
+        return now - self.fetched_at < self.ttl + self.stale_ttl
+
+
+class DashboardCache:
+    """
+    Read-through LRU cache for Superpool dashboard reads, keyed by ``(scope, resource, tenant_id)``.
+
+    Entries younger than their resource TTL are served as-is. Entries past the TTL but still inside the
+    stale window are served immediately while one background refresh replaces them. Only successful
+    upstream responses are stored.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SUPERPOOL_CACHE_MAX_ENTRIES,
+        ttls: dict | None = None,
+        stale_ttl: float = SUPERPOOL_CACHE_STALE_TTL,
+        clock=time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttls = ttls or SUPERPOOL_CACHE_TTLS
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing: set = set()
+        self._tasks: set = set()
+
+    @staticmethod
+    def make_key(scope: str, resource: str, tenant_id=None) -> tuple:
+        return scope, resource, str(tenant_id) if tenant_id is not None else '*'
+
+    def get(self, key: tuple) -> CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: tuple, value: dict) -> None:
+        resource = key[1]
+        entry = CacheEntry(value, self.clock(), self.ttls.get(resource, 0), self.stale_ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, resource: str | None = None, tenant_id=None) -> None:
+        tenant = str(tenant_id) if tenant_id is not None else None
+        with self._lock:
+            for key in list(self._entries):
+                _, key_resource, key_tenant = key
+                if resource is not None and key_resource != resource:
+                    continue
+                if tenant is not None and key_tenant != tenant:
+                    continue
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_fresh(self, key: tuple) -> dict | None:
+        entry = self.get(key)
+        if entry is None or not entry.is_fresh(self.clock()):
+            return None
+        return entry.value
+
+    def _lookup(self, key: tuple) -> tuple[CacheEntry | None, bool]:
+        """
+        Return ``(entry, needs_refresh)``; entry is None when there is nothing servable.
+        """
+        entry = self.get(key)
+        now = self.clock()
+        if entry is None or not entry.is_servable(now):
+            return None, True
+        return entry, not entry.is_fresh(now)
+
+    def _claim_refresh(self, key: tuple) -> bool:
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _store(self, key: tuple, response: dict) -> dict:
+        if response.get('status_code') == 200:
+            if 'raw' in response:
+                from reconciliation_backend.compression import precompress
+
+                # Compressed here, once per fetch, rather than on the first request that sends the bytes
+                response['compressed'] = precompress(response['raw'])
+            self.set(key, response)
+        return response
+
+    def get_or_fetch(self, key: tuple, fetch) -> dict:
+        entry, needs_refresh = self._lookup(key)
+        if entry is None:
+            return self._store(key, fetch())
+        if needs_refresh and self._claim_refresh(key):
+            threading.Thread(target=self._refresh, args=(key, fetch), daemon=True).start()
+        return entry.value
+
+    def _refresh(self, key: tuple, fetch) -> None:
+        try:
+            self._store(key, fetch())
+        finally:
+            self._refreshing.discard(key)
+
+    async def aget_or_fetch(self, key: tuple, fetch) -> dict:
+        entry, needs_refresh = self._lookup(key)
+        if entry is None:
+            return self._store(key, await fetch())
+        if needs_refresh and self._claim_refresh(key):
+            task = asyncio.create_task(self._arefresh(key, fetch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return entry.value
+
+    async def _arefresh(self, key: tuple, fetch) -> None:
+        try:
+            self._store(key, await fetch())
+        finally:
+            self._refreshing.discard(key)
+
+
+DASHBOARD_CACHE = DashboardCache()
+# Quotes are priced per customer, so they are only reused briefly and never served stale.
+QUOTE_CACHE = DashboardCache(ttls={'quotes': SUPERPOOL_QUOTE_CACHE_TTL}, stale_ttl=0)
@@ -0,0 +1,87 @@
+"""
+Conditional GETs of the dashboard lists, which the frontend polls. Every list is sent with an ETag and,
+when its records carry update times, a Last-Modified, and a poll whose copy is still current gets a 304
+before anything is paginated or rendered.
+
+The validators of a list come from where it was read:
+
+- Superpool's own ``ETag`` and ``Last-Modified``, where it sends them. These are also sent back as
+  ``If-None-Match`` when a cached list is refreshed, and a 304 from Superpool keeps the cached list.
+- the mirror, from the number of the tenant's rows and the last time one was synced, read with one
+  aggregate query before, and on a 304 instead of, the rows themselves
+- otherwise a hash of the payload and its newest ``updated_at``, worked out once per cached response
+
+The ETag sent to the client also covers the full URL and the media type, since a page (with absolute links
+to its neighbours) or the browsable API of the same list is a different representation of it. A strong
+ETag therefore always names the same bytes, which ``reconciliation_backend.compression`` relies on.
+"""
+
+import json
+import hashlib
+from dataclasses import dataclass
+
+from django.http import HttpResponseBase
+from django.utils.http import http_date, quote_etag
+from django.utils.cache import patch_cache_control, get_conditional_response
+
+from rest_framework.request import Request
+
+from .mirror import extract_records, parse_updated_at
+
+# Key of the validators kept on a response, see _payload_validators
+PAYLOAD_VALIDATORS_KEY = 'payload_validators'
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256('|'.join(map(str, parts)).encode()).hexdigest()[:32]
+
+
+@dataclass(frozen=True)
+class Validators:
+    etag: str
+    # Seconds since the epoch
+    last_modified: int | None = None
+
+    def not_modified(self, request: Request) -> HttpResponseBase | None:
+        """
+        The 304 (or 412) for ``request`` if its conditional headers are satisfied by these validators.
+        """
+        response = get_conditional_response(request, etag=self.etag, last_modified=self.last_modified)
+        return self.apply(response) if response is not None else None
+
+    def apply(self, response: HttpResponseBase) -> HttpResponseBase:
+        response['ETag'] = self.etag
+        if self.last_modified is not None:
+            response['Last-Modified'] = http_date(self.last_modified)
+        # The lists are per tenant, and a poll must always ask whether they changed
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+def _payload_validators(response: dict) -> Validators:
+    """
+    Validators of a list response without any from Superpool or the mirror. Cached responses are the very
+    same object on every request, so they are worked out once and kept on the response, as ``RecordIndex``
+    is, going away with it.
+    """
+    validators = response.get(PAYLOAD_VALIDATORS_KEY)
+    if validators is None:
+        data = response.get('data')
+        content = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+        marks = [mark for mark in map(parse_updated_at, extract_records(data)) if mark is not None]
+        validators = response[PAYLOAD_VALIDATORS_KEY] = Validators(
+            hashlib.sha256(content.encode()).hexdigest()[:32], int(max(marks).timestamp()) if marks else None
+        )
+    return validators
+
+
+def dashboard_validators(request: Request, response: dict) -> Validators:
+    """
+    Validators of the representation of the successful dashboard ``response`` that ``request`` asks for.
+    """
+    if 'etag' in response:
+        payload = Validators(response['etag'], response.get('last_modified'))
+    else:
+        payload = _payload_validators(response)
+    etag = quote_etag(_digest(payload.etag, request.accepted_media_type, request.build_absolute_uri()))
+    return Validators(etag, payload.last_modified)
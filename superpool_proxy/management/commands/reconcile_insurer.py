@@ -0,0 +1,43 @@
+import json
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from insurer.models import Insurer
+
+from superpool_proxy.reconciliation import DEFAULT_TOLERANCE, RECONCILE_PAGE_SIZE, reconcile_insurer
+from superpool_proxy.superpool_client import SuperpoolClient
+
+
+class Command(BaseCommand):
+    help = "Reconcile insurers' agent sales against their Superpool policies and claims"
+
+    def add_arguments(self, parser):
+        parser.add_argument('insurer', nargs='*', help='Insurer ids to reconcile, all insurers by default')
+        parser.add_argument('--partitions', type=int, default=1, help='Hash-partition the join through temp files')
+        parser.add_argument('--tolerance', type=Decimal, default=DEFAULT_TOLERANCE, help='Premium difference allowed')
+        parser.add_argument('--page-size', type=int, default=RECONCILE_PAGE_SIZE, help='Records per Superpool page')
+
+    def handle(self, *args, **options):
+        insurers = Insurer.objects.exclude(insurer_id=None)
+        if options['insurer']:
+            insurers = insurers.filter(insurer_id__in=options['insurer'])
+
+        client = SuperpoolClient(cache=None)
+        failures = 0
+        for insurer in insurers:
+            response = reconcile_insurer(
+                client,
+                insurer,
+                tolerance=options['tolerance'],
+                partitions=options['partitions'],
+                page_size=options['page_size'],
+            )
+            if response.get('status_code') != 200:
+                failures += 1
+                self.stderr.write(f'{insurer.insurer_id}: {response.get("error")}')
+                continue
+            self.stdout.write(json.dumps({'insurer_id': str(insurer.insurer_id), 'buckets': response['data']}))
+
+        if failures:
+            self.stderr.write(self.style.WARNING(f'{failures} insurers could not be reconciled'))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from agents.models import Agent
+
+from insurer.models import Insurer
+
+from merchants.models import Merchant
+from superpool_proxy.mirror import MIRROR_MODELS, sync_tenant
+from superpool_proxy.superpool_client import SuperpoolClient
+
+
+class Command(BaseCommand):
+    help = 'Pull Superpool policies, claims and products into the local mirror, one tenant at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--insurer', action='append', default=[], help='Only sync this insurer id')
+        parser.add_argument('--merchant', action='append', default=[], help='Only sync this merchant tenant id')
+        parser.add_argument('--resource', action='append', choices=list(MIRROR_MODELS), help='Only sync this resource')
+        parser.add_argument('--full', action='store_true', help='Ignore the high-water mark and re-pull everything')
+
+    def tenants(self, options) -> list[tuple[str, str]]:
+        if options['insurer'] or options['merchant']:
+            return [('insurer', tenant) for tenant in options['insurer']] + [
+                ('merchant', tenant) for tenant in options['merchant']
+            ]
+
+        insurer_ids = Insurer.objects.exclude(insurer_id=None).values_list('insurer_id', flat=True)
+        merchant_ids = set(Merchant.objects.values_list('tenant_id', flat=True))
+        merchant_ids.update(Agent.objects.values_list('tenant_id', flat=True))
+        return [('insurer', tenant) for tenant in insurer_ids.distinct()] + [
+            ('merchant', tenant) for tenant in merchant_ids if tenant
+        ]
+
+    def handle(self, *args, **options):
+        client = SuperpoolClient(cache=None)
+        resources = options['resource'] or list(MIRROR_MODELS)
+        failures = 0
+
+        for scope, tenant_id in self.tenants(options):
+            for resource in resources:
+                response = sync_tenant(client, scope, resource, tenant_id, full=options['full'])
+                if response.get('status_code') != 200:
+                    failures += 1
+                    self.stderr.write(f'{scope} {tenant_id} {resource}: {response.get("error")}')
+                    continue
+                synced = response['data']['synced']
+                pruned = response['data'].get('pruned')
+                pruned = f', {pruned} pruned' if pruned else ''
+                self.stdout.write(f'{scope} {tenant_id} {resource}: {synced} records{pruned}')
+
+        if failures:
+            self.stderr.write(self.style.WARNING(f'{failures} tenant syncs failed'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Superpool mirror is up to date'))
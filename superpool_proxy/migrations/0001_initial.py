@@ -0,0 +1,89 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MirroredClaim',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('superpool_id', models.CharField(help_text='Record id on Superpool', max_length=100, unique=True)),
+                ('insurer_id', models.UUIDField(blank=True, db_index=True, help_text='Superpool id of the insurer', null=True)),
+                ('merchant_tenant_id', models.UUIDField(blank=True, db_index=True, help_text='Superpool tenant id of the merchant or agent', null=True)),
+                ('payload', models.JSONField(help_text='Record exactly as returned by Superpool')),
+                ('upstream_updated_at', models.DateTimeField(blank=True, help_text='Last update time on Superpool', null=True)),
+                ('synced_at', models.DateTimeField(auto_now=True, help_text='Last time the record was pulled from Superpool')),
+                ('policy_superpool_id', models.CharField(blank=True, default='', max_length=100)),
+                ('claim_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True)),
+            ],
+            options={
+                'verbose_name': 'MIRRORED CLAIM',
+                'verbose_name_plural': 'MIRRORED CLAIMS',
+            },
+        ),
+        migrations.CreateModel(
+            name='MirroredPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('superpool_id', models.CharField(help_text='Record id on Superpool', max_length=100, unique=True)),
+                ('insurer_id', models.UUIDField(blank=True, db_index=True, help_text='Superpool id of the insurer', null=True)),
+                ('merchant_tenant_id', models.UUIDField(blank=True, db_index=True, help_text='Superpool tenant id of the merchant or agent', null=True)),
+                ('payload', models.JSONField(help_text='Record exactly as returned by Superpool')),
+                ('upstream_updated_at', models.DateTimeField(blank=True, help_text='Last update time on Superpool', null=True)),
+                ('synced_at', models.DateTimeField(auto_now=True, help_text='Last time the record was pulled from Superpool')),
+                ('quote_code', models.CharField(blank=True, default='', max_length=100)),
+                ('merchant_code', models.CharField(blank=True, default='', max_length=20)),
+                ('product_type', models.CharField(blank=True, default='', max_length=100)),
+                ('premium', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True)),
+            ],
+            options={
+                'verbose_name': 'MIRRORED POLICY',
+                'verbose_name_plural': 'MIRRORED POLICIES',
+            },
+        ),
+        migrations.CreateModel(
+            name='MirroredProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('superpool_id', models.CharField(help_text='Record id on Superpool', max_length=100, unique=True)),
+                ('insurer_id', models.UUIDField(blank=True, db_index=True, help_text='Superpool id of the insurer', null=True)),
+                ('merchant_tenant_id', models.UUIDField(blank=True, db_index=True, help_text='Superpool tenant id of the merchant or agent', null=True)),
+                ('payload', models.JSONField(help_text='Record exactly as returned by Superpool')),
+                ('upstream_updated_at', models.DateTimeField(blank=True, help_text='Last update time on Superpool', null=True)),
+                ('synced_at', models.DateTimeField(auto_now=True, help_text='Last time the record was pulled from Superpool')),
+                ('name', models.CharField(blank=True, default='', max_length=255)),
+                ('product_type', models.CharField(blank=True, default='', max_length=100)),
+            ],
+            options={
+                'verbose_name': 'MIRRORED PRODUCT',
+                'verbose_name_plural': 'MIRRORED PRODUCTS',
+            },
+        ),
+        migrations.CreateModel(
+            name='MirrorSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(help_text='insurer or merchant', max_length=10)),
+                ('resource', models.CharField(help_text='policies, claims or products', max_length=10)),
+                ('tenant_id', models.UUIDField(help_text='Insurer id or merchant tenant id on Superpool')),
+                ('high_water_mark', models.DateTimeField(blank=True, help_text='Newest upstream update time seen so far for this tenant', null=True)),
+                ('last_synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'MIRROR SYNC STATE',
+                'verbose_name_plural': 'MIRROR SYNC STATES',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='mirrorsyncstate',
+            constraint=models.UniqueConstraint(fields=('scope', 'resource', 'tenant_id'), name='unique_mirror_sync_state'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('superpool_proxy', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mirroredclaim',
+            index=models.Index(fields=['insurer_id', 'superpool_id'], name='claim_insurer_export_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mirroredclaim',
+            index=models.Index(fields=['merchant_tenant_id', 'superpool_id'], name='claim_merchant_export_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mirroredpolicy',
+            index=models.Index(fields=['insurer_id', 'superpool_id'], name='policy_insurer_export_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mirroredpolicy',
+            index=models.Index(fields=['merchant_tenant_id', 'superpool_id'], name='policy_merchant_export_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('superpool_proxy', '0002_mirror_export_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='mirroredclaim',
+            name='claim_insurer_export_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='mirroredclaim',
+            name='claim_merchant_export_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='mirroredpolicy',
+            name='policy_insurer_export_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='mirroredpolicy',
+            name='policy_merchant_export_idx',
+        ),
+        migrations.AlterField(
+            model_name='mirroredclaim',
+            name='superpool_id',
+            field=models.CharField(help_text='Record id on Superpool', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='mirroredpolicy',
+            name='superpool_id',
+            field=models.CharField(help_text='Record id on Superpool', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='mirroredproduct',
+            name='superpool_id',
+            field=models.CharField(help_text='Record id on Superpool', max_length=100),
+        ),
+        migrations.AddConstraint(
+            model_name='mirroredclaim',
+            constraint=models.UniqueConstraint(fields=('insurer_id', 'superpool_id'), name='mirroredclaim_insurer_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='mirroredclaim',
+            constraint=models.UniqueConstraint(fields=('merchant_tenant_id', 'superpool_id'), name='mirroredclaim_merchant_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='mirroredpolicy',
+            constraint=models.UniqueConstraint(fields=('insurer_id', 'superpool_id'), name='mirroredpolicy_insurer_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='mirroredpolicy',
+            constraint=models.UniqueConstraint(fields=('merchant_tenant_id', 'superpool_id'), name='mirroredpolicy_merchant_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='mirroredproduct',
+            constraint=models.UniqueConstraint(fields=('insurer_id', 'superpool_id'), name='mirroredproduct_insurer_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='mirroredproduct',
+            constraint=models.UniqueConstraint(fields=('merchant_tenant_id', 'superpool_id'), name='mirroredproduct_merchant_unique'),
+        ),
+    ]
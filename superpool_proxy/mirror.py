@@ -0,0 +1,226 @@
+import hashlib
+from decimal import Decimal, InvalidOperation
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+from django.conf import settings
+from django.utils import timezone
+from django.db.models import Max, Count
+from django.utils.http import quote_etag
+from django.utils.dateparse import parse_datetime
+
+from .models import MirroredClaim, MirroredPolicy, MirroredProduct, MirrorSyncState
+
+MIRROR_MODELS = {
+    'policies': MirroredPolicy,
+    'claims': MirroredClaim,
+    'products': MirroredProduct,
+}
+TENANT_FIELDS = {
+    'insurer': 'insurer_id',
+    'merchant': 'merchant_tenant_id',
+}
+UPSERT_BATCH_SIZE = 1000
+
+
+def extract_records(data) -> list:
+    """
+    Superpool returns either a bare list or a ``{'data': [...]}`` envelope depending on the endpoint.
+    """
+    if isinstance(data, dict):
+        data = data.get('data', [])
+    return data if isinstance(data, list) else []
+
+
+def parse_updated_at(record: dict) -> datetime | None:
+    """
+    The record's update time, always aware: a time sent without an offset is taken in ``TIME_ZONE``.
+    """
+    for field in ('updated_at', 'modified_at', 'created_at'):
+        value = record.get(field)
+        if value:
+            parsed = parse_datetime(str(value))
+            if parsed is not None and timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            return parsed
+    return None
+
+
+def _decimal(value) -> Decimal | None:
+    try:
+        return Decimal(str(value)) if value is not None else None
+    except InvalidOperation:
+        return None
+
+
+def _record_fields(resource: str, record: dict) -> dict:
+    if resource == 'policies':
+        return {
+            'quote_code': str(record.get('quote_code') or ''),
+            'merchant_code': str(record.get('merchant_code') or ''),
+            'product_type': str(record.get('product_type') or ''),
+            'premium': _decimal(record.get('premium')),
+        }
+    if resource == 'claims':
+        return {
+            'policy_superpool_id': str(record.get('policy_id') or ''),
+            'claim_amount': _decimal(record.get('claim_amount')),
+        }
+    return {
+        'name': str(record.get('name') or record.get('product_name') or ''),
+        'product_type': str(record.get('product_type') or ''),
+    }
+
+
+def upsert_records(scope: str, resource: str, tenant_id, records: list) -> int:
+    """
+    Insert or update ``records`` in the mirror table for ``resource``, one INSERT ... ON CONFLICT per batch.
+    Rows are keyed on the tenant and the Superpool id, so a record shared by several tenants, as products
+    are, is kept once for each of them.
+    """
+    model = MIRROR_MODELS[resource]
+    tenant_field = TENANT_FIELDS[scope]
+    rows = []
+    for record in records:
+        superpool_id = record.get('id')
+        if superpool_id is None:
+            continue
+        rows.append(model(
+            superpool_id=str(superpool_id),
+            payload=record,
+            upstream_updated_at=parse_updated_at(record),
+            **{tenant_field: tenant_id},
+            **_record_fields(resource, record),
+        ))
+    if not rows:
+        return 0
+
+    update_fields = [
+        field.name for field in model._meta.concrete_fields  # noqa: SLF001
+        if not field.primary_key and field.name not in ('superpool_id', *TENANT_FIELDS.values())
+    ]
+    model.objects.bulk_create(
+        rows,
+        batch_size=UPSERT_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=[tenant_field, 'superpool_id'],
+        update_fields=update_fields,
+    )
+    return len(rows)
+
+
+def sync_tenant(client, scope: str, resource: str, tenant_id, *, full: bool = False) -> dict:
+    """
+    Pull ``resource`` for one tenant into the mirror and advance its high-water mark.
+
+    Superpool is asked only for records updated after the stored mark; records before it are dropped
+    client-side as well, in case upstream ignores the filter. Records at the mark, and records without an
+    update time, are written again, which the upsert makes harmless. ``full`` re-pulls everything and prunes
+    the tenant's rows that are no longer on Superpool: every row it writes is stamped after it started, so
+    those left with an older ``synced_at`` are the missing ones.
+    """
+    state, _ = MirrorSyncState.objects.get_or_create(scope=scope, resource=resource, tenant_id=tenant_id)
+    updated_after = None if full else state.high_water_mark
+    response = client.get_changed_records(scope, resource, tenant_id, updated_after=updated_after)
+    if response.get('status_code') != 200:
+        return response
+
+    records = extract_records(response.get('data'))
+    if updated_after is not None:
+        records = [
+            record for record in records
+            if (parse_updated_at(record) or updated_after) >= updated_after
+        ]
+
+    started = timezone.now()
+    with transaction.atomic():
+        synced = upsert_records(scope, resource, tenant_id, records)
+        if full:
+            missing = MIRROR_MODELS[resource].objects.filter(**{TENANT_FIELDS[scope]: tenant_id})
+            pruned, _ = missing.filter(synced_at__lt=started).delete()
+        marks = [mark for mark in map(parse_updated_at, records) if mark is not None]
+        if marks and (state.high_water_mark is None or max(marks) > state.high_water_mark):
+            state.high_water_mark = max(marks)
+        state.save()
+
+    if full:
+        return {'status_code': 200, 'data': {'synced': synced, 'pruned': pruned}}
+    return {'status_code': 200, 'data': {'synced': synced}}
+
+
+def mirror_validators(scope: str, resource: str, tenant_id, rows: int, synced_at, upstream_updated_at) -> dict:
+    """
+    The ETag and Last-Modified of a tenant's mirrored list, from its number of rows, the newest ``synced_at``
+    and the newest ``upstream_updated_at``. A sync stamps every row it writes, and a full sync drops the rows
+    it did not write, so the newest ``synced_at`` and the number of rows change with the list.
+    """
+    fingerprint = f'{scope}|{resource}|{tenant_id}|{rows}|{synced_at}'
+    validators = {'etag': quote_etag(hashlib.sha256(fingerprint.encode()).hexdigest()[:32])}
+    if upstream_updated_at is not None:
+        validators['last_modified'] = int(upstream_updated_at.timestamp())
+    return validators
+
+
+def _read_mirror(scope: str, resource: str, tenant_id, request=None) -> dict | None:
+    """
+    The tenant's mirrored list, or None when it has never been synced. Its validators come from one
+    aggregate query, and when they show ``request`` already has the list, its records are not read at all
+    and ``data`` is None: the caller answers with a 304 from the validators alone.
+    """
+    if not MirrorSyncState.objects.filter(scope=scope, resource=resource, tenant_id=tenant_id).exists():
+        return None
+    rows = MIRROR_MODELS[resource].objects.filter(**{TENANT_FIELDS[scope]: tenant_id})
+    stats = rows.aggregate(rows=Count('id'), synced_at=Max('synced_at'), upstream_updated_at=Max('upstream_updated_at'))
+    response = {'status_code': 200, 'data': None, **mirror_validators(scope, resource, tenant_id, **stats)}
+
+    if request is not None:
+        from .conditional import dashboard_validators
+
+        if dashboard_validators(request, response).not_modified(request) is not None:
+            return response
+    response['data'] = list(rows.order_by('-upstream_updated_at', '-id').values_list('payload', flat=True))
+    return response
+
+
+async def mirror_database(scope: str, resource: str, tenant_id) -> str | None:
+    """
+    The database to read a tenant's ``resource`` from when it is served from the mirror, as in
+    ``fetch_dashboard``, or None when it comes from Superpool. The router is asked on the thread the queries
+    run on, so it sees that thread's connection.
+    """
+    if scope not in TENANT_FIELDS or not settings.SUPERPOOL_MIRROR_READS:
+        return None
+    synced = await MirrorSyncState.objects.filter(scope=scope, resource=resource, tenant_id=tenant_id).aexists()
+    if not synced:
+        return None
+    return await sync_to_async(router.db_for_read)(MIRROR_MODELS[resource])
+
+
+async def read_mirror_page(
+    scope: str, resource: str, tenant_id, after: str | None, limit: int, using: str = DEFAULT_DB_ALIAS
+) -> list[dict]:
+    """
+    Up to ``limit`` mirrored records of one tenant with a Superpool id after ``after``, in id order. A keyset
+    query on the tenant's (tenant, superpool_id) index, so it costs the same on any page.
+    """
+    records = MIRROR_MODELS[resource].objects.using(using).filter(**{TENANT_FIELDS[scope]: tenant_id})
+    if after is not None:
+        records = records.filter(superpool_id__gt=after)
+    return [payload async for payload in records.order_by('superpool_id').values_list('payload', flat=True)[:limit]]
+
+
+async def fetch_dashboard(client, scope: str, resource: str, tenant_id, request=None) -> dict:
+    """
+    Serve a dashboard read from the local mirror when mirror reads are enabled and the tenant has been
+    synced at least once; otherwise fall back to the live Superpool call on ``client``. Given the
+    ``request`` being answered, a mirrored list it already has comes back without its records, see
+    ``_read_mirror``.
+    """
+    if settings.SUPERPOOL_MIRROR_READS:
+        response = await sync_to_async(_read_mirror)(scope, resource, tenant_id, request)
+        if response is not None:
+            return response
+    fetch = getattr(client, f'get_all_{resource}_for_one_{scope}')
+    return await fetch(tenant_id)
@@ -1,3 +1,73 @@
 from django.db import models
 
-# Create your models here.
+
+class MirroredRecord(models.Model):
+    superpool_id = models.CharField(max_length=100, help_text='Record id on Superpool')
+    insurer_id = models.UUIDField(null=True, blank=True, db_index=True, help_text='Superpool id of the insurer')
+    merchant_tenant_id = models.UUIDField(
+        null=True, blank=True, db_index=True, help_text='Superpool tenant id of the merchant or agent'
+    )
+    payload = models.JSONField(help_text='Record exactly as returned by Superpool')
+    upstream_updated_at = models.DateTimeField(null=True, blank=True, help_text='Last update time on Superpool')
+    synced_at = models.DateTimeField(auto_now=True, help_text='Last time the record was pulled from Superpool')
+
+    class Meta:
+        abstract = True
+        # A row is one tenant's copy of the record, since records such as products are shared between tenants.
+        # Exports page through a tenant's records in superpool_id order on these, see superpool_proxy.export
+        constraints = [
+            models.UniqueConstraint(fields=['insurer_id', 'superpool_id'], name='%(class)s_insurer_unique'),
+            models.UniqueConstraint(fields=['merchant_tenant_id', 'superpool_id'], name='%(class)s_merchant_unique'),
+        ]
+
+    def __str__(self):
+        return self.superpool_id
+
+
+class MirroredPolicy(MirroredRecord):
+    quote_code = models.CharField(max_length=100, default='', blank=True)
+    merchant_code = models.CharField(max_length=20, default='', blank=True)
+    product_type = models.CharField(max_length=100, default='', blank=True)
+    premium = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+
+    class Meta(MirroredRecord.Meta):
+        verbose_name = 'MIRRORED POLICY'
+        verbose_name_plural = 'MIRRORED POLICIES'
+
+
+class MirroredClaim(MirroredRecord):
+    policy_superpool_id = models.CharField(max_length=100, default='', blank=True)
+    claim_amount = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+
+    class Meta(MirroredRecord.Meta):
+        verbose_name = 'MIRRORED CLAIM'
+        verbose_name_plural = 'MIRRORED CLAIMS'
+
+
+class MirroredProduct(MirroredRecord):
+    name = models.CharField(max_length=255, default='', blank=True)
+    product_type = models.CharField(max_length=100, default='', blank=True)
+
+    class Meta(MirroredRecord.Meta):
+        verbose_name = 'MIRRORED PRODUCT'
+        verbose_name_plural = 'MIRRORED PRODUCTS'
+
+
+class MirrorSyncState(models.Model):
+    scope = models.CharField(max_length=10, help_text='insurer or merchant')
+    resource = models.CharField(max_length=10, help_text='policies, claims or products')
+    tenant_id = models.UUIDField(help_text='Insurer id or merchant tenant id on Superpool')
+    high_water_mark = models.DateTimeField(
+        null=True, blank=True, help_text='Newest upstream update time seen so far for this tenant'
+    )
+    last_synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'MIRROR SYNC STATE'
+        verbose_name_plural = 'MIRROR SYNC STATES'
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'resource', 'tenant_id'], name='unique_mirror_sync_state'),
+        ]
+
+    def __str__(self):
+        return f'{self.scope}:{self.tenant_id}:{self.resource}'
@@ -0,0 +1,128 @@
+"""
+Cursor pagination of the dashboard lists. A request with ``limit`` or ``cursor`` gets ``limit`` records in
+order of their Superpool id and a link to the page after the last of them, in place of the whole list or a
+page number slice of it.
+
+A page comes from the first of these that can serve the tenant:
+
+- the mirror, with a keyset query, under the same conditions as the dashboards read it
+- Superpool itself, for the resources in ``SUPERPOOL_PAGINATED_RESOURCES``, by forwarding ``after`` and
+  ``limit``
+- the cached full list, sorted by id once per cached response and sliced from the cursor
+
+so a page costs its own size in network and memory, apart from the shared cached list in the last case.
+"""
+
+import os
+import bisect
+
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .mirror import extract_records, mirror_database, read_mirror_page
+from .conditional import dashboard_validators
+
+DASHBOARD_PAGE_SIZE = int(os.getenv('DASHBOARD_PAGE_SIZE', '10'))
+DASHBOARD_MAX_PAGE_SIZE = int(os.getenv('DASHBOARD_MAX_PAGE_SIZE', '100'))
+# Resources whose Superpool endpoints return a page for `after` and `limit`, e.g. "policies,claims"
+SUPERPOOL_PAGINATED_RESOURCES = frozenset(filter(None, os.getenv('SUPERPOOL_PAGINATED_RESOURCES', '').split(',')))
+# Key of the index kept on a response, see RecordIndex.from_response
+RECORD_INDEX_KEY = 'record_index'
+
+
+class RecordIndex:
+    """
+    A Superpool list sorted by record id, so the records after a cursor are found by bisection.
+    """
+
+    def __init__(self, records: list[dict]) -> None:
+        self._records = sorted(
+            (record for record in records if record.get('id') is not None), key=lambda record: str(record['id'])
+        )
+        self._ids = [str(record['id']) for record in self._records]
+
+    @classmethod
+    def from_response(cls, response: dict) -> 'RecordIndex':
+        """
+        Index a dashboard response. Cached responses are the very same object on every request, so the
+        index is kept on the response and reused, as ``QuoteIndex`` does for quotes.
+        """
+        index = response.get(RECORD_INDEX_KEY)
+        if index is None:
+            index = response[RECORD_INDEX_KEY] = cls(extract_records(response.get('data')))
+        return index
+
+    def after(self, cursor: str | None, limit: int | None = None) -> list[dict]:
+        start = bisect.bisect_right(self._ids, cursor) if cursor is not None else 0
+        return self._records[start : start + limit if limit is not None else None]
+
+
+def wants_cursor_page(request: Request) -> bool:
+    return 'cursor' in request.query_params or 'limit' in request.query_params
+
+
+def page_limit(request: Request) -> int:
+    try:
+        limit = int(request.query_params.get('limit', DASHBOARD_PAGE_SIZE))
+    except ValueError:
+        limit = DASHBOARD_PAGE_SIZE
+    return min(max(limit, 1), DASHBOARD_MAX_PAGE_SIZE)
+
+
+async def fetch_all(client, scope: str, resource: str, tenant_id) -> dict:
+    if scope == 'all':
+        return await getattr(client, f'get_all_{resource}')()
+    return await getattr(client, f'get_all_{resource}_for_one_{scope}')(tenant_id)
+
+
+async def fetch_page(client, scope: str, resource: str, tenant_id, after: str | None, limit: int) -> dict:
+    """
+    The ``limit`` records of one tenant after ``after``, and the cursor of the next page or None on the last.
+    One more record than the page is read to know whether another page follows.
+    """
+    using = await mirror_database(scope, resource, tenant_id)
+    response = {}
+    if using is not None:
+        records = await read_mirror_page(scope, resource, tenant_id, after, limit + 1, using)
+    elif resource in SUPERPOOL_PAGINATED_RESOURCES:
+        response = await client.get_page(scope, resource, tenant_id, after=after, limit=limit + 1)
+        if response.get('status_code') != 200:
+            return response
+        records = extract_records(response.get('data'))
+        if len(records) > limit + 1:
+            # Superpool ignored the parameters and sent the whole list
+            records = RecordIndex(records).after(after, limit + 1)
+    else:
+        response = await fetch_all(client, scope, resource, tenant_id)
+        if response.get('status_code') != 200:
+            return response
+        records = RecordIndex.from_response(response).after(after, limit + 1)
+
+    next_cursor = str(records[limit - 1]['id']) if len(records) > limit else None
+    # A page is fixed by the list it is cut from and the cursor and limit, so it shares the list's validators
+    validators = {key: response[key] for key in ('etag', 'last_modified') if key in response}
+    return {'status_code': 200, 'data': {'results': records[:limit], 'next_cursor': next_cursor}, **validators}
+
+
+async def cursor_page(client, request: Request, scope: str, resource: str, tenant_id=None) -> Response:
+    """
+    The page of records ``request`` asks for, with a link to the next one in ``next``.
+    """
+    response = await fetch_page(
+        client, scope, resource, tenant_id, request.query_params.get('cursor'), page_limit(request)
+    )
+    if response.get('status_code') != 200:
+        return Response(response.get('error'), status.HTTP_400_BAD_REQUEST)
+
+    validators = dashboard_validators(request, response)
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+
+    page = response['data']
+    next_url = None
+    if page['next_cursor'] is not None:
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', page['next_cursor'])
+    return validators.apply(Response({'next': next_url, 'results': page['results']}, status.HTTP_200_OK))
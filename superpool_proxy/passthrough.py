@@ -0,0 +1,27 @@
+"""
+Superpool data sent on exactly as Superpool sent it. With ``SUPERPOOL_RAW_PASSTHROUGH`` the clients keep the
+bytes of each successful GET next to the decoded data, so a view returning that data unchanged can send the
+bytes instead of encoding the data again. Cached bytes are also compressed once, when they are cached, see
+``reconciliation_backend.compression``.
+"""
+
+from django.http import HttpResponse, HttpResponseBase
+
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
+
+
+def data_response(request: Request, response: dict) -> HttpResponseBase:
+    """
+    The 200 of a view whose body is the ``data`` of the successful Superpool ``response``. Superpool's bytes
+    are sent when the client kept them and the request negotiated plain JSON, not the browsable API or
+    indented JSON.
+    """
+    raw = response.get('raw')
+    if raw is not None and request.accepted_media_type == JSONRenderer.media_type:
+        http_response = HttpResponse(raw, content_type=JSONRenderer.media_type)
+        http_response.precompressed = response.get('compressed')
+        return http_response
+    return Response(response.get('data'), status.HTTP_200_OK)
@@ -0,0 +1,35 @@
+from collections import defaultdict
+
+# Key of the index kept on a response, see QuoteIndex.from_response
+QUOTE_INDEX_KEY = 'quote_index'
+
+
+class QuoteIndex:
+    """
+    Superpool quote results grouped by ``(provider, product)`` in a single pass, so each lookup is a dict hit
+    instead of a scan of every quote from every insurer.
+    """
+
+    def __init__(self, quotes: list[dict]) -> None:
+        self._groups: dict[tuple, list[dict]] = defaultdict(list)
+        for quote in quotes:
+            self._groups[quote.get('provider'), quote.get('product')].append(quote)
+
+    @classmethod
+    def from_response(cls, response: dict) -> 'QuoteIndex':
+        """
+        Index a ``get_quote`` response. Coalesced and cached quote calls hand back the very same response
+        object, so the index is kept on the response, as its compressed body is, and reused rather than
+        rebuilt per request. It goes away with the response when the cache drops it.
+        """
+        index = response.get(QUOTE_INDEX_KEY)
+        if index is None:
+            data = response.get('data') or {}
+            index = response[QUOTE_INDEX_KEY] = cls((data.get('data') or []) if isinstance(data, dict) else data)
+        return index
+
+    def find(self, provider: str, product: str) -> list[dict]:
+        return self._groups.get((provider, product), [])
+
+    def __len__(self) -> int:
+        return sum(map(len, self._groups.values()))
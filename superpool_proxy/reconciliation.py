@@ -0,0 +1,351 @@
+import os
+import pickle
+import tempfile
+from typing import NamedTuple
+from decimal import Decimal, InvalidOperation
+from dataclasses import field, dataclass
+from collections.abc import Iterable, Iterator
+
+MATCHED = 'matched'
+AMOUNT_MISMATCH = 'amount_mismatch'
+MISSING_ON_SUPERPOOL = 'missing_on_superpool'
+MISSING_SALE = 'missing_sale'
+ORPHAN_CLAIM = 'orphan_claim'
+BUCKETS = (MATCHED, AMOUNT_MISMATCH, MISSING_ON_SUPERPOOL, MISSING_SALE, ORPHAN_CLAIM)
+
+DEFAULT_TOLERANCE = Decimal('0.01')
+SPILL_CHUNK_ROWS = 4096
+# Records per request when a Superpool list is read a page at a time
+RECONCILE_PAGE_SIZE = int(os.getenv('RECONCILE_PAGE_SIZE', '1000'))
+
+
+def to_decimal(value) -> Decimal | None:
+    if value is None or value == '':
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+
+# Rows are NamedTuples rather than dataclasses: they are built, hashed and pickled millions of times per run.
+class Policy(NamedTuple):
+    policy_id: str
+    quote_code: str
+    merchant_code: str
+    premium: Decimal | None
+
+    @classmethod
+    def from_superpool(cls, record: dict) -> 'Policy':
+        return cls(
+            policy_id=str(record.get('id') or record.get('policy_id') or ''),
+            quote_code=str(record.get('quote_code') or ''),
+            merchant_code=str(record.get('merchant_code') or ''),
+            premium=to_decimal(record.get('premium')),
+        )
+
+
+class Sale(NamedTuple):
+    quote_code: str
+    merchant_code: str
+    policy_id: str
+    premium: Decimal | None
+
+    @classmethod
+    def from_record(cls, record: dict) -> 'Sale':
+        return cls(
+            quote_code=str(record.get('quote_code') or ''),
+            merchant_code=str(record.get('merchant_code') or ''),
+            policy_id=str(record.get('superpool_policy_id') or record.get('policy_id') or ''),
+            premium=to_decimal(record.get('premium')),
+        )
+
+
+class ReconciliationRow(NamedTuple):
+    bucket: str
+    sale: Sale | None = None
+    policy: Policy | None = None
+    claimed: Decimal = Decimal(0)
+    claim_policy_id: str = ''
+
+
+@dataclass
+class ReconciliationReport:
+    """
+    Per-bucket counts and premium totals, plus at most ``sample_size`` example rows per bucket so a
+    million-row run never materialises every row.
+    """
+
+    sample_size: int = 100
+    counts: dict = field(default_factory=lambda: dict.fromkeys(BUCKETS, 0))
+    sale_premium: dict = field(default_factory=lambda: dict.fromkeys(BUCKETS, Decimal(0)))
+    policy_premium: dict = field(default_factory=lambda: dict.fromkeys(BUCKETS, Decimal(0)))
+    claimed: dict = field(default_factory=lambda: dict.fromkeys(BUCKETS, Decimal(0)))
+    samples: dict = field(default_factory=lambda: {bucket: [] for bucket in BUCKETS})
+
+    def add(self, row: ReconciliationRow) -> None:
+        bucket = row.bucket
+        self.counts[bucket] += 1
+        if row.sale is not None and row.sale.premium is not None:
+            self.sale_premium[bucket] += row.sale.premium
+        if row.policy is not None and row.policy.premium is not None:
+            self.policy_premium[bucket] += row.policy.premium
+        self.claimed[bucket] += row.claimed
+        if len(self.samples[bucket]) < self.sample_size:
+            self.samples[bucket].append(row)
+
+    def as_dict(self) -> dict:
+        return {
+            bucket: {
+                'count': self.counts[bucket],
+                'sale_premium': str(self.sale_premium[bucket]),
+                'policy_premium': str(self.policy_premium[bucket]),
+                'claimed': str(self.claimed[bucket]),
+            }
+            for bucket in BUCKETS
+        }
+
+
+def _claim_totals(claims: Iterable[dict]) -> dict[str, Decimal]:
+    totals: dict[str, Decimal] = {}
+    for claim in claims:
+        policy_id = str(claim.get('policy_id') or '')
+        amount = to_decimal(claim.get('claim_amount')) or Decimal(0)
+        totals[policy_id] = totals.get(policy_id, Decimal(0)) + amount
+    return totals
+
+
+def _matched(sale: Sale, policy: Policy, claims: dict[str, Decimal], tolerance: Decimal) -> ReconciliationRow:
+    claimed = claims.pop(policy.policy_id, Decimal(0))
+    same_amount = sale.premium is None or policy.premium is None or abs(sale.premium - policy.premium) <= tolerance
+    return ReconciliationRow(MATCHED if same_amount else AMOUNT_MISMATCH, sale, policy, claimed)
+
+
+def _join(
+    policies: Iterable[Policy], sales: Iterable[Sale], claims: dict[str, Decimal], tolerance: Decimal
+) -> Iterator[ReconciliationRow]:
+    """
+    Hash join of one partition. Policies are the build side, indexed by policy id and by
+    ``(quote_code, merchant_code)``; sales stream past as the probe side. Each policy matches one sale.
+    """
+    rows: list[Policy] = []
+    by_id: dict[str, int] = {}
+    by_quote: dict[tuple[str, str], int] = {}
+    for index, policy in enumerate(policies):
+        rows.append(policy)
+        if policy.policy_id:
+            by_id[policy.policy_id] = index
+        by_quote.setdefault((policy.quote_code, policy.merchant_code), index)
+
+    matched = bytearray(len(rows))
+    for sale in sales:
+        index = by_id.get(sale.policy_id) if sale.policy_id else None
+        if index is None:
+            index = by_quote.get((sale.quote_code, sale.merchant_code))
+        if index is None or matched[index]:
+            yield ReconciliationRow(MISSING_ON_SUPERPOOL, sale=sale)
+            continue
+
+        matched[index] = 1
+        yield _matched(sale, rows[index], claims, tolerance)
+
+    for index, policy in enumerate(rows):
+        if not matched[index]:
+            yield ReconciliationRow(MISSING_SALE, policy=policy, claimed=claims.pop(policy.policy_id, Decimal(0)))
+
+
+def _join_by_id(
+    policies: Iterable[Policy],
+    sales: Iterable[Sale],
+    claims: dict[str, Decimal],
+    tolerance: Decimal,
+    leftover_policies: '_Partitions',
+    leftover_sales: '_Partitions',
+) -> Iterator[ReconciliationRow]:
+    """
+    First pass of a partitioned join: match one policy id partition by id alone, as ``_join`` would before
+    falling back to quote codes. Sales naming no policy seen here and policies left without a sale go on to
+    ``leftover_sales`` and ``leftover_policies`` for the quote pass.
+    """
+    by_id: dict[str, Policy] = {}
+    for policy in policies:
+        previous = by_id.get(policy.policy_id)
+        if previous is not None:
+            # As in ``_join``, the last policy with an id is the one matched by it
+            leftover_policies.add(previous)
+        by_id[policy.policy_id] = policy
+
+    matched: set[str] = set()
+    for sale in sales:
+        policy = by_id.get(sale.policy_id)
+        if policy is None:
+            leftover_sales.add(sale)
+        elif sale.policy_id in matched:
+            yield ReconciliationRow(MISSING_ON_SUPERPOOL, sale=sale)
+        else:
+            matched.add(sale.policy_id)
+            yield _matched(sale, policy, claims, tolerance)
+
+    for policy_id, policy in by_id.items():
+        if policy_id not in matched:
+            leftover_policies.add(policy)
+
+
+class _Partitions:
+    """
+    Rows hash-partitioned on ``key`` into temporary files, pickled ``SPILL_CHUNK_ROWS`` at a time.
+    """
+
+    def __init__(self, partitions: int, key: str) -> None:
+        self.key = key
+        self.files = [tempfile.TemporaryFile() for _ in range(partitions)]
+        self.buffers: list[list] = [[] for _ in range(partitions)]
+
+    def add(self, row) -> None:
+        partition = hash(getattr(row, self.key)) % len(self.files)
+        buffer = self.buffers[partition]
+        buffer.append(row)
+        if len(buffer) >= SPILL_CHUNK_ROWS:
+            pickle.dump(buffer, self.files[partition], pickle.HIGHEST_PROTOCOL)
+            buffer.clear()
+
+    def read(self) -> list[Iterator]:
+        for spill_file, buffer in zip(self.files, self.buffers, strict=True):
+            if buffer:
+                pickle.dump(buffer, spill_file, pickle.HIGHEST_PROTOCOL)
+                buffer.clear()
+            spill_file.seek(0)
+        return [self._unspill(spill_file) for spill_file in self.files]
+
+    @staticmethod
+    def _unspill(spill_file) -> Iterator:
+        with spill_file:
+            while True:
+                try:
+                    chunk = pickle.load(spill_file)  # noqa: S301
+                except EOFError:
+                    return
+                yield from chunk
+
+
+def reconcile(
+    policies: Iterable[dict],
+    sales: Iterable[dict],
+    claims: Iterable[dict] = (),
+    tolerance: Decimal = DEFAULT_TOLERANCE,
+    partitions: int = 1,
+) -> Iterator[ReconciliationRow]:
+    """
+    Reconcile one insurer's Superpool policies and claims against the sales its agents made, in one
+    pass over each input.
+
+    Every sale lands in ``matched``, ``amount_mismatch`` or ``missing_on_superpool``; every policy with
+    no sale lands in ``missing_sale``; claims on a policy that was never seen land in ``orphan_claim``.
+
+    With ``partitions > 1`` both inputs are hash-partitioned into temporary files and joined a partition
+    at a time, so the join's index is one partition's instead of the whole insurer's. Sales naming a policy
+    id are first joined by id on partitions of the policy id; the sales and policies that did not match that
+    way are partitioned again on ``quote_code`` for the quote match. Each sale matches the policy it would
+    with ``partitions=1``, except that when two sales claim one policy the sale naming its id gets it.
+    """
+    claim_totals = _claim_totals(claims)
+    policy_rows = map(Policy.from_superpool, policies)
+    sale_rows = map(Sale.from_record, sales)
+
+    if partitions <= 1:
+        yield from _join(policy_rows, sale_rows, claim_totals, tolerance)
+    else:
+        policies_by_id, sales_by_id = _Partitions(partitions, 'policy_id'), _Partitions(partitions, 'policy_id')
+        policies_by_quote = _Partitions(partitions, 'quote_code')
+        sales_by_quote = _Partitions(partitions, 'quote_code')
+        for policy in policy_rows:
+            (policies_by_id if policy.policy_id else policies_by_quote).add(policy)
+        for sale in sale_rows:
+            (sales_by_id if sale.policy_id else sales_by_quote).add(sale)
+
+        for policy_chunk, sale_chunk in zip(policies_by_id.read(), sales_by_id.read(), strict=True):
+            yield from _join_by_id(
+                policy_chunk, sale_chunk, claim_totals, tolerance, policies_by_quote, sales_by_quote
+            )
+        for policy_chunk, sale_chunk in zip(policies_by_quote.read(), sales_by_quote.read(), strict=True):
+            yield from _join(policy_chunk, sale_chunk, claim_totals, tolerance)
+
+    for policy_id, claimed in claim_totals.items():
+        yield ReconciliationRow(ORPHAN_CLAIM, claimed=claimed, claim_policy_id=policy_id)
+
+
+def summarize(rows: Iterable[ReconciliationRow], sample_size: int = 100) -> ReconciliationReport:
+    report = ReconciliationReport(sample_size=sample_size)
+    for row in rows:
+        report.add(row)
+    return report
+
+
+class _UpstreamError(Exception):
+    def __init__(self, response: dict) -> None:
+        super().__init__(response.get('error'))
+        self.response = response
+
+
+def _insurer_records(client, resource: str, insurer_id, page_size: int) -> Iterator[dict]:
+    """
+    One insurer's ``resource`` list from Superpool, a page at a time for the resources in
+    ``SUPERPOOL_PAGINATED_RESOURCES`` and whole otherwise. Raises ``_UpstreamError`` on a failed request.
+    """
+    from .mirror import extract_records
+    from .pagination import SUPERPOOL_PAGINATED_RESOURCES, RecordIndex
+
+    if resource not in SUPERPOOL_PAGINATED_RESOURCES:
+        response = getattr(client, f'get_all_{resource}_for_one_insurer')(insurer_id)
+        if response.get('status_code') != 200:
+            raise _UpstreamError(response)
+        yield from extract_records(response.get('data'))
+        return
+
+    after = None
+    while True:
+        response = client.get_page('insurer', resource, insurer_id, after=after, limit=page_size)
+        if response.get('status_code') != 200:
+            raise _UpstreamError(response)
+        # Also right when Superpool ignores the parameters: the whole list once, then nothing after it
+        records = RecordIndex(extract_records(response.get('data'))).after(after)
+        yield from records
+        if len(records) < page_size:
+            return
+        after = str(records[-1]['id'])
+
+
+def reconcile_insurer(
+    client,
+    insurer,
+    tolerance: Decimal = DEFAULT_TOLERANCE,
+    partitions: int = 1,
+    page_size: int = RECONCILE_PAGE_SIZE,
+) -> dict:
+    """
+    Reconcile ``insurer`` using its policies and claims from Superpool (via ``client``) and the sales
+    recorded by its agents' sell endpoints. Returns the usual ``status_code``/``data`` envelope.
+
+    Policies and claims are read ``page_size`` at a time where Superpool pages them, and sales in chunks, so
+    with ``partitions > 1`` memory holds a page, a partition's index and a claim total per claimed policy.
+    Lists Superpool only sends whole are held whole while they are read.
+    """
+    from agents.models import AgentPolicySale
+
+    sales = (
+        AgentPolicySale.objects.filter(insurer=insurer)
+        .values('quote_code', 'merchant_code', 'superpool_policy_id', 'premium')
+        .iterator(chunk_size=5000)
+    )
+    rows = reconcile(
+        _insurer_records(client, 'policies', insurer.insurer_id, page_size),
+        sales,
+        _insurer_records(client, 'claims', insurer.insurer_id, page_size),
+        tolerance=tolerance,
+        partitions=partitions,
+    )
+    try:
+        report = summarize(rows)
+    except _UpstreamError as error:
+        return error.response
+    return {'status_code': 200, 'data': report.as_dict()}
@@ -0,0 +1,120 @@
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+def request_fingerprint(payload: dict) -> str:
+    """
+    Stable hash of a request body: key order and spacing do not matter, dates and decimals hash by value.
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class FlightMetrics:
+    """
+    Process-wide counters for one kind of coalesced call:
+
+    - ``upstream_calls``: requests that actually went to Superpool
+    - ``coalesced``: callers that joined a request already in flight
+    - ``cache_hits``: callers served from the short-lived result cache
+    """
+
+    FIELDS = ('upstream_calls', 'coalesced', 'cache_hits')
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, field: str) -> None:
+        with self._lock:
+            self._counts[field] += 1
+        logger.debug('%s %s', self.name, field)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = dict.fromkeys(self.FIELDS, 0)
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one: the first caller runs ``fetch`` and every caller
+    that arrives while it is still running blocks on, and returns, that same result.
+    """
+
+    def __init__(self, metrics: FlightMetrics) -> None:
+        self.metrics = metrics
+        self._calls: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fetch):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            self.metrics.incr('coalesced')
+            return future.result()
+
+        try:
+            self.metrics.incr('upstream_calls')
+            result = fetch()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class AsyncSingleFlight:
+    """
+    asyncio twin of SingleFlight. Calls only coalesce with others running on the same event loop.
+    """
+
+    def __init__(self, metrics: FlightMetrics) -> None:
+        self.metrics = metrics
+        self._calls: dict[str, asyncio.Future] = {}
+
+    async def do(self, key, fetch):
+        loop = asyncio.get_running_loop()
+        future = self._calls.get(key)
+        if future is not None and future.get_loop() is loop:
+            self.metrics.incr('coalesced')
+            return await asyncio.shield(future)
+
+        future = self._calls[key] = loop.create_future()
+        try:
+            self.metrics.incr('upstream_calls')
+            result = await fetch()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved so a leader-only failure is not logged twice
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+
+QUOTE_METRICS = FlightMetrics('superpool.quotes')
@@ -3,6 +3,13 @@ from pprint import pprint
 
 import requests as r
 from dotenv import find_dotenv, load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from django.utils.http import parse_http_date_safe
+
+from .cache import QUOTE_CACHE, DASHBOARD_CACHE, DashboardCache
+from .singleflight import QUOTE_METRICS, SingleFlight, request_fingerprint
 
 load_dotenv(find_dotenv())
 
@@ -10,127 +17,256 @@ SWAGGER_MODULE_NAME = 'Superpool Proxy'
 SUPERPOOL_BACKEND_URL = os.getenv('SUPERPOOL_BACKEND_URL')
 SUPERPOOL_API_KEY = os.getenv('SUPERPOOL_API_KEY')
 
+SUPERPOOL_POOL_SIZE = int(os.getenv('SUPERPOOL_POOL_SIZE', '10'))
+SUPERPOOL_CONNECT_TIMEOUT = float(os.getenv('SUPERPOOL_CONNECT_TIMEOUT', '3.05'))
+SUPERPOOL_READ_TIMEOUT = float(os.getenv('SUPERPOOL_READ_TIMEOUT', '30'))
+SUPERPOOL_MAX_RETRIES = int(os.getenv('SUPERPOOL_MAX_RETRIES', '3'))
+SUPERPOOL_RETRY_BACKOFF = float(os.getenv('SUPERPOOL_RETRY_BACKOFF', '0.3'))
+# Send Superpool's bytes to the client as they are where a view returns its data unchanged, see
+# superpool_proxy.passthrough
+SUPERPOOL_RAW_PASSTHROUGH = os.getenv('SUPERPOOL_RAW_PASSTHROUGH', 'False').lower() in ('true', '1')
+
+# Sessions are keyed by pid so gunicorn workers forked after import never share sockets with the master.
+_SESSIONS: dict[int, r.Session] = {}
+_QUOTE_FLIGHTS = SingleFlight(QUOTE_METRICS)
+
+
+def build_session(
+    pool_size: int = SUPERPOOL_POOL_SIZE,
+    max_retries: int = SUPERPOOL_MAX_RETRIES,
+    backoff_factor: float = SUPERPOOL_RETRY_BACKOFF,
+) -> r.Session:
+    """
+    Build a keep-alive session whose connection pool holds ``pool_size`` sockets per host.
+    Only idempotent methods are retried; a failed POST is never replayed against Superpool.
+    """
+    retries = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session = r.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def upstream_validators(headers) -> dict:
+    """
+    The ETag and Last-Modified (as a timestamp) of a Superpool response, for those it sent, to serve
+    conditional GETs of the dashboards with (see ``superpool_proxy.conditional``).
+    """
+    validators = {}
+    if headers.get('ETag'):
+        validators['etag'] = headers['ETag']
+    last_modified = parse_http_date_safe(headers.get('Last-Modified'))
+    if last_modified is not None:
+        validators['last_modified'] = last_modified
+    return validators
+
+
+def get_session() -> r.Session:
+    """
+    Return the session shared by every SuperpoolClient in this worker process.
+    """
+    pid = os.getpid()
+    if pid not in _SESSIONS:
+        _SESSIONS[pid] = build_session()
+    return _SESSIONS[pid]
+
 
 class SuperpoolClient:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        base_url: str | None = None,
+        session: r.Session | None = None,
+        timeout=None,
+        cache: DashboardCache | None = DASHBOARD_CACHE,
+        quote_cache: DashboardCache | None = QUOTE_CACHE,
+        *,
+        passthrough: bool = SUPERPOOL_RAW_PASSTHROUGH,
+    ) -> None:
+        self.base_url = base_url or SUPERPOOL_BACKEND_URL
+        self._session = session
+        self.cache = cache
+        self.quote_cache = quote_cache
+        # Keep the bytes of successful GETs as `raw`, for views that send them on unchanged
+        self.passthrough = passthrough
+        self.timeout = timeout or (SUPERPOOL_CONNECT_TIMEOUT, SUPERPOOL_READ_TIMEOUT)
         self.headers = {
             'HTTP_X_BACKEND_API_KEY': SUPERPOOL_API_KEY
         }
 
-    def get_all_products(self, **kwargs) -> dict:
-        endpoint = kwargs.get('products', 'dashboard/products')
-        url = f"{SUPERPOOL_BACKEND_URL}/{endpoint}"
-        response = r.get(url, headers=self.headers)  # noqa: S113
-        if response.status_code == 500:
+    @property
+    def session(self) -> r.Session:
+        return self._session or get_session()
+
+    def _request(self, method: str, endpoint: str, timeout=None, headers=None, **kwargs) -> r.Response | dict:
+        url = f'{self.base_url}/{endpoint}'
+        headers = {**self.headers, **headers} if headers else self.headers
+        try:
+            return self.session.request(method, url, headers=headers, timeout=timeout or self.timeout, **kwargs)
+        except r.Timeout:
             return {
-                'status_code': response.status_code,
-                'error': 'Server error from Superpool'
+                'status_code': 504,
+                'error': 'Timed out waiting for Superpool'
             }
-        return {'status_code': 200, 'data': response.json()}
-
-    def get_all_products_for_one_merchant(self, merchant_id) -> dict:
-        endpoint = f'dashboard/merchants/{merchant_id}/products'
-        url = f'{SUPERPOOL_BACKEND_URL}/{endpoint}'
-        response = r.get(url, headers=self.headers)  # noqa: S113
-        if response.status_code == 500:
+        except r.RequestException:
             return {
-                'status_code': response.status_code,
-                'error': 'Server error from Superpool'
+                'status_code': 503,
+                'error': 'Could not connect to Superpool'
             }
 
-        return {'status_code': 200, 'data': response.json()}
-
-    def get_all_policies_for_one_merchant(self, merchant_id) -> dict:
+    def _get(self, endpoint: str, timeout=None, params: dict | None = None, cached: dict | None = None) -> dict:
         """
-        Error 500
+        GET ``endpoint``. When the ``cached`` response has an ETag from Superpool it is revalidated with
+        ``If-None-Match``, and returned as it is if Superpool answers 304.
         """
-        endpoint = f'dashboard/merchants/{merchant_id}/policies'
-        url = f'{SUPERPOOL_BACKEND_URL}/{endpoint}'
-        response = r.get(url, headers=self.headers)  # noqa: S113
-        if response.status_code == 500:
+        headers = {'If-None-Match': cached['etag']} if cached and 'etag' in cached else None
+        response = self._request('GET', endpoint, timeout=timeout, params=params, headers=headers)
+        if isinstance(response, dict):
+            return response
+        if response.status_code == 304 and headers:
+            return cached
+        if response.status_code >= 500:
             return {
                 'status_code': response.status_code,
                 'error': 'Server error from Superpool'
             }
 
-        return {'status_code': 200, 'data': response.json()}
+        result = {'status_code': 200, 'data': response.json(), **upstream_validators(response.headers)}
+        if self.passthrough:
+            result['raw'] = response.content
+        return result
 
-    def get_all_claims_for_one_merchant(self, merchant_id) -> dict:
-        endpoint = f'dashboard/merchants/{merchant_id}/claims'
-        url = f'{SUPERPOOL_BACKEND_URL}/{endpoint}'
-        response = r.get(url, headers=self.headers)  # noqa: S113
-        if response.status_code == 500:
-            return {
-                'status_code': response.status_code,
-                'error': 'Server error from Superpool'
-            }
+    def _cached_get(self, scope: str, resource: str, tenant_id, endpoint: str, timeout=None) -> dict:
+        if self.cache is None:
+            return self._get(endpoint, timeout=timeout)
+        key = self.cache.make_key(scope, resource, tenant_id)
 
-        return {'status_code': 200, 'data': response.json()}
+        def fetch():
+            entry = self.cache.get(key)
+            return self._get(endpoint, timeout=timeout, cached=entry.value if entry is not None else None)
 
-    def get_all_policies_for_one_insurer(self, insurer_id) -> dict:
-        endpoint = f'dashboard/insurers/{insurer_id}/policies'
-        url = f'{SUPERPOOL_BACKEND_URL}/{endpoint}'
+        return self.cache.get_or_fetch(key, fetch)
 
-        response = r.get(url, self.headers)  # noqa: S113
-        if response.status_code == 500:
+    def invalidate_policies(self, tenant_ids) -> None:
+        if self.cache is None:
+            return
+        for tenant_id in tenant_ids:
+            if tenant_id is not None:
+                self.cache.invalidate(resource='policies', tenant_id=tenant_id)
+
+    def _post(self, endpoint: str, payload: dict, expected_status: int, timeout=None) -> dict:
+        response = self._request('POST', endpoint, timeout=timeout, json=payload)
+        if isinstance(response, dict):
+            return response
+        if response.status_code >= 500:
             return {
                 'status_code': response.status_code,
                 'error': 'Server error from Superpool'
             }
-
-        return {'status_code': 200, 'data': response.json()}
-
-    def get_all_claims_for_one_insurer(self, insurer_id) -> dict:
-        endpoint = f'dashboard/insurers/{insurer_id}/claims'
-        url = f'{SUPERPOOL_BACKEND_URL}/{endpoint}'
-        response = r.get(url, headers=self.headers)  # noqa: S113
-
-        if response.status_code == 500:
+        if response.status_code != expected_status:
             return {
                 'status_code': response.status_code,
-                'error': 'Server error from Superpool'
+                'error': response.json()
             }
+        return {'status_code': expected_status, 'data': response.json()}
 
-        return {'status_code': 200, 'data': response.json()}
+    def get_all_products(self, timeout=None, **kwargs) -> dict:
+        endpoint = kwargs.get('products', 'dashboard/products')
+        return self._cached_get('all', 'products', endpoint, endpoint, timeout=timeout)
+
+    def get_all_products_for_one_merchant(self, merchant_id, timeout=None) -> dict:
+        endpoint = f'dashboard/merchants/{merchant_id}/products'
+        return self._cached_get('merchant', 'products', merchant_id, endpoint, timeout=timeout)
 
-    def get_all_products_for_one_insurer(self, insurer_id) -> dict:
+    def get_all_policies_for_one_merchant(self, merchant_id, timeout=None) -> dict:
+        """
+        Error 500
+        """
+        endpoint = f'dashboard/merchants/{merchant_id}/policies'
+        return self._cached_get('merchant', 'policies', merchant_id, endpoint, timeout=timeout)
+
+    def get_all_claims_for_one_merchant(self, merchant_id, timeout=None) -> dict:
+        endpoint = f'dashboard/merchants/{merchant_id}/claims'
+        return self._cached_get('merchant', 'claims', merchant_id, endpoint, timeout=timeout)
+
+    def get_all_policies_for_one_insurer(self, insurer_id, timeout=None) -> dict:
+        endpoint = f'dashboard/insurers/{insurer_id}/policies'
+        return self._cached_get('insurer', 'policies', insurer_id, endpoint, timeout=timeout)
+
+    def get_all_claims_for_one_insurer(self, insurer_id, timeout=None) -> dict:
+        endpoint = f'dashboard/insurers/{insurer_id}/claims'
+        return self._cached_get('insurer', 'claims', insurer_id, endpoint, timeout=timeout)
+
+    def get_all_products_for_one_insurer(self, insurer_id, timeout=None) -> dict:
         endpoint = f'dashboard/insurers/{insurer_id}/products'
-        url = f'{SUPERPOOL_BACKEND_URL}/{endpoint}'
-        response = r.get(url, headers=self.headers)  # noqa: S113
+        return self._cached_get('insurer', 'products', insurer_id, endpoint, timeout=timeout)
 
-        if response.status_code == 500:
-            return {
-                'status_code': response.status_code,
-                'error': 'Server error from Superpool'
-            }
+    def get_changed_records(self, scope: str, resource: str, tenant_id, updated_after=None, timeout=None) -> dict:
+        """
+        Fetch one tenant's ``resource`` list straight from Superpool, bypassing the dashboard cache.
+        ``updated_after`` is forwarded so Superpool can return only records changed since the last sync.
+        """
+        endpoint = f'dashboard/{scope}s/{tenant_id}/{resource}'
+        params = {'updated_after': updated_after.isoformat()} if updated_after else None
+        return self._get(endpoint, timeout=timeout, params=params)
 
-        return {'status_code': 200, 'data': response.json()}
+    def get_page(self, scope: str, resource: str, tenant_id, after=None, limit=None, timeout=None) -> dict:
+        """
+        One page of a tenant's ``resource`` list, for the Superpool endpoints that take ``after`` (the id of the
+        last record already seen) and ``limit``. Pages bypass the dashboard cache.
+        """
+        endpoint = f'dashboard/{scope}s/{tenant_id}/{resource}'
+        params = {key: value for key, value in (('after', after), ('limit', limit)) if value is not None}
+        return self._get(endpoint, timeout=timeout, params=params)
 
-    def get_quote(self, customer_metadata: dict, insurance_details: dict, coverage_preferences: dict) -> dict:
+    def get_quote(
+        self, customer_metadata: dict, insurance_details: dict, coverage_preferences: dict, timeout=None
+    ) -> dict:
         endpoint = 'quotes'
-        url = f'{SUPERPOOL_BACKEND_URL}/{endpoint}'
         payload = {
             'customer_metadata': customer_metadata,
             'insurance_details': insurance_details,
             'coverage_preferences': coverage_preferences
         }
+        if self.quote_cache is None:
+            return self._post(endpoint, payload, expected_status=200, timeout=timeout)
 
-        response = r.post(url, json=payload, headers=self.headers)  # noqa: S113
-        if response.status_code == 500:
-            return {
-                'status_code': response.status_code,
-                'error': 'Server error from Superpool'
-            }
-        if response.status_code != 200:  # noqa: RET503, RUF100
-            return {
-                'status_code': response.status_code,
-                'error': response.json()
-            }
-        return {'status_code': 200, 'data': response.json()}
+        key = self.quote_cache.make_key('quote', 'quotes', request_fingerprint(payload))
+        cached = self.quote_cache.get_fresh(key)
+        if cached is not None:
+            QUOTE_METRICS.incr('cache_hits')
+            return cached
 
-    def sell_policy(self, customer_metadata, additional_information, activation_metadata, product_type, merchant_code, quote_code):
+        def fetch():
+            response = self._post(endpoint, payload, expected_status=200, timeout=timeout)
+            if response.get('status_code') == 200:
+                self.quote_cache.set(key, response)
+            return response
+
+        return _QUOTE_FLIGHTS.do(key, fetch)
+
+    def sell_policy(
+        self,
+        customer_metadata,
+        additional_information,
+        activation_metadata,
+        product_type,
+        merchant_code,
+        quote_code,
+        timeout=None,
+        invalidate_tenants=(),
+    ):
+        """
+        Sell a policy on Superpool. On success the cached policy lists of every id in
+        ``invalidate_tenants`` (merchant tenant ids and insurer ids) are dropped.
+        """
         endpoint = 'policies'
-        url = f'{SUPERPOOL_BACKEND_URL}/{endpoint}'
         payload = {
             'quote_code': quote_code,
             'product_type': product_type,
@@ -140,18 +276,10 @@ class SuperpoolClient:
             'additional_information': additional_information,
             'activation_metadata': activation_metadata
         }
-        response = r.post(url, json=payload, headers=self.headers)  # noqa: S113
-        if response.status_code == 500:
-            return {
-                'status_code': response.status_code,
-                'error': 'Server error from Superpool'
-            }
-        if response.status_code != 201:  # noqa: RET503, RUF100
-            return {
-                'status_code': response.status_code,
-                'error': response.json()
-            }
-        return {'status_code': 201, 'data': response.json()}
+        response = self._post(endpoint, payload, expected_status=201, timeout=timeout)
+        if response.get('status_code') == 201:
+            self.invalidate_policies(invalidate_tenants)
+        return response
 
 
 def main() -> None:
@@ -0,0 +1,105 @@
+import ssl
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path, body))
+            queued = self.server.status_queue.pop(0) if self.server.status_queue else None
+
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        not_found = (404, {'detail': 'Not found'})
+        status_code, payload = queued or self.server.routes.get((self.command, self.path.split('?')[0]), not_found)
+        content = json.dumps(payload).encode()
+        etag = self.server.etag
+        if etag and not queued and self.command == 'GET' and self.headers.get('If-None-Match') == etag:
+            status_code, content = 304, b''
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = _reply  # noqa: N815
+    do_POST = _reply  # noqa: N815
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+
+class SuperpoolStub:
+    """
+    In-process stand-in for the Superpool API used by tests and benchmarks.
+
+    Routes map ``(method, path)`` to ``(status_code, json_payload)``. Anything pushed onto
+    ``status_queue`` is served first, which is how tests simulate transient upstream failures. ``delay``
+    holds every response back by that many seconds, to keep calls in flight long enough to overlap. With
+    ``etag``, every response carries that ETag and a GET sending it back in ``If-None-Match`` gets a 304.
+    """
+
+    def __init__(
+        self,
+        routes: dict | None = None,
+        certfile: str | None = None,
+        keyfile: str | None = None,
+        delay: float = 0,
+        etag: str | None = None,
+    ):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.routes = routes or {}
+        self.server.status_queue = []
+        self.server.requests = []
+        self.server.connections = 0
+        self.server.delay = delay
+        self.server.etag = etag
+        self.scheme = 'http'
+        if certfile:
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            context.load_cert_chain(certfile, keyfile)
+            self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+            self.scheme = 'https'
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'{self.scheme}://{host}:{port}'
+
+    @property
+    def connections(self) -> int:
+        return self.server.connections
+
+    @property
+    def requests(self) -> list:
+        return self.server.requests
+
+    @property
+    def status_queue(self) -> list:
+        return self.server.status_queue
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
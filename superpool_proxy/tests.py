@@ -1,3 +1,827 @@
-from django.test import TestCase
+import io
+import gzip
+import json
+import uuid
+import asyncio
+import weakref
+from datetime import datetime, timezone
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from reconciliation_backend.compression import compress
+
+from django.db import connection
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+
+from agents.models import AgentPolicySale
+
+from user.tokens import PrincipalRefreshToken
+from user.testing import INSURER_ID, jwt_client, create_agent, create_insurer, create_merchant
+
+from . import views
+from .cache import DashboardCache
+from .export import mirrored_records
+from .mirror import sync_tenant, fetch_dashboard
+from .models import MirroredPolicy, MirroredProduct, MirrorSyncState
+from .quotes import QuoteIndex
+from .testing import SuperpoolStub
+from .aggregation import ColumnCache, PolicyColumns, insurer_summary
+from .singleflight import QUOTE_METRICS
+from .reconciliation import reconcile, summarize
+from .superpool_client import SuperpoolClient, build_session
+from .async_superpool_client import AsyncSuperpoolClient, build_async_client
+
+PRODUCTS = [{'id': 1, 'name': 'Travel Basic'}]
+
+
+class SuperpoolClientSessionTestCase(SimpleTestCase):
+    ROUTES = {
+        ('GET', '/dashboard/products'): (200, PRODUCTS),
+        ('POST', '/quotes'): (200, {'data': []}),
+    }
+
+    def test_requests_reuse_one_connection(self):
+        with SuperpoolStub(self.ROUTES) as stub:
+            client = SuperpoolClient(base_url=stub.url, cache=None, session=build_session(pool_size=2, max_retries=0))
+            for _ in range(5):
+                response = client.get_all_products()
+                self.assertEqual(response, {'status_code': 200, 'data': PRODUCTS})
+
+        self.assertEqual(stub.connections, 1)
+
+    def test_get_is_retried_on_gateway_errors(self):
+        with SuperpoolStub(self.ROUTES) as stub:
+            stub.status_queue.extend([(503, {}), (502, {})])
+            client = SuperpoolClient(
+                base_url=stub.url, cache=None, session=build_session(max_retries=3, backoff_factor=0)
+            )
+            response = client.get_all_products()
+
+        self.assertEqual(response.get('status_code'), 200)
+        self.assertEqual(len(stub.requests), 3)
+
+    def test_post_is_never_retried(self):
+        with SuperpoolStub(self.ROUTES) as stub:
+            stub.status_queue.append((503, {}))
+            client = SuperpoolClient(
+                base_url=stub.url, cache=None, quote_cache=None, session=build_session(max_retries=3, backoff_factor=0)
+            )
+            response = client.get_quote({}, {}, coverage_preferences={})
+
+        self.assertEqual(response.get('status_code'), 503)
+        self.assertEqual(len(stub.requests), 1)
+
+    def test_unreachable_superpool_returns_error(self):
+        client = SuperpoolClient(base_url='http://127.0.0.1:9', cache=None, session=build_session(max_retries=0))
+        response = client.get_all_products(timeout=(0.5, 0.5))
+
+        self.assertEqual(response.get('status_code'), 503)
+        self.assertIn('error', response)
+
+
+class AsyncSuperpoolClientTestCase(SimpleTestCase):
+    ROUTES = SuperpoolClientSessionTestCase.ROUTES
+
+    async def test_concurrent_calls_share_the_pool(self):
+        with SuperpoolStub(self.ROUTES) as stub:
+            async with build_async_client(max_connections=10, max_keepalive_connections=10) as http_client:
+                client = AsyncSuperpoolClient(base_url=stub.url, cache=None, client=http_client)
+                responses = await asyncio.gather(*(client.get_all_products() for _ in range(50)))
+
+        self.assertTrue(all(response == {'status_code': 200, 'data': PRODUCTS} for response in responses))
+        self.assertLessEqual(stub.connections, 10)
+
+    async def test_get_is_retried_on_gateway_errors(self):
+        with SuperpoolStub(self.ROUTES) as stub:
+            stub.status_queue.append((503, {}))
+            async with build_async_client() as http_client:
+                client = AsyncSuperpoolClient(
+                    base_url=stub.url, cache=None, quote_cache=None, client=http_client, backoff_factor=0
+                )
+                response = await client.get_all_products()
+                quote = await client.get_quote({}, {}, coverage_preferences={})
+
+        self.assertEqual(response.get('status_code'), 200)
+        self.assertEqual(quote.get('status_code'), 200)
+        self.assertEqual(len(stub.requests), 3)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class DashboardCacheTestCase(SimpleTestCase):
+    INSURER_ID = '6f1c3c0e-7d43-4a65-9d0e-0e7d0c1d2a11'
+    ROUTES = {
+        ('GET', f'/dashboard/insurers/{INSURER_ID}/policies'): (200, [{'id': 'pol_1'}]),
+        ('POST', '/policies'): (201, {'id': 'pol_2'}),
+    }
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = DashboardCache(max_entries=2, ttls={'policies': 60}, stale_ttl=30, clock=self.clock)
+
+    def test_fresh_entries_are_served_from_cache(self):
+        calls = []
+        key = self.cache.make_key('insurer', 'policies', self.INSURER_ID)
+        for _ in range(3):
+            self.cache.get_or_fetch(key, lambda: calls.append(1) or {'status_code': 200, 'data': []})
+
+        self.assertEqual(len(calls), 1)
+
+    def test_errors_are_not_cached(self):
+        calls = []
+        key = self.cache.make_key('insurer', 'policies', self.INSURER_ID)
+        for _ in range(2):
+            self.cache.get_or_fetch(key, lambda: calls.append(1) or {'status_code': 500, 'error': 'boom'})
+
+        self.assertEqual(len(calls), 2)
+
+    async def test_stale_entries_are_served_while_revalidating(self):
+        key = self.cache.make_key('insurer', 'policies', self.INSURER_ID)
+        self.cache.set(key, {'status_code': 200, 'data': ['old']})
+        self.clock.now = 70
+
+        async def fetch():
+            return {'status_code': 200, 'data': ['new']}
+
+        stale = await self.cache.aget_or_fetch(key, fetch)
+        await asyncio.gather(*self.cache._tasks)  # noqa: SLF001
+        fresh = await self.cache.aget_or_fetch(key, fetch)
+
+        self.assertEqual(stale.get('data'), ['old'])
+        self.assertEqual(fresh.get('data'), ['new'])
+
+    def test_expired_entries_are_refetched(self):
+        key = self.cache.make_key('insurer', 'policies', self.INSURER_ID)
+        self.cache.set(key, {'status_code': 200, 'data': ['old']})
+        self.clock.now = 100
+
+        response = self.cache.get_or_fetch(key, lambda: {'status_code': 200, 'data': ['new']})
+
+        self.assertEqual(response.get('data'), ['new'])
+
+    def test_least_recently_used_entry_is_evicted(self):
+        first, second, third = (self.cache.make_key('merchant', 'policies', tenant) for tenant in 'abc')
+        self.cache.set(first, {'status_code': 200})
+        self.cache.set(second, {'status_code': 200})
+        self.cache.get(first)
+        self.cache.set(third, {'status_code': 200})
+
+        self.assertIsNotNone(self.cache.get(first))
+        self.assertIsNone(self.cache.get(second))
+
+    def test_paging_through_policies_costs_one_upstream_call(self):
+        with SuperpoolStub(self.ROUTES) as stub:
+            client = SuperpoolClient(base_url=stub.url, session=build_session(), cache=self.cache)
+            for _ in range(5):
+                client.get_all_policies_for_one_insurer(self.INSURER_ID)
+
+        self.assertEqual(len(stub.requests), 1)
+
+    def test_sell_policy_invalidates_tenant_policies(self):
+        with SuperpoolStub(self.ROUTES) as stub:
+            client = SuperpoolClient(base_url=stub.url, session=build_session(), cache=self.cache)
+            client.get_all_policies_for_one_insurer(self.INSURER_ID)
+            client.sell_policy({}, {}, {}, 'Travel', 'MER-123', 'Quo_1', invalidate_tenants=(self.INSURER_ID, None))
+            client.get_all_policies_for_one_insurer(self.INSURER_ID)
+
+        self.assertEqual([request[0] for request in stub.requests], ['GET', 'POST', 'GET'])
+
+
+class SuperpoolMirrorTestCase(TestCase):
+    INSURER_ID = DashboardCacheTestCase.INSURER_ID
+    POLICIES_PATH = f'/dashboard/insurers/{INSURER_ID}/policies'
+    POLICIES = [
+        {'id': 'pol_1', 'premium': '1500.00', 'updated_at': '2024-06-01T10:00:00Z'},
+        {'id': 'pol_2', 'premium': '2500.00', 'updated_at': '2024-06-02T10:00:00Z'},
+    ]
+
+    def sync(self, policies, **kwargs):
+        with SuperpoolStub({('GET', self.POLICIES_PATH): (200, {'data': policies})}) as stub:
+            client = SuperpoolClient(base_url=stub.url, cache=None, session=build_session(max_retries=0))
+            response = sync_tenant(client, 'insurer', 'policies', self.INSURER_ID, **kwargs)
+        return response, stub.requests
+
+    def test_sync_upserts_policies(self):
+        self.sync(self.POLICIES)
+        updated = [{**self.POLICIES[1], 'premium': '3000.00', 'updated_at': '2024-06-03T10:00:00Z'}]
+        response, _ = self.sync(updated)
+
+        self.assertEqual(response, {'status_code': 200, 'data': {'synced': 1}})
+        self.assertEqual(MirroredPolicy.objects.count(), 2)
+        self.assertEqual(str(MirroredPolicy.objects.get(superpool_id='pol_2').premium), '3000.00')
+
+    def test_records_shared_by_tenants_are_kept_for_each(self):
+        other_insurer_id = '2c8d7b63-5b8d-4c9f-8d2e-4a2f4b1f7f22'
+        tenants = [('insurer', self.INSURER_ID), ('insurer', other_insurer_id), ('merchant', INSURER_ID)]
+        routes = {('GET', f'/dashboard/{scope}s/{tenant_id}/products'): (200, PRODUCTS) for scope, tenant_id in tenants}
+        with SuperpoolStub(routes) as stub:
+            client = SuperpoolClient(base_url=stub.url, cache=None, session=build_session(max_retries=0))
+            sync_tenant(client, 'insurer', 'products', self.INSURER_ID)
+            sync_tenant(client, 'insurer', 'products', other_insurer_id)
+            sync_tenant(client, 'merchant', 'products', INSURER_ID)
+            sync_tenant(client, 'insurer', 'products', self.INSURER_ID, full=True)
+
+        self.assertCountEqual(MirroredProduct.objects.values_list('insurer_id', 'merchant_tenant_id'), [
+            (uuid.UUID(self.INSURER_ID), None),
+            (uuid.UUID(other_insurer_id), None),
+            (None, INSURER_ID),
+        ])
+
+    def test_resync_only_asks_for_changed_records(self):
+        self.sync(self.POLICIES)
+        response, requests = self.sync(self.POLICIES)
+        state = MirrorSyncState.objects.get(scope='insurer', resource='policies', tenant_id=self.INSURER_ID)
+
+        # Only the record at the mark is written again
+        self.assertEqual(response['data']['synced'], 1)
+        self.assertIn('updated_after=2024-06-02T10', requests[0][1])
+        self.assertEqual(state.high_water_mark, datetime(2024, 6, 2, 10, tzinfo=timezone.utc))
+
+    @override_settings(TIME_ZONE='UTC')
+    def test_resync_keeps_records_without_an_offset_or_update_time(self):
+        self.sync(self.POLICIES)
+        changed = [
+            {'id': 'pol_3', 'premium': '100.00', 'updated_at': '2024-06-05T10:00:00'},
+            {'id': 'pol_4', 'premium': '200.00'},
+            {'id': 'pol_5', 'premium': '300.00', 'updated_at': '2024-05-01T10:00:00'},
+        ]
+        response, _ = self.sync(changed)
+        state = MirrorSyncState.objects.get(scope='insurer', resource='policies', tenant_id=self.INSURER_ID)
+
+        self.assertEqual(response['data']['synced'], 2)
+        self.assertFalse(MirroredPolicy.objects.filter(superpool_id='pol_5').exists())
+        self.assertEqual(state.high_water_mark, datetime(2024, 6, 5, 10, tzinfo=timezone.utc))
+
+    def test_full_sync_ignores_high_water_mark(self):
+        self.sync(self.POLICIES)
+        response, requests = self.sync(self.POLICIES, full=True)
+
+        self.assertEqual(response['data']['synced'], 2)
+        self.assertNotIn('updated_after', requests[0][1])
+
+    def test_full_sync_prunes_records_gone_from_superpool(self):
+        self.sync(self.POLICIES)
+        response, _ = self.sync(self.POLICIES[1:], full=True)
+
+        self.assertEqual(response['data'], {'synced': 1, 'pruned': 1})
+        self.assertEqual(list(MirroredPolicy.objects.values_list('superpool_id', flat=True)), ['pol_2'])
+
+    @override_settings(SUPERPOOL_MIRROR_READS=True)
+    async def test_dashboard_reads_are_served_from_the_mirror(self):
+        await sync_to_async(self.sync)(self.POLICIES)
+
+        with SuperpoolStub() as stub:
+            client = AsyncSuperpoolClient(base_url=stub.url, cache=None)
+            response = await fetch_dashboard(client, 'insurer', 'policies', self.INSURER_ID)
+
+        self.assertEqual([policy['id'] for policy in response['data']], ['pol_2', 'pol_1'])
+        self.assertEqual(stub.requests, [])
+
+
+class ReconciliationEngineTestCase(SimpleTestCase):
+    POLICIES = [
+        {'id': 'pol_1', 'quote_code': 'Quo_1', 'merchant_code': 'MER-1', 'premium': '2000.00'},
+        {'id': 'pol_2', 'quote_code': 'Quo_2', 'merchant_code': 'MER-1', 'premium': '3000.00'},
+        {'id': 'pol_3', 'quote_code': 'Quo_3', 'merchant_code': 'MER-2', 'premium': '5000.00'},
+    ]
+    SALES = [
+        {'quote_code': 'Quo_1', 'merchant_code': 'MER-1', 'superpool_policy_id': '', 'premium': '2000.00'},
+        {'quote_code': 'Quo_2', 'merchant_code': 'MER-1', 'superpool_policy_id': 'pol_2', 'premium': '2500.00'},
+        {'quote_code': 'Quo_9', 'merchant_code': 'MER-1', 'superpool_policy_id': '', 'premium': '1200.00'},
+        {'quote_code': 'Quo_1', 'merchant_code': 'MER-1', 'superpool_policy_id': '', 'premium': '2000.00'},
+    ]
+    CLAIMS = [
+        {'policy_id': 'pol_1', 'claim_amount': '500'},
+        {'policy_id': 'pol_1', 'claim_amount': '250'},
+        {'policy_id': 'pol_404', 'claim_amount': '100'},
+    ]
+
+    def test_rows_land_in_the_right_buckets(self):
+        report = summarize(reconcile(self.POLICIES, self.SALES, self.CLAIMS))
+        buckets = report.as_dict()
+
+        self.assertEqual({bucket: totals['count'] for bucket, totals in buckets.items()}, {
+            'matched': 1,
+            'amount_mismatch': 1,
+            'missing_on_superpool': 2,
+            'missing_sale': 1,
+            'orphan_claim': 1,
+        })
+        self.assertEqual(buckets['matched']['claimed'], '750')
+        self.assertEqual(report.samples['missing_sale'][0].policy.policy_id, 'pol_3')
+        self.assertEqual(report.samples['orphan_claim'][0].claim_policy_id, 'pol_404')
+
+    def test_partitioned_join_gives_the_same_report(self):
+        in_memory = summarize(reconcile(self.POLICIES, self.SALES, self.CLAIMS)).as_dict()
+        partitioned = summarize(reconcile(self.POLICIES, self.SALES, self.CLAIMS, partitions=4)).as_dict()
+
+        self.assertEqual(in_memory, partitioned)
+
+    def test_partitioned_join_matches_by_policy_id_across_quote_codes(self):
+        policies = [{'id': 'p1', 'quote_code': '', 'merchant_code': 'MER-1', 'premium': '100.00'}]
+        sales = [{'quote_code': 'Q1', 'merchant_code': 'MER-1', 'superpool_policy_id': 'p1', 'premium': '100.00'}]
+
+        for partitions in (1, 8):
+            with self.subTest(partitions=partitions):
+                report = summarize(reconcile(policies, sales, partitions=partitions))
+                self.assertEqual(report.counts['matched'], 1)
+                self.assertEqual(report.counts['missing_on_superpool'], 0)
+                self.assertEqual(report.counts['missing_sale'], 0)
+
+
+class ReconcileInsurerTestCase(TestCase):
+    POLICIES = ReconciliationEngineTestCase.POLICIES
+    ROUTES = {
+        ('GET', f'/dashboard/insurers/{INSURER_ID}/policies'): (200, POLICIES),
+        ('GET', f'/dashboard/insurers/{INSURER_ID}/claims'): (200, ReconciliationEngineTestCase.CLAIMS),
+    }
+
+    def setUp(self):
+        insurer = create_insurer()
+        agent = create_agent(insurer)
+        AgentPolicySale.objects.bulk_create(
+            AgentPolicySale(agent=agent, insurer=insurer, product='Travel', **sale)
+            for sale in ReconciliationEngineTestCase.SALES
+        )
+
+    def reconcile(self, stub, *args) -> dict:
+        out = io.StringIO()
+        with mock.patch('superpool_proxy.superpool_client.SUPERPOOL_BACKEND_URL', stub.url):
+            call_command('reconcile_insurer', *args, stdout=out)
+        return json.loads(out.getvalue())
+
+    def test_command_reports_the_buckets(self):
+        with SuperpoolStub(self.ROUTES) as stub:
+            report = self.reconcile(stub, '--partitions', '4')
+
+        self.assertEqual(report['insurer_id'], str(INSURER_ID))
+        self.assertEqual({bucket: totals['count'] for bucket, totals in report['buckets'].items()}, {
+            'matched': 1,
+            'amount_mismatch': 1,
+            'missing_on_superpool': 2,
+            'missing_sale': 1,
+            'orphan_claim': 1,
+        })
+
+    @mock.patch('superpool_proxy.pagination.SUPERPOOL_PAGINATED_RESOURCES', {'policies'})
+    def test_paginated_policies_are_read_a_page_at_a_time(self):
+        routes = {**self.ROUTES, ('GET', f'/dashboard/insurers/{INSURER_ID}/policies'): (200, self.POLICIES[:2])}
+        with SuperpoolStub(routes) as stub:
+            report = self.reconcile(stub, '--page-size', '2')
+
+        policies_path = f'/dashboard/insurers/{INSURER_ID}/policies'
+        policy_paths = [path for _, path, _ in stub.requests if path.startswith(policies_path)]
+        self.assertEqual(len(policy_paths), 2)
+        self.assertIn('limit=2', policy_paths[0])
+        self.assertIn('after=pol_2&limit=2', policy_paths[1])
+        self.assertEqual(report['buckets']['matched']['count'], 1)
+
+    def test_superpool_errors_are_reported(self):
+        routes = {**self.ROUTES, ('GET', f'/dashboard/insurers/{INSURER_ID}/claims'): (500, {})}
+        with SuperpoolStub(routes) as stub:
+            err = io.StringIO()
+            with mock.patch('superpool_proxy.superpool_client.SUPERPOOL_BACKEND_URL', stub.url):
+                call_command('reconcile_insurer', stdout=io.StringIO(), stderr=err)
+
+        self.assertIn('1 insurers could not be reconciled', err.getvalue())
+
+
+class InsurerSummaryTestCase(SimpleTestCase):
+    INSURER_ID = DashboardCacheTestCase.INSURER_ID
+    POLICIES = [
+        {'id': 'pol_1', 'product_name': 'Travel Cover', 'product_type': 'Basic', 'merchant_code': 'MER-1',
+         'premium': '2000.00', 'broker_commission': 20, 'created_at': '2024-05-02T10:00:00Z'},
+        {'id': 'pol_2', 'product_name': 'Travel Cover', 'product_type': 'Gold', 'merchant_code': 'MER-2',
+         'premium': '7000.00', 'broker_commission': 18, 'created_at': '2024-06-02T10:00:00Z'},
+        {'id': 'pol_3', 'product_name': 'Motor', 'product_type': 'Basic', 'merchant_code': 'MER-1',
+         'premium': '2000.00', 'broker_commission': 20, 'created_at': '2024-06-09T10:00:00Z'},
+    ]
+    CLAIMS = [{'policy_id': 'pol_1', 'claim_amount': '500'}, {'policy_id': 'pol_3', 'claim_amount': '1500'}]
+
+    def test_group_by_sums_premium_commission_and_claims(self):
+        columns = PolicyColumns.from_records(self.POLICIES, self.CLAIMS)
+        by_product_type = columns.group_by('product_type')
+
+        self.assertEqual(by_product_type[0], {
+            'product_type': 'Gold', 'policies': 1, 'premium': 7000.0,
+            'broker_commission': 1260.0, 'claims_paid': 0.0, 'loss_ratio': 0.0,
+        })
+        self.assertEqual(by_product_type[1], {
+            'product_type': 'Basic', 'policies': 2, 'premium': 4000.0,
+            'broker_commission': 800.0, 'claims_paid': 2000.0, 'loss_ratio': 0.5,
+        })
+        self.assertEqual([month['month'] for month in columns.group_by('month')], ['2024-06', '2024-05'])
+
+    def test_amounts_that_are_not_numbers_count_as_zero(self):
+        policies = [*self.POLICIES, {'id': 'pol_4', 'premium': 'NIL', 'broker_commission': 'n/a'}]
+        claims = [*self.CLAIMS, {'policy_id': 'pol_2', 'claim_amount': 'pending'}]
+
+        totals = PolicyColumns.from_records(policies, claims).summary()['totals']
+
+        self.assertEqual(totals['policies'], 4)
+        self.assertEqual(totals['premium'], 11000.0)
+        self.assertEqual(totals['claims_paid'], 2000.0)
+
+    def test_money_totals_are_exact(self):
+        # Summed as float64, these came to 4999999999999.58
+        policies = [{'id': f'pol_{i}', 'premium': '99999999999.99'} for i in range(50)]
+        policies += [{'id': f'tip_{i}', 'premium': '0.01'} for i in range(7)]
+
+        totals = PolicyColumns.from_records(policies, []).summary()['totals']
+
+        self.assertEqual(totals['premium'], 4999999999999.57)
+
+    async def test_summary_builds_columns_once_per_data_version(self):
+        routes = {
+            ('GET', f'/dashboard/insurers/{self.INSURER_ID}/policies'): (200, self.POLICIES),
+            ('GET', f'/dashboard/insurers/{self.INSURER_ID}/claims'): (200, self.CLAIMS),
+        }
+        column_cache = ColumnCache()
+        with SuperpoolStub(routes) as stub:
+            async with build_async_client() as http_client:
+                client = AsyncSuperpoolClient(base_url=stub.url, client=http_client, cache=DashboardCache())
+                first = await insurer_summary(client, self.INSURER_ID, cache=column_cache)
+                second = await insurer_summary(client, self.INSURER_ID, cache=column_cache)
+
+        self.assertEqual(first, second)
+        self.assertEqual(first['data']['totals']['loss_ratio'], round(2000 / 11000, 4))
+        self.assertEqual(len(stub.requests), 2)
+
+
+class QuoteCoalescingTestCase(SimpleTestCase):
+    QUOTES = {'data': [{'provider': 'Heirs', 'product': 'Travel Basic', 'premium': '2500.00'}]}
+    ROUTES = {('POST', '/quotes'): (200, QUOTES)}
+    CUSTOMER = {'first_name': 'Ada', 'last_name': 'Obi', 'email': 'ada@example.com'}
+    DETAILS = {'product_type': 'Travel', 'destination': 'Ghana'}
+
+    def setUp(self):
+        QUOTE_METRICS.reset()
+        self.quote_cache = DashboardCache(ttls={'quotes': 30}, stale_ttl=0)
+
+    async def test_identical_concurrent_quotes_share_one_upstream_call(self):
+        with SuperpoolStub(self.ROUTES, delay=0.2) as stub:
+            async with build_async_client() as http_client:
+                client = AsyncSuperpoolClient(base_url=stub.url, client=http_client, quote_cache=self.quote_cache)
+                reordered = dict(reversed(self.CUSTOMER.items()))
+                responses = await asyncio.gather(
+                    *(client.get_quote(self.CUSTOMER, self.DETAILS, {}) for _ in range(9)),
+                    client.get_quote(reordered, self.DETAILS, {}),
+                )
+                cached = await client.get_quote(self.CUSTOMER, self.DETAILS, {})
+
+        self.assertTrue(all(response == {'status_code': 200, 'data': self.QUOTES} for response in responses))
+        self.assertEqual(cached, responses[0])
+        self.assertEqual(len(stub.requests), 1)
+        self.assertEqual(QUOTE_METRICS.snapshot(), {'upstream_calls': 1, 'coalesced': 9, 'cache_hits': 1})
+
+    def test_threads_coalesce_and_different_quotes_do_not(self):
+        with SuperpoolStub(self.ROUTES, delay=0.2) as stub:
+            client = SuperpoolClient(base_url=stub.url, session=build_session(), quote_cache=self.quote_cache)
+            with ThreadPoolExecutor(max_workers=6) as pool:
+                same = [pool.submit(client.get_quote, self.CUSTOMER, self.DETAILS, {}) for _ in range(5)]
+                other = pool.submit(client.get_quote, self.CUSTOMER, {**self.DETAILS, 'destination': 'Kenya'}, {})
+                responses = [future.result() for future in [*same, other]]
+
+        self.assertTrue(all(response.get('status_code') == 200 for response in responses))
+        self.assertEqual(len(stub.requests), 2)
+        self.assertEqual(QUOTE_METRICS.snapshot()['coalesced'], 4)
+
+    async def test_failed_quotes_are_not_cached(self):
+        with SuperpoolStub(self.ROUTES) as stub:
+            stub.status_queue.append((503, {}))
+            async with build_async_client() as http_client:
+                client = AsyncSuperpoolClient(base_url=stub.url, client=http_client, quote_cache=self.quote_cache)
+                failed = await client.get_quote(self.CUSTOMER, self.DETAILS, {})
+                retried = await client.get_quote(self.CUSTOMER, self.DETAILS, {})
+
+        self.assertEqual(failed.get('status_code'), 503)
+        self.assertEqual(retried.get('status_code'), 200)
+        self.assertEqual(len(stub.requests), 2)
+
+
+class QuoteIndexTestCase(SimpleTestCase):
+    QUOTES = [
+        {'provider': 'Heirs', 'product': 'Travel Basic', 'premium': '2500.00'},
+        {'provider': 'AXA', 'product': 'Travel Basic', 'premium': '2700.00'},
+        {'provider': 'Heirs', 'product': 'Travel Basic', 'premium': '3100.00'},
+        {'provider': 'Heirs', 'product': 'Travel Gold', 'premium': '7000.00'},
+    ]
+
+    def test_quotes_are_grouped_by_provider_and_product(self):
+        index = QuoteIndex.from_response({'status_code': 200, 'data': {'data': self.QUOTES}})
+
+        self.assertEqual(len(index), 4)
+        self.assertEqual([quote['premium'] for quote in index.find('Heirs', 'Travel Basic')], ['2500.00', '3100.00'])
+        self.assertEqual(index.find('Leadway', 'Travel Basic'), [])
+
+    def test_index_is_reused_for_the_same_response(self):
+        response = {'status_code': 200, 'data': {'data': self.QUOTES}}
+
+        self.assertIs(QuoteIndex.from_response(response), QuoteIndex.from_response(response))
+
+    def test_index_goes_away_with_the_response(self):
+        response = {'status_code': 200, 'data': {'data': self.QUOTES}}
+        index = weakref.ref(QuoteIndex.from_response(response))
+        del response
+
+        self.assertIsNone(index())
+
+
+class DashboardEndpointQueryCountTestCase(TestCase):
+    """
+    Once the caller is cached for their token, the dashboard endpoints make no queries at all. A token seen
+    for the first time costs one query, for the caller's profile row and user together.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.insurer = create_insurer()
+        self.merchant = create_merchant()
+        routes = {('GET', '/dashboard/products'): (200, PRODUCTS)}
+        for scope, tenant_id in (('insurers', INSURER_ID), ('merchants', self.merchant.tenant_id)):
+            for resource in ('products', 'policies', 'claims'):
+                routes['GET', f'/dashboard/{scope}/{tenant_id}/{resource}'] = (200, [{'id': f'{resource}_1'}])
+        stub = SuperpoolStub(routes).__enter__()
+        self.addCleanup(stub.__exit__)
+        patcher = mock.patch.object(views, 'SUPERPOOL_HANDLER', AsyncSuperpoolClient(base_url=stub.url, cache=None))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertQueriesPerRequest(self, user, route: str, queries: int):  # noqa: N802
+        client = jwt_client(user)
+        client.get(route)
+        with self.assertNumQueries(queries):
+            response = client.get(route)
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_insurer_dashboards(self):
+        for route in ('products', 'insurer/products', 'insurer/policies', 'insurer/claims', 'insurer/summary'):
+            self.assertQueriesPerRequest(self.insurer.user, f'/api/dashboard/{route}', 0)
+
+    def test_merchant_dashboards(self):
+        for route in ('products', 'policies', 'claims'):
+            self.assertQueriesPerRequest(self.merchant.user, f'/api/dashboard/merchants/{route}', 0)
+
+    def test_cold_token(self):
+        for user, route in ((self.insurer.user, 'insurer/products'), (self.merchant.user, 'merchants/products')):
+            client = jwt_client(user)
+            with self.assertNumQueries(1):
+                response = client.get(f'/api/dashboard/{route}')
+            self.assertEqual(response.status_code, 200, response.content)
+
+
+
+class ExportTestCase(TestCase):
+    POLICIES = [{'id': f'pol_{i}', 'premium': f'{i}000.00', 'quote_code': f'q{i}'} for i in (3, 1, 2)]
+
+    def setUp(self):
+        cache.clear()
+        self.insurer = create_insurer()
+        self.token = str(PrincipalRefreshToken.for_user(self.insurer.user).access_token)
+        stub = SuperpoolStub({('GET', f'/dashboard/insurers/{INSURER_ID}/policies'): (200, self.POLICIES)}).__enter__()
+        self.addCleanup(stub.__exit__)
+        patcher = mock.patch.object(views, 'SUPERPOOL_HANDLER', AsyncSuperpoolClient(base_url=stub.url, cache=None))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def export(self, route: str) -> tuple[int, str]:
+        response = await self.async_client.get(route, headers={'Authorization': f'Bearer {self.token}'})
+        if not response.streaming:
+            return response.status_code, response.content.decode()
+        return response.status_code, b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+    async def test_policies_stream_as_ndjson_in_id_order(self):
+        status_code, content = await self.export('/api/dashboard/insurer/policies/export.ndjson')
+
+        self.assertEqual(status_code, 200)
+        self.assertEqual([json.loads(line)['id'] for line in content.splitlines()], ['pol_1', 'pol_2', 'pol_3'])
+
+    async def test_csv_export_resumes_after_cursor_without_header(self):
+        _, content = await self.export('/api/dashboard/insurer/policies/export.csv')
+        self.assertEqual(content.splitlines()[:2], [
+            'id,quote_code,merchant_code,product_type,product_name,premium,broker_commission,created_at,updated_at',
+            'pol_1,q1,,,,1000.00,,,',
+        ])
+
+        _, content = await self.export('/api/dashboard/insurer/policies/export.csv?cursor=pol_1')
+        self.assertEqual([row.split(',')[0] for row in content.splitlines()], ['pol_2', 'pol_3'])
+
+    async def test_unknown_format_is_rejected(self):
+        status_code, _ = await self.export('/api/dashboard/insurer/policies/export.xlsx')
+
+        self.assertEqual(status_code, 400)
+
+    def mirror_policies(self):
+        MirrorSyncState.objects.create(scope='insurer', resource='policies', tenant_id=INSURER_ID)
+        MirroredPolicy.objects.bulk_create(
+            MirroredPolicy(superpool_id=policy['id'], insurer_id=INSURER_ID, payload=policy) for policy in self.POLICIES
+        )
+
+    @mock.patch('superpool_proxy.export.EXPORT_PAGE_SIZE', 2)
+    def test_mirrored_policies_are_read_a_page_at_a_time(self):
+        self.mirror_policies()
+
+        async def export():
+            return [record async for record in mirrored_records('insurer', 'policies', INSURER_ID)]
+
+        with self.assertNumQueries(2):
+            records = async_to_sync(export)()
+        self.assertEqual([record['id'] for record in records], ['pol_1', 'pol_2', 'pol_3'])
+
+    @override_settings(SUPERPOOL_MIRROR_READS=True)
+    async def test_synced_tenants_are_exported_from_the_mirror(self):
+        await sync_to_async(self.mirror_policies)()
+
+        _, content = await self.export('/api/dashboard/insurer/policies/export.ndjson?cursor=pol_2')
+        self.assertEqual([json.loads(line)['id'] for line in content.splitlines()], ['pol_3'])
+
+
+class CursorPaginationTestCase(TestCase):
+    POLICIES = [{'id': f'pol_{i}'} for i in (3, 5, 1, 4, 2)]
+    ROUTE = '/api/dashboard/insurer/policies'
+
+    def setUp(self):
+        cache.clear()
+        insurer = create_insurer()
+        self.token = str(PrincipalRefreshToken.for_user(insurer.user).access_token)
+        self.stub = SuperpoolStub({('GET', f'/dashboard/insurers/{INSURER_ID}/policies'): (200, self.POLICIES)})
+        self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__)
+        client = AsyncSuperpoolClient(base_url=self.stub.url, cache=DashboardCache())
+        patcher = mock.patch.object(views, 'SUPERPOOL_HANDLER', client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def pages(self, route: str) -> list[list[str]]:
+        pages = []
+        while route:
+            response = await self.async_client.get(route, headers={'Authorization': f'Bearer {self.token}'})
+            self.assertEqual(response.status_code, 200, response.content)
+            pages.append([policy['id'] for policy in response.json()['results']])
+            route = response.json()['next']
+        return pages
+
+    async def test_pages_follow_id_order_from_the_cached_list(self):
+        pages = await self.pages(f'{self.ROUTE}?limit=2')
+
+        self.assertEqual(pages, [['pol_1', 'pol_2'], ['pol_3', 'pol_4'], ['pol_5']])
+        self.assertEqual(len(self.stub.requests), 1)
+
+    @mock.patch('superpool_proxy.pagination.SUPERPOOL_PAGINATED_RESOURCES', {'policies'})
+    async def test_cursor_and_limit_are_forwarded_to_superpool(self):
+        # The stub ignores them and sends the whole list, which is then paged locally
+        pages = await self.pages(f'{self.ROUTE}?limit=2&cursor=pol_2')
+
+        self.assertEqual(pages, [['pol_3', 'pol_4'], ['pol_5']])
+        self.assertIn('after=pol_2&limit=3', self.stub.requests[0][1])
+        self.assertIn('after=pol_4&limit=3', self.stub.requests[1][1])
+
+    @override_settings(SUPERPOOL_MIRROR_READS=True)
+    async def test_synced_tenants_are_paged_from_the_mirror(self):
+        await MirrorSyncState.objects.acreate(scope='insurer', resource='policies', tenant_id=INSURER_ID)
+        await MirroredPolicy.objects.abulk_create(
+            MirroredPolicy(superpool_id=policy['id'], insurer_id=INSURER_ID, payload=policy) for policy in self.POLICIES
+        )
+
+        pages = await self.pages(f'{self.ROUTE}?limit=3')
+
+        self.assertEqual(pages, [['pol_1', 'pol_2', 'pol_3'], ['pol_4', 'pol_5']])
+        self.assertEqual(self.stub.requests, [])
+
+    async def test_page_numbers_are_still_served_without_limit_or_cursor(self):
+        response = await self.async_client.get(self.ROUTE, headers={'Authorization': f'Bearer {self.token}'})
+
+        self.assertEqual(response.json()['count'], 5)
+
+
+class ConditionalGetTestCase(TestCase):
+    POLICIES = [
+        {'id': 'pol_1', 'updated_at': '2024-06-01T10:00:00Z'},
+        {'id': 'pol_2', 'updated_at': '2024-06-02T10:00:00Z'},
+    ]
+    POLICIES_PATH = f'/dashboard/insurers/{INSURER_ID}/policies'
+    ROUTE = '/api/dashboard/insurer/policies'
+
+    def setUp(self):
+        cache.clear()
+        self.client = jwt_client(create_insurer().user)
+        self.stub = SuperpoolStub({('GET', self.POLICIES_PATH): (200, self.POLICIES)}).__enter__()
+        self.addCleanup(self.stub.__exit__)
+        self.dashboard_cache = DashboardCache()
+        client = AsyncSuperpoolClient(base_url=self.stub.url, cache=self.dashboard_cache)
+        patcher = mock.patch.object(views, 'SUPERPOOL_HANDLER', client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get(self.ROUTE)
+        not_modified = self.client.get(self.ROUTE, headers={'If-None-Match': response['ETag']})
+        not_modified_since = self.client.get(self.ROUTE, headers={'If-Modified-Since': response['Last-Modified']})
+
+        self.assertEqual(response['Last-Modified'], 'Sun, 02 Jun 2024 10:00:00 GMT')
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertEqual(not_modified_since.status_code, 304)
+        self.assertEqual(len(self.stub.requests), 1)
+
+    def test_etag_differs_per_page_and_changes_with_the_list(self):
+        etag = self.client.get(self.ROUTE)['ETag']
+        page_etag = self.client.get(f'{self.ROUTE}?limit=1')['ETag']
+        self.stub.server.routes['GET', self.POLICIES_PATH] = (200, [*self.POLICIES, {'id': 'pol_3'}])
+        self.dashboard_cache.clear()
+        response = self.client.get(self.ROUTE, headers={'If-None-Match': etag})
+
+        self.assertNotEqual(page_etag, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 3)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(SUPERPOOL_MIRROR_READS=True)
+    def test_mirrored_list_changes_etag_when_a_record_is_synced(self):
+        MirrorSyncState.objects.create(scope='insurer', resource='policies', tenant_id=INSURER_ID)
+        MirroredPolicy.objects.bulk_create(
+            MirroredPolicy(superpool_id=policy['id'], insurer_id=INSURER_ID, payload=policy) for policy in self.POLICIES
+        )
+        etag = self.client.get(self.ROUTE)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self.client.get(self.ROUTE, headers={'If-None-Match': etag})
+        MirroredPolicy.objects.get(superpool_id='pol_1').save()
+        modified = self.client.get(self.ROUTE, headers={'If-None-Match': etag})
+
+        self.assertEqual(not_modified.status_code, 304)
+        # The 304 comes from the validators alone, the records are never read
+        self.assertFalse([query for query in queries if '"payload"' in query['sql']])
+        self.assertEqual(modified.status_code, 200)
+        self.assertEqual(self.stub.requests, [])
+
+    async def test_cached_list_is_revalidated_with_superpool(self):
+        clock = FakeClock()
+        with SuperpoolStub({('GET', self.POLICIES_PATH): (200, self.POLICIES)}, etag='"v1"') as stub:
+            client = AsyncSuperpoolClient(base_url=stub.url, cache=DashboardCache(stale_ttl=0, clock=clock))
+            first = await client.get_all_policies_for_one_insurer(INSURER_ID)
+            clock.now += 120
+            second = await client.get_all_policies_for_one_insurer(INSURER_ID)
+
+        self.assertEqual(first['etag'], '"v1"')
+        self.assertIs(second, first)
+        self.assertEqual(len(stub.requests), 2)
+
+
+class RawPassthroughTestCase(TestCase):
+    ROUTE = '/api/dashboard/products'
+
+    def setUp(self):
+        cache.clear()
+        self.client = jwt_client(create_insurer().user)
+        stub = SuperpoolStub({('GET', '/dashboard/products'): (200, PRODUCTS)}).__enter__()
+        self.addCleanup(stub.__exit__)
+        client = AsyncSuperpoolClient(base_url=stub.url, cache=DashboardCache(), passthrough=True)
+        patcher = mock.patch.object(views, 'SUPERPOOL_HANDLER', client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_superpool_bytes_are_sent_as_they_are(self):
+        response = self.client.get(self.ROUTE)
+        not_modified = self.client.get(self.ROUTE, headers={'If-None-Match': response['ETag']})
+
+        # The stub writes JSON with spaces after separators, which the renderer would not
+        self.assertEqual(response.content, json.dumps(PRODUCTS).encode())
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_superpool_bytes_are_compressed_when_cached(self):
+        products = [{'id': i, 'name': 'Travel Basic', 'premium': '2000.00'} for i in range(200)]
+        dashboard_cache = DashboardCache()
+        with SuperpoolStub({('GET', '/dashboard/products'): (200, products)}) as stub:
+            client = AsyncSuperpoolClient(base_url=stub.url, cache=dashboard_cache, passthrough=True)
+            with mock.patch.object(views, 'SUPERPOOL_HANDLER', client), \
+                    mock.patch('reconciliation_backend.compression.compress', wraps=compress) as compressed:
+                first = self.client.get(self.ROUTE, headers={'Accept-Encoding': 'br'})
+                second = self.client.get(self.ROUTE, headers={'Accept-Encoding': 'gzip'})
+
+        cached = dashboard_cache.get_fresh(DashboardCache.make_key('all', 'products', 'dashboard/products'))
+        # Both encodings at once when the list was cached, none when it was sent
+        self.assertEqual(compressed.call_count, 2)
+        self.assertEqual(first['Content-Encoding'], 'br')
+        self.assertEqual(first.content, cached['compressed']['br'])
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(second.content), json.dumps(products).encode())
+        self.assertTrue(second['ETag'].startswith('W/'))
+
+    def test_browsable_api_is_still_rendered(self):
+        response = self.client.get(self.ROUTE, headers={'Accept': 'text/html'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Travel Basic')
@@ -2,9 +2,14 @@ from django.urls import path
 
 from .views import (
     get_all_products,
+    get_insurer_summary,
+    export_claims_one_insurer,
     get_all_claims_one_insurer,
+    export_policies_one_insurer,
     get_all_policies_one_insurer,
+    export_claims_for_one_merchant,
     get_all_claims_for_one_merchant,
+    export_policies_for_one_merchant,
     get_all_products_for_one_insurer,
     get_all_policies_for_one_merchant,
     get_all_products_for_one_merchant,
@@ -18,4 +23,19 @@ urlpatterns = [
     path('insurer/policies', get_all_policies_one_insurer, name='get-all-policies-one-insurer'),
     path('insurer/claims', get_all_claims_one_insurer, name='get-all-claims-one-insurer'),
     path('insurer/products', get_all_products_for_one_insurer, name='get-all-claims-one-insurer'),
+    path('insurer/summary', get_insurer_summary, name='get-insurer-summary'),
+    path(
+        'merchants/policies/export.<str:export_format>',
+        export_policies_for_one_merchant,
+        name='export-policies-one-merchant',
+    ),
+    path(
+        'merchants/claims/export.<str:export_format>',
+        export_claims_for_one_merchant,
+        name='export-claims-one-merchant',
+    ),
+    path(
+        'insurer/policies/export.<str:export_format>', export_policies_one_insurer, name='export-policies-one-insurer'
+    ),
+    path('insurer/claims/export.<str:export_format>', export_claims_one_insurer, name='export-claims-one-insurer'),
 ]
@@ -1,105 +1,140 @@
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-
-from django.shortcuts import get_object_or_404
+from adrf.decorators import api_view
+from reconciliation_backend.replicas import reads_from_replica
 
 from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import permission_classes
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 
-from insurer.models import Insurer
-
-from user.models import CustomUser
+from user.principal import aget_principal
 
-from merchants.models import Merchant
+from .export import EXPORT_FORMATS, export_records, export_response
+from .mirror import fetch_dashboard
+from .pagination import cursor_page, wants_cursor_page
+from .aggregation import insurer_summary
+from .conditional import dashboard_validators
+from .passthrough import data_response
+from .async_superpool_client import AsyncSuperpoolClient
 
-from .superpool_client import SuperpoolClient
-
-SUPERPOOL_HANDLER = SuperpoolClient()
+SUPERPOOL_HANDLER = AsyncSuperpoolClient()
 SUPERPOOL_PROXY_TAG = 'Dashboard'
 PAGINATION_PAGE_SIZE = 10
+CURSOR_PAGINATION_PARAMETERS = [
+    openapi.Parameter(
+        'cursor', openapi.IN_QUERY, description='Id of the last record of the previous page, from `next`',
+        type=openapi.TYPE_STRING
+    ),
+    openapi.Parameter(
+        'limit', openapi.IN_QUERY, description='Records per page; pages by cursor when given',
+        type=openapi.TYPE_INTEGER
+    ),
+]
+EXPORT_CURSOR_PARAMETER = openapi.Parameter(
+    'cursor', openapi.IN_QUERY, description='Id of the last row already received, to resume an export',
+    type=openapi.TYPE_STRING
+)
 
 
 @swagger_auto_schema(
     method='GET',
     operation_description='Get all products from Superpool',
+    manual_parameters=CURSOR_PAGINATION_PARAMETERS,
     responses={200: openapi.Response('OK'), 400: 'Bad Request'},
     tags=[SUPERPOOL_PROXY_TAG],
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def get_all_products(request: Request) -> Response:
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    if user.is_agent:
+async def get_all_products(request: Request) -> Response:
+    principal = await aget_principal(request)
+    if principal.is_agent:
         return Response({
             'error': 'Agents cannot view all products'
         }, status.HTTP_400_BAD_REQUEST)
-    response = SUPERPOOL_HANDLER.get_all_products()
+    if wants_cursor_page(request):
+        return await cursor_page(SUPERPOOL_HANDLER, request, 'all', 'products')
+    response = await SUPERPOOL_HANDLER.get_all_products()
     status_code = response.get('status_code')
     error = response.get('error')
-    data = response.get('data')
 
     if status_code != 200:
         return Response(error, status.HTTP_400_BAD_REQUEST)
 
+    validators = dashboard_validators(request, response)
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+
     # paginator = PageNumberPagination()
     # paginator.page_size = PAGINATION_PAGE_SIZE
     # paginated_data = paginator.paginate_queryset(data, request)
 
-    return Response(data, status.HTTP_200_OK)
+    return validators.apply(data_response(request, response))
     # return paginator.get_paginated_response(paginated_data)
 
 
 @swagger_auto_schema(
     method='GET',
     operation_description='Get all products for one merchant Superpool',
+    manual_parameters=CURSOR_PAGINATION_PARAMETERS,
     responses={200: openapi.Response('OK'), 400: 'Bad Request'},
     tags=[SUPERPOOL_PROXY_TAG],
 )
+@reads_from_replica
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def get_all_products_for_one_merchant(request: Request) -> Response:
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    if user.is_agent or user.is_insurer:
+async def get_all_products_for_one_merchant(request: Request) -> Response:
+    principal = await aget_principal(request)
+    if principal.is_agent or principal.is_insurer:
         return Response({
             'error': 'Unathorized entity access'
         }, status.HTTP_403_FORBIDDEN)
-    merchant = get_object_or_404(Merchant, user=user)
-    response = SUPERPOOL_HANDLER.get_all_products_for_one_merchant(merchant.tenant_id)
+    merchant = principal.get_merchant()
+    if wants_cursor_page(request):
+        return await cursor_page(SUPERPOOL_HANDLER, request, 'merchant', 'products', merchant.tenant_id)
+    response = await fetch_dashboard(SUPERPOOL_HANDLER, 'merchant', 'products', merchant.tenant_id, request)
     status_code = response.get('status_code')
     error = response.get('error')
-    data = response.get('data')
 
     if status_code != 200:
         return Response(error, status.HTTP_400_BAD_REQUEST)
 
+    validators = dashboard_validators(request, response)
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+
     # paginator = PageNumberPagination()
     # paginator.page_size = PAGINATION_PAGE_SIZE
     # paginated_data = paginator.paginate_queryset(data, request)
 
-    return Response(data, status.HTTP_200_OK)
+    return validators.apply(data_response(request, response))
     # return paginator.get_paginated_response(paginated_data)
 
 
 @swagger_auto_schema(
     method='GET',
     operation_description='Get all policies for one merchant from Superpool',
+    manual_parameters=CURSOR_PAGINATION_PARAMETERS,
     responses={200: openapi.Response('OK'), 400: 'Bad Request'},
     tags=[SUPERPOOL_PROXY_TAG],
 )
+@reads_from_replica
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def get_all_policies_for_one_merchant(request: Request) -> Response:
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    if user.is_agent or user.is_insurer:
+async def get_all_policies_for_one_merchant(request: Request) -> Response:
+    principal = await aget_principal(request)
+    if principal.is_agent or principal.is_insurer:
         return Response({
             'error': 'Unathorized entity access'
         }, status.HTTP_403_FORBIDDEN)
-    merchant = get_object_or_404(Merchant, user=user)
-    response = SUPERPOOL_HANDLER.get_all_policies_for_one_merchant(merchant.tenant_id)
+    merchant = principal.get_merchant()
+    if wants_cursor_page(request):
+        return await cursor_page(SUPERPOOL_HANDLER, request, 'merchant', 'policies', merchant.tenant_id)
+    response = await fetch_dashboard(SUPERPOOL_HANDLER, 'merchant', 'policies', merchant.tenant_id, request)
     status_code = response.get('status_code')
     error = response.get('error')
     data = response.get('data')
@@ -107,29 +142,38 @@ def get_all_policies_for_one_merchant(request: Request) -> Response:
     if status_code != 200:
         return Response(error, status.HTTP_400_BAD_REQUEST)
 
+    validators = dashboard_validators(request, response)
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+
     paginator = PageNumberPagination()
     paginator.page_size = PAGINATION_PAGE_SIZE
     paginated_data = paginator.paginate_queryset(data, request)
 
-    return paginator.get_paginated_response(paginated_data)
+    return validators.apply(paginator.get_paginated_response(paginated_data))
 
 
 @swagger_auto_schema(
     method='GET',
     operation_description='Get all claims for one merchant from Superpool',
+    manual_parameters=CURSOR_PAGINATION_PARAMETERS,
     responses={200: openapi.Response('OK'), 400: 'Bad Request'},
     tags=[SUPERPOOL_PROXY_TAG],
 )
+@reads_from_replica
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def get_all_claims_for_one_merchant(request: Request) -> Response:
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    if user.is_agent or user.is_insurer:
+async def get_all_claims_for_one_merchant(request: Request) -> Response:
+    principal = await aget_principal(request)
+    if principal.is_agent or principal.is_insurer:
         return Response({
             'error': 'Unathorized entity access'
         }, status.HTTP_403_FORBIDDEN)
-    merchant = get_object_or_404(Merchant, user=user)
-    response = SUPERPOOL_HANDLER.get_all_claims_for_one_merchant(merchant.tenant_id)
+    merchant = principal.get_merchant()
+    if wants_cursor_page(request):
+        return await cursor_page(SUPERPOOL_HANDLER, request, 'merchant', 'claims', merchant.tenant_id)
+    response = await fetch_dashboard(SUPERPOOL_HANDLER, 'merchant', 'claims', merchant.tenant_id, request)
     status_code = response.get('status_code')
     error = response.get('error')
     data = response.get('data')
@@ -137,30 +181,39 @@ def get_all_claims_for_one_merchant(request: Request) -> Response:
     if status_code != 200:
         return Response(error, status.HTTP_400_BAD_REQUEST)
 
+    validators = dashboard_validators(request, response)
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+
     paginator = PageNumberPagination()
     paginator.page_size = PAGINATION_PAGE_SIZE
     paginated_data = paginator.paginate_queryset(data, request)
 
-    return paginator.get_paginated_response(paginated_data)
+    return validators.apply(paginator.get_paginated_response(paginated_data))
 
 
 @swagger_auto_schema(
     method='GET',
     operation_description='Get all policies for one insurer from Superpool',
+    manual_parameters=CURSOR_PAGINATION_PARAMETERS,
     responses={200: openapi.Response('OK'), 400: 'Bad Request'},
     tags=[SUPERPOOL_PROXY_TAG],
 )
+@reads_from_replica
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def get_all_policies_one_insurer(request: Request) -> Response:
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    if user.is_agent or user.is_merchant:
+async def get_all_policies_one_insurer(request: Request) -> Response:
+    principal = await aget_principal(request)
+    if principal.is_agent or principal.is_merchant:
         return Response({
             'error': 'Unathorized entity access'
         }, status.HTTP_403_FORBIDDEN)
-    insurer = get_object_or_404(Insurer, user=user)
+    insurer = principal.get_insurer()
     insurer_id = insurer.insurer_id
-    response = SUPERPOOL_HANDLER.get_all_policies_for_one_insurer(insurer_id)
+    if wants_cursor_page(request):
+        return await cursor_page(SUPERPOOL_HANDLER, request, 'insurer', 'policies', insurer_id)
+    response = await fetch_dashboard(SUPERPOOL_HANDLER, 'insurer', 'policies', insurer_id, request)
     status_code = response.get('status_code')
     error = response.get('error')
     data = response.get('data')
@@ -168,30 +221,39 @@ def get_all_policies_one_insurer(request: Request) -> Response:
     if status_code != 200:
         return Response(error, status.HTTP_400_BAD_REQUEST)
 
+    validators = dashboard_validators(request, response)
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+
     paginator = PageNumberPagination()
     paginator.page_size = PAGINATION_PAGE_SIZE
     paginated_data = paginator.paginate_queryset(data, request)
 
-    return paginator.get_paginated_response(paginated_data)
+    return validators.apply(paginator.get_paginated_response(paginated_data))
 
 
 @swagger_auto_schema(
     method='GET',
     operation_description='Get all claims for one insurer from Superpool',
+    manual_parameters=CURSOR_PAGINATION_PARAMETERS,
     responses={200: openapi.Response('OK'), 400: 'Bad Request'},
     tags=[SUPERPOOL_PROXY_TAG],
 )
+@reads_from_replica
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def get_all_claims_one_insurer(request: Request) -> Response:
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    if user.is_agent or user.is_merchant:
+async def get_all_claims_one_insurer(request: Request) -> Response:
+    principal = await aget_principal(request)
+    if principal.is_agent or principal.is_merchant:
         return Response({
             'error': 'Unathorized entity access'
         }, status.HTTP_403_FORBIDDEN)
-    insurer = get_object_or_404(Insurer, user=user)
+    insurer = principal.get_insurer()
     insurer_id = insurer.insurer_id
-    response = SUPERPOOL_HANDLER.get_all_claims_for_one_insurer(insurer_id)
+    if wants_cursor_page(request):
+        return await cursor_page(SUPERPOOL_HANDLER, request, 'insurer', 'claims', insurer_id)
+    response = await fetch_dashboard(SUPERPOOL_HANDLER, 'insurer', 'claims', insurer_id, request)
     status_code = response.get('status_code')
     error = response.get('error')
     data = response.get('data')
@@ -199,40 +261,213 @@ def get_all_claims_one_insurer(request: Request) -> Response:
     if status_code != 200:
         return Response(error, status.HTTP_400_BAD_REQUEST)
 
+    validators = dashboard_validators(request, response)
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+
     paginator = PageNumberPagination()
     paginator.page_size = PAGINATION_PAGE_SIZE
     paginated_data = paginator.paginate_queryset(data, request)
 
-    return paginator.get_paginated_response(paginated_data)
+    return validators.apply(paginator.get_paginated_response(paginated_data))
 
 
 @swagger_auto_schema(
     method='GET',
     operation_description='Get all product_types sold by agents for one insurer from Superpool',
+    manual_parameters=CURSOR_PAGINATION_PARAMETERS,
     responses={200: openapi.Response('OK'), 400: 'Bad Request'},
     tags=[SUPERPOOL_PROXY_TAG],
 )
+@reads_from_replica
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def get_all_products_for_one_insurer(request: Request) -> Response:
-    user = get_object_or_404(CustomUser, pk=request.user.id)
-    if user.is_agent or user.is_merchant:
+async def get_all_products_for_one_insurer(request: Request) -> Response:
+    principal = await aget_principal(request)
+    if principal.is_agent or principal.is_merchant:
         return Response({
             'error': 'Unathorized entity access'
         }, status.HTTP_403_FORBIDDEN)
-    insurer = get_object_or_404(Insurer, user=user)
+    insurer = principal.get_insurer()
     insurer_id = insurer.insurer_id
-    response = SUPERPOOL_HANDLER.get_all_products_for_one_insurer(insurer_id)
+    if wants_cursor_page(request):
+        return await cursor_page(SUPERPOOL_HANDLER, request, 'insurer', 'products', insurer_id)
+    response = await fetch_dashboard(SUPERPOOL_HANDLER, 'insurer', 'products', insurer_id, request)
     status_code = response.get('status_code')
     error = response.get('error')
-    data = response.get('data')
 
     if status_code != 200:
         return Response(error, status.HTTP_400_BAD_REQUEST)
 
+    validators = dashboard_validators(request, response)
+    not_modified = validators.not_modified(request)
+    if not_modified is not None:
+        return not_modified
+
     # paginator = PageNumberPagination()
     # paginator.page_size = PAGINATION_PAGE_SIZE
     # paginated_data = paginator.paginate_queryset(data, request)
 
-    return Response(data, status.HTTP_200_OK)
+    return validators.apply(data_response(request, response))
     # return paginator.get_paginated_response(paginated_data)
+
+
+@swagger_auto_schema(
+    method='GET',
+    operation_description='Premium, broker commission, claims paid and loss ratio for one insurer, '
+    'in total and per product, product type, agent and month',
+    responses={200: openapi.Response('OK'), 400: 'Bad Request'},
+    tags=[SUPERPOOL_PROXY_TAG],
+)
+@reads_from_replica
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def get_insurer_summary(request: Request) -> Response:
+    principal = await aget_principal(request)
+    if principal.is_agent or principal.is_merchant:
+        return Response({
+            'error': 'Unathorized entity access'
+        }, status.HTTP_403_FORBIDDEN)
+    insurer = principal.get_insurer()
+    response = await insurer_summary(SUPERPOOL_HANDLER, insurer.insurer_id)
+    status_code = response.get('status_code')
+    error = response.get('error')
+    data = response.get('data')
+
+    if status_code != 200:
+        return Response(error, status.HTTP_400_BAD_REQUEST)
+
+    return Response(data, status.HTTP_200_OK)
+
+
+@swagger_auto_schema(
+    method='GET',
+    operation_description='Download all policies for one merchant as NDJSON or CSV',
+    manual_parameters=[EXPORT_CURSOR_PARAMETER],
+    responses={200: openapi.Response('OK'), 400: 'Bad Request'},
+    tags=[SUPERPOOL_PROXY_TAG],
+)
+@reads_from_replica
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def export_policies_for_one_merchant(request: Request, export_format: str):
+    principal = await aget_principal(request)
+    if principal.is_agent or principal.is_insurer:
+        return Response({
+            'error': 'Unathorized entity access'
+        }, status.HTTP_403_FORBIDDEN)
+    if export_format not in EXPORT_FORMATS:
+        return Response({
+            'error': 'Export format must be ndjson or csv'
+        }, status.HTTP_400_BAD_REQUEST)
+    merchant = principal.get_merchant()
+    cursor = request.query_params.get('cursor')
+    response = await export_records(SUPERPOOL_HANDLER, 'merchant', 'policies', merchant.tenant_id, cursor)
+    status_code = response.get('status_code')
+    error = response.get('error')
+    data = response.get('data')
+
+    if status_code != 200:
+        return Response(error, status.HTTP_400_BAD_REQUEST)
+
+    return export_response(data, 'policies', export_format, cursor)
+
+
+@swagger_auto_schema(
+    method='GET',
+    operation_description='Download all claims for one merchant as NDJSON or CSV',
+    manual_parameters=[EXPORT_CURSOR_PARAMETER],
+    responses={200: openapi.Response('OK'), 400: 'Bad Request'},
+    tags=[SUPERPOOL_PROXY_TAG],
+)
+@reads_from_replica
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def export_claims_for_one_merchant(request: Request, export_format: str):
+    principal = await aget_principal(request)
+    if principal.is_agent or principal.is_insurer:
+        return Response({
+            'error': 'Unathorized entity access'
+        }, status.HTTP_403_FORBIDDEN)
+    if export_format not in EXPORT_FORMATS:
+        return Response({
+            'error': 'Export format must be ndjson or csv'
+        }, status.HTTP_400_BAD_REQUEST)
+    merchant = principal.get_merchant()
+    cursor = request.query_params.get('cursor')
+    response = await export_records(SUPERPOOL_HANDLER, 'merchant', 'claims', merchant.tenant_id, cursor)
+    status_code = response.get('status_code')
+    error = response.get('error')
+    data = response.get('data')
+
+    if status_code != 200:
+        return Response(error, status.HTTP_400_BAD_REQUEST)
+
+    return export_response(data, 'claims', export_format, cursor)
+
+
+@swagger_auto_schema(
+    method='GET',
+    operation_description='Download all policies for one insurer as NDJSON or CSV',
+    manual_parameters=[EXPORT_CURSOR_PARAMETER],
+    responses={200: openapi.Response('OK'), 400: 'Bad Request'},
+    tags=[SUPERPOOL_PROXY_TAG],
+)
+@reads_from_replica
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def export_policies_one_insurer(request: Request, export_format: str):
+    principal = await aget_principal(request)
+    if principal.is_agent or principal.is_merchant:
+        return Response({
+            'error': 'Unathorized entity access'
+        }, status.HTTP_403_FORBIDDEN)
+    if export_format not in EXPORT_FORMATS:
+        return Response({
+            'error': 'Export format must be ndjson or csv'
+        }, status.HTTP_400_BAD_REQUEST)
+    insurer = principal.get_insurer()
+    cursor = request.query_params.get('cursor')
+    response = await export_records(SUPERPOOL_HANDLER, 'insurer', 'policies', insurer.insurer_id, cursor)
+    status_code = response.get('status_code')
+    error = response.get('error')
+    data = response.get('data')
+
+    if status_code != 200:
+        return Response(error, status.HTTP_400_BAD_REQUEST)
+
+    return export_response(data, 'policies', export_format, cursor)
+
+
+@swagger_auto_schema(
+    method='GET',
+    operation_description='Download all claims for one insurer as NDJSON or CSV',
+    manual_parameters=[EXPORT_CURSOR_PARAMETER],
+    responses={200: openapi.Response('OK'), 400: 'Bad Request'},
+    tags=[SUPERPOOL_PROXY_TAG],
+)
+@reads_from_replica
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+async def export_claims_one_insurer(request: Request, export_format: str):
+    principal = await aget_principal(request)
+    if principal.is_agent or principal.is_merchant:
+        return Response({
+            'error': 'Unathorized entity access'
+        }, status.HTTP_403_FORBIDDEN)
+    if export_format not in EXPORT_FORMATS:
+        return Response({
+            'error': 'Export format must be ndjson or csv'
+        }, status.HTTP_400_BAD_REQUEST)
+    insurer = principal.get_insurer()
+    cursor = request.query_params.get('cursor')
+    response = await export_records(SUPERPOOL_HANDLER, 'insurer', 'claims', insurer.insurer_id, cursor)
+    status_code = response.get('status_code')
+    error = response.get('error')
+    data = response.get('data')
+
+    if status_code != 200:
+        return Response(error, status.HTTP_400_BAD_REQUEST)
+
+    return export_response(data, 'claims', export_format, cursor)
@@ -1,8 +1,5 @@
-from rest_framework_simplejwt.tokens import RefreshToken
-
 from django.conf import settings
 from django.utils import timezone
-from django.core.mail import send_mail
 from django.shortcuts import get_object_or_404
 from django.utils.html import strip_tags
 from django.utils.http import urlsafe_base64_encode
@@ -13,31 +10,32 @@ from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from rest_framework import status
 from rest_framework.response import Response
 
-from agents.utils import verify_otp, generate_otp, gen_absolute_url
+from agents.utils import gen_absolute_url
 from agents.models import Agent, AgentProfile
 
+from user.otp import VALID, OTP_ERRORS, OTP_SERVICE
 from user.models import CustomUser
+from user.tokens import PrincipalRefreshToken
+from user.principal import Principal
 from user.serializer import ViewAgentProfileSerializer
 
+from notifications.outbox import queue_mail
+
 
 def agent_sign_in(user: CustomUser, agent_email: str) -> Response:
     try:
         agent = get_object_or_404(Agent, user=user)
-        otp = generate_otp()
-        agent.otp = otp
-        agent.otp_created_at = timezone.now().time()
+        otp = OTP_SERVICE.issue(user.pk)
 
         name = f'{agent.first_name} {agent.last_name}'
         current_year = timezone.now().year
 
-        agent.save()
-
         context = {'name': name, 'current_year': current_year, 'otp': otp}
 
         html_message = render_to_string('agents/otp.html', context)
         plain_message = strip_tags(html_message)
 
-        send_mail(
+        queue_mail(
             subject='Login OTP',
             message=plain_message,
             from_email=settings.EMAIL_HOST_USER,
@@ -56,20 +54,13 @@ def agent_sign_in(user: CustomUser, agent_email: str) -> Response:
 def agent_verify_otp_token(user: CustomUser, otp: str) -> Response:
     try:
         agent = Agent.objects.get(user=user)
-        agent_otp = agent.otp
+        verified = OTP_SERVICE.verify(user.pk, otp)
 
-        if agent_otp != otp:
-            message = {'error': 'Incorrect OTP'}
+        if verified != VALID:
+            message = {'error': OTP_ERRORS[verified]}
             return Response(message, status=status.HTTP_400_BAD_REQUEST)
 
-        otp_created_time = agent.otp_created_at
-        verify = verify_otp(otp_created_time)
-
-        if not verify:
-            message = {'error': 'OTP has expired'}
-            return Response(message, status=status.HTTP_400_BAD_REQUEST)
-
-        auth_token = RefreshToken.for_user(user)
+        auth_token = PrincipalRefreshToken.for_user(user)
 
         message = {
             'login_status': True,
@@ -104,7 +95,7 @@ def agent_forget_email_password(user: CustomUser, agent_email: str) -> Response:
         html_message = render_to_string('agents/forgot-password.html', context=context)
         plain_message = strip_tags(html_message)
 
-        send_mail(
+        queue_mail(
             subject='Forgot Password',
             message=plain_message,
             from_email=settings.EMAIL_HOST_USER,
@@ -126,19 +117,15 @@ def agent_reset_password(user: CustomUser, insurer_email: str) -> Response:
 
         agent = get_object_or_404(Agent, user=user)
 
-        otp = generate_otp()
-        agent.otp = otp
-        agent.otp_created_at = timezone.now().time()
+        otp = OTP_SERVICE.issue(user.pk)
         name = f'{agent.first_name} {agent.last_name}'
         current_year = timezone.now().year
 
-        agent.save()
-
         context = {'name': name, 'current_year': current_year, 'otp': otp}
 
         html_message = render_to_string('otp.html', context)
 
-        send_mail(
+        queue_mail(
             subject='Request New OTP',
             message=f'{otp}',
             from_email=settings.EMAIL_HOST_USER,
@@ -152,12 +139,12 @@ def agent_reset_password(user: CustomUser, insurer_email: str) -> Response:
         return Response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
 
 
-def agent_view_details(user: CustomUser) -> Response:
-    agent = get_object_or_404(Agent, user=user)
+def agent_view_details(principal: Principal) -> Response:
+    agent = principal.get_agent()
 
     data = {
         'id': agent.id,
-        'email': user.email,
+        'email': principal.user.email,
         'first_name': agent.first_name,
         'last_name': agent.last_name,
         'middle_name': agent.middle_name,
@@ -166,13 +153,13 @@ def agent_view_details(user: CustomUser) -> Response:
     return Response(data, status.HTTP_200_OK)
 
 
-def agent_view_profile(user: CustomUser) -> Response:
-    agent = get_object_or_404(Agent, user=user)
+def agent_view_profile(principal: Principal) -> Response:
+    agent = principal.get_agent()
     agent_profile = get_object_or_404(AgentProfile, agent=agent)
 
     data = {
         'id': agent.id,
-        'email': user.email,
+        'email': principal.user.email,
         'first_name': agent.first_name,
         'last_name': agent.last_name,
         'middle_name': agent.middle_name,
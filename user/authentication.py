@@ -0,0 +1,80 @@
+import time
+
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from django.utils.translation import gettext_lazy as _
+
+from .models import CustomUser
+from .principal import (
+    LOCAL_PRINCIPALS,
+    Principal,
+    cache_principal,
+    cached_principal,
+    resolve_principal,
+    resolve_principal_from_claims,
+)
+
+
+class PrincipalJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that also resolves the caller's agent, insurer or merchant and attaches it to the
+    request as ``request.principal``.
+
+    Principals are cached per token in an in-process LRU and, as a snapshot of their ids and flags, in the
+    shared cache until the token expires, so a warm token authenticates without touching the database. A cold
+    token is resolved from its role and profile id claims (see ``PrincipalRefreshToken``) with one query.
+    Saving or bulk updating the user, for instance to deactivate it or reset its password, invalidates its
+    cached principals.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        cached = LOCAL_PRINCIPALS.get(raw_token)
+        if cached is not None:
+            validated_token, principal = cached
+        else:
+            generation = LOCAL_PRINCIPALS.generation
+            validated_token = self.get_validated_token(raw_token)
+            principal = self.get_principal(validated_token)
+            timeout = validated_token['exp'] - time.time()
+            LOCAL_PRINCIPALS.set(raw_token, validated_token, principal, timeout, generation)
+
+        request.principal = principal
+        return principal.user, validated_token
+
+    def get_principal(self, validated_token) -> Principal:
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if user_id is None or jti is None:
+            return resolve_principal(self.get_user(validated_token))
+
+        # The version is read before resolving, so a change made while resolving is not cached as current.
+        principal, version = cached_principal(user_id, jti)
+        if principal is None:
+            principal = resolve_principal_from_claims(user_id, validated_token)
+            if principal is None:
+                principal = resolve_principal(self.get_user(validated_token))
+            self.check_user(validated_token, principal.user)
+            cache_principal(principal, jti, version, validated_token['exp'] - time.time())
+        return principal
+
+    def check_user(self, validated_token, user: CustomUser) -> None:
+        """
+        The checks ``get_user`` makes, for users loaded through the token's claims.
+        """
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        password_hash = validated_token.get(api_settings.REVOKE_TOKEN_CLAIM)
+        if api_settings.CHECK_REVOKE_TOKEN and password_hash != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
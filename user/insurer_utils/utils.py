@@ -1,8 +1,5 @@
-from rest_framework_simplejwt.tokens import RefreshToken
-
 from django.conf import settings
 from django.utils import timezone
-from django.core.mail import send_mail
 from django.shortcuts import get_object_or_404
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import smart_bytes
@@ -12,22 +9,23 @@ from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from rest_framework import status
 from rest_framework.response import Response
 
-from insurer.utils import verify_otp, generate_otp, gen_absolute_url
+from insurer.utils import gen_absolute_url
 from insurer.models import Insurer, InsurerProfile
 
+from user.otp import VALID, OTP_ERRORS, OTP_SERVICE
 from user.models import CustomUser
+from user.tokens import PrincipalRefreshToken
+from user.principal import Principal
 from user.serializer import ViewInsurerProfileSerializer
 
+from notifications.outbox import queue_mail
+
 
 def insurer_sign_in_insurer(user: CustomUser, insurer_email: str) -> Response:
     try:
         insurer: Insurer = Insurer.objects.get(user=user)
 
-        otp = generate_otp()
-        insurer.otp = otp
-        insurer.otp_created_at = timezone.now().time()
-
-        insurer.save()
+        otp = OTP_SERVICE.issue(user.pk)
 
         current_year = timezone.now().year
         company_name = insurer.business_name
@@ -35,7 +33,7 @@ def insurer_sign_in_insurer(user: CustomUser, insurer_email: str) -> Response:
 
         html_message = render_to_string('otp.html', context)
 
-        send_mail(
+        queue_mail(
             subject='Login OTP',
             message=f'{otp}',
             from_email=settings.EMAIL_HOST_USER,
@@ -52,20 +50,13 @@ def insurer_sign_in_insurer(user: CustomUser, insurer_email: str) -> Response:
 def insurer_verify_otp_token(user: CustomUser, otp: str) -> Response:
     try:
         insurer = Insurer.objects.get(user=user)
-        insurer_otp = insurer.otp
+        verified = OTP_SERVICE.verify(user.pk, otp)
 
-        if insurer_otp != otp:
-            message = {'error': 'Incorrect OTP'}
+        if verified != VALID:
+            message = {'error': OTP_ERRORS[verified]}
             return Response(message, status=status.HTTP_400_BAD_REQUEST)
 
-        otp_created_time = insurer.otp_created_at
-        verify = verify_otp(otp_created_time)
-
-        if not verify:
-            message = {'error': 'OTP has expired'}
-            return Response(message, status=status.HTTP_400_BAD_REQUEST)
-
-        auth_token = RefreshToken.for_user(user)
+        auth_token = PrincipalRefreshToken.for_user(user)
 
         message = {
             'login_status': True,
@@ -97,7 +88,7 @@ def insurer_forget_email_password(user: CustomUser, insurer_email: str) -> Respo
 
     html_message = render_to_string('forgot-password.html', context=context)
 
-    send_mail(
+    queue_mail(
         subject='Forgot Password',
         message=f'{abs_url}',
         from_email=settings.EMAIL_HOST_USER,
@@ -116,11 +107,7 @@ def insurer_reset_password(user: CustomUser, insurer_email: str) -> Response:
 
         insurer = get_object_or_404(Insurer, user=user)
 
-        otp = generate_otp()
-        insurer.otp = otp
-        insurer.otp_created_at = timezone.now().time()
-
-        insurer.save()
+        otp = OTP_SERVICE.issue(user.pk)
 
         current_year = timezone.now().year
         company_name = insurer.business_name
@@ -128,7 +115,7 @@ def insurer_reset_password(user: CustomUser, insurer_email: str) -> Response:
 
         html_message = render_to_string('otp.html', context)
 
-        send_mail(
+        queue_mail(
             subject='Request New OTP',
             message=f'{otp}',
             from_email=settings.EMAIL_HOST_USER,
@@ -142,20 +129,20 @@ def insurer_reset_password(user: CustomUser, insurer_email: str) -> Response:
         return Response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
 
 
-def insurer_view_details(user: CustomUser) -> Response:
-    insurer = get_object_or_404(Insurer, user=user)
+def insurer_view_details(principal: Principal) -> Response:
+    insurer = principal.get_insurer()
 
-    data = {'id': insurer.id, 'email': user.email, 'business_name': insurer.business_name}
+    data = {'id': insurer.id, 'email': principal.user.email, 'business_name': insurer.business_name}
 
     return Response(data, status.HTTP_200_OK)
 
 
-def insurer_view_profile(user: CustomUser) -> Response:
-    insurer = get_object_or_404(Insurer, user=user)
+def insurer_view_profile(principal: Principal) -> Response:
+    insurer = principal.get_insurer()
     insurer_profile = get_object_or_404(InsurerProfile, insurer=insurer)
 
     data = {
-        'email': user.email,
+        'email': principal.user.email,
         'business_name': insurer.business_name,
         'profile_image': insurer_profile.profile_image.url,
     }
@@ -0,0 +1,49 @@
+import os
+from pathlib import Path
+
+from reconciliation_backend.boot import profile_boot
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+BAR_WIDTH = 40
+
+
+class Command(BaseCommand):
+    help = (
+        'Boot the project in a new interpreter and report how long the settings, the app registry and the '
+        'URLconf take to load and which packages are slowest to import. Writes every import as folded stacks for '
+        'flamegraph.pl or speedscope, and fails if the boot takes longer than --budget milliseconds.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help='Slowest packages to list')
+        parser.add_argument('--output', default='boot_profile.folded', help='Where to write the folded stacks')
+        parser.add_argument(
+            '--budget', type=float, default=settings.BOOT_TIME_BUDGET_MS, help='Boot time budget in milliseconds'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            profile = profile_boot(os.environ['DJANGO_SETTINGS_MODULE'])
+        except RuntimeError as e:
+            raise CommandError(str(e)) from e
+
+        self.stdout.write(f'{profile.settings_module}: {profile.total_ms:.0f}ms (budget {options["budget"]:.0f}ms)')
+        for phase, seconds in profile.phases.items():
+            self.stdout.write(f'  {phase:<10}{seconds * 1000:8.0f}ms')
+
+        slowest = profile.slowest_packages(options['top'])
+        if slowest:
+            self.stdout.write('\nslowest packages to import:')
+            longest = slowest[0][1]
+            for package, us in slowest:
+                bar = '#' * max(round(us / longest * BAR_WIDTH), 1)
+                self.stdout.write(f'{us / 1000:8.1f}ms {bar:<{BAR_WIDTH}} {package}')
+
+        Path(options['output']).write_text(profile.folded())
+        self.stdout.write(f'\n{len(profile.imports)} imports written to {options["output"]}')
+
+        if profile.total_ms > options['budget']:
+            msg = f'Boot took {profile.total_ms:.0f}ms, over the {options["budget"]:.0f}ms budget'
+            raise CommandError(msg)
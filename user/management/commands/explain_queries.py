@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
+
+from user.query_plans import QUERY_PATTERNS, seed, explain, sequential_scans
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed synthetic rows, EXPLAIN every query pattern the views and workers run, and fail if any of them '
+        'reads a table in full. The seeded rows are rolled back unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Invitations to seed; other tables scale')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write(f'seeding {options["rows"]} rows')
+            sample = seed(options['rows'])
+
+            failures = []
+            for pattern in QUERY_PATTERNS:
+                plan = explain(pattern.build(sample))
+                scans = sequential_scans(plan)
+                if scans:
+                    failures.append(f'{pattern.name}: sequential scan on {", ".join(scans)}')
+                self.stdout.write(f'{"SCAN" if scans else "ok":<5}{pattern.name}')
+                if options['verbosity'] > 1:
+                    self.stdout.write(plan)
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError('\n'.join(failures))
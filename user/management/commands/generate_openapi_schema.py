@@ -0,0 +1,18 @@
+from pathlib import Path
+
+from reconciliation_backend.schema import SchemaArtifact, generate_schema
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Generate the OpenAPI schema served under docs/json/. Run it when building the image.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.OPENAPI_SCHEMA_PATH, help='Where to write the schema')
+
+    def handle(self, *args, **options):
+        artifact = SchemaArtifact(generate_schema())
+        Path(options['output']).write_bytes(artifact.content)
+        self.stdout.write(f'schema {artifact.version} written to {options["output"]}')
@@ -1,8 +1,5 @@
-from rest_framework_simplejwt.tokens import RefreshToken  # noqa: INP001
-
 from django.conf import settings
-from django.utils import timezone  # noqa: INP001
-from django.core.mail import send_mail
+from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import smart_bytes
@@ -12,22 +9,22 @@ from django.contrib.auth.tokens import PasswordResetTokenGenerator
 from rest_framework import status
 from rest_framework.response import Response
 
-from insurer.utils import verify_otp, generate_otp, gen_absolute_url
+from insurer.utils import gen_absolute_url
 
+from user.otp import VALID, OTP_ERRORS, OTP_SERVICE
 from user.models import CustomUser
+from user.tokens import PrincipalRefreshToken
+from user.principal import Principal
 
 from merchants.models import Merchant
+from notifications.outbox import queue_mail
 
 
 def merchant_sign_in(user: CustomUser, merchant_email: str) -> Response:
     try:
         merchant: Merchant = Merchant.objects.get(user=user)
 
-        otp = generate_otp()
-        merchant.otp = otp
-        merchant.otp_created_at = timezone.now().time()
-
-        merchant.save()
+        otp = OTP_SERVICE.issue(user.pk)
 
         current_year = timezone.now().year
         merchant_name = merchant.name
@@ -35,7 +32,7 @@ def merchant_sign_in(user: CustomUser, merchant_email: str) -> Response:
 
         html_message = render_to_string('merchants/otp.html', context)
 
-        send_mail(
+        queue_mail(
             subject='Login OTP',
             message=f'{otp}',
             from_email=settings.EMAIL_HOST_USER,
@@ -52,20 +49,13 @@ def merchant_sign_in(user: CustomUser, merchant_email: str) -> Response:
 def merchant_verify_otp_token(user: CustomUser, otp: str) -> Response:
     try:
         merchant = Merchant.objects.get(user=user)
-        merchant_otp = merchant.otp
-
-        if merchant_otp != otp:
-            message = {'error': 'Incorrect OTP'}
-            return Response(message, status=status.HTTP_400_BAD_REQUEST)
-
-        otp_created_time = merchant.otp_created_at
-        verify = verify_otp(otp_created_time)
+        verified = OTP_SERVICE.verify(user.pk, otp)
 
-        if not verify:
-            message = {'error': 'OTP has expired'}
+        if verified != VALID:
+            message = {'error': OTP_ERRORS[verified]}
             return Response(message, status=status.HTTP_400_BAD_REQUEST)
 
-        auth_token = RefreshToken.for_user(user)
+        auth_token = PrincipalRefreshToken.for_user(user)
 
         message = {
             'login_status': True,
@@ -97,7 +87,7 @@ def merchant_forget_email_password(user: CustomUser, merchant_email: str) -> Res
 
     html_message = render_to_string('merchants/forgot-password.html', context=context)
 
-    send_mail(
+    queue_mail(
         subject='Forgot Password',
         message=f'{abs_url}',
         from_email=settings.EMAIL_HOST_USER,
@@ -116,11 +106,7 @@ def merchant_reset_password(user: CustomUser, merchant_email: str) -> Response:
 
         merchant = get_object_or_404(Merchant, user=user)
 
-        otp = generate_otp()
-        merchant.otp = otp
-        merchant.otp_created_at = timezone.now().time()
-
-        merchant.save()
+        otp = OTP_SERVICE.issue(user.pk)
 
         current_year = timezone.now().year
         merchant_name = merchant.name
@@ -128,7 +114,7 @@ def merchant_reset_password(user: CustomUser, merchant_email: str) -> Response:
 
         html_message = render_to_string('merchants/otp.html', context)
 
-        send_mail(
+        queue_mail(
             subject='Request New OTP',
             message=f'{otp}',
             from_email=settings.EMAIL_HOST_USER,
@@ -142,10 +128,10 @@ def merchant_reset_password(user: CustomUser, merchant_email: str) -> Response:
         return Response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
 
 
-def merchant_view_details(user: CustomUser) -> Response:
-    merchant = get_object_or_404(Merchant, user=user)
+def merchant_view_details(principal: Principal) -> Response:
+    merchant = principal.get_merchant()
 
-    data = {'id': merchant.id, 'email': user.email, 'merchant_name': merchant.name}
+    data = {'id': merchant.id, 'email': principal.user.email, 'merchant_name': merchant.name}
 
     return Response(data, status.HTTP_200_OK)
 
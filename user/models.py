@@ -2,7 +2,29 @@ from django.db import models
 from django.contrib.auth.models import BaseUserManager, AbstractBaseUser, PermissionsMixin
 
 
-class CustomUserManager(BaseUserManager):
+class PrincipalQuerySet(models.QuerySet):
+    """
+    Queryset of rows that cached principals are built from, see user.principal. ``update()`` does not send
+    post_save, so it invalidates the principals of the users it touches itself.
+    """
+
+    # Lookups from a row to the users whose principals it is part of
+    principal_users = ('user',)
+
+    def update(self, **kwargs):
+        from .principal import invalidate_principal
+
+        user_ids = {user_id for lookup in self.principal_users for user_id in self.values_list(lookup, flat=True)}
+        rows = super().update(**kwargs)
+        invalidate_principal(*user_ids - {None})
+        return rows
+
+
+class UserQuerySet(PrincipalQuerySet):
+    principal_users = ('pk',)
+
+
+class CustomUserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError('Email field must be set')
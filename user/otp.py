@@ -0,0 +1,83 @@
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac, constant_time_compare
+
+OTP_CACHE_PREFIX = 'otp'
+OTP_DIGITS = 6
+
+VALID = 'VALID'
+INCORRECT = 'INCORRECT'
+EXPIRED = 'EXPIRED'
+LOCKED = 'LOCKED'
+
+OTP_ERRORS = {
+    INCORRECT: 'Incorrect OTP',
+    EXPIRED: 'OTP has expired',
+    LOCKED: 'Too many incorrect attempts. Request a new OTP',
+}
+
+
+class OTPService:
+    """
+    One-time passwords for agents, insurers and merchants, kept in a TTL key-value store rather than on
+    their profile rows. The store is a Django cache: Redis in staging and production, which refuse to
+    start without REDIS_URL, and local memory in dev and tests.
+
+    Only a keyed hash of each code is stored, next to a counter of attempts made against it; both expire
+    with the code. A successful check uses the code up, and once ``max_attempts`` checks have been made the
+    code is dropped and a new one has to be requested.
+    """
+
+    def __init__(self, store=cache, ttl: int = settings.OTP_TTL_SECONDS, max_attempts: int = settings.OTP_MAX_ATTEMPTS):
+        self.store = store
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+
+    @staticmethod
+    def _keys(user_id) -> tuple[str, str]:
+        return f'{OTP_CACHE_PREFIX}:code:{user_id}', f'{OTP_CACHE_PREFIX}:attempts:{user_id}'
+
+    @staticmethod
+    def _hash(user_id, code: str) -> str:
+        return salted_hmac(OTP_CACHE_PREFIX, f'{user_id}:{code}', algorithm='sha256').hexdigest()
+
+    def issue(self, user_id) -> str:
+        """
+        Generate a new code for ``user_id``, replacing any earlier one, and return it to be sent out.
+        """
+        code = f'{secrets.randbelow(10**OTP_DIGITS):0{OTP_DIGITS}d}'
+        code_key, attempts_key = self._keys(user_id)
+        self.store.set_many({code_key: self._hash(user_id, code), attempts_key: 0}, self.ttl)
+        return code
+
+    def verify(self, user_id, code: str) -> str:
+        """
+        Check ``code`` against the one issued to ``user_id``, returning VALID, INCORRECT, EXPIRED or LOCKED.
+        """
+        code_key, attempts_key = self._keys(user_id)
+        digest = self.store.get(code_key)
+        if digest is None:
+            return EXPIRED
+
+        # incr is atomic in the store, so concurrent guesses cannot share an attempt.
+        try:
+            attempts = self.store.incr(attempts_key)
+        except ValueError:
+            return EXPIRED
+        if attempts > self.max_attempts:
+            self.store.delete_many([code_key, attempts_key])
+            return LOCKED
+
+        if not constant_time_compare(digest, self._hash(user_id, code or '')):
+            return INCORRECT
+
+        # Only the request that deletes the code gets to use it.
+        if not self.store.delete(code_key):
+            return EXPIRED
+        self.store.delete(attempts_key)
+        return VALID
+
+
+OTP_SERVICE = OTPService()
@@ -0,0 +1,339 @@
+import time
+import uuid
+import threading
+from functools import cached_property
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+
+from django.db import DEFAULT_DB_ALIAS
+from django.conf import settings
+from django.http import Http404
+from django.core.cache import cache
+
+from agents.models import Agent
+
+from insurer.models import Insurer
+
+from merchants.models import Merchant
+
+from .models import CustomUser
+
+AGENT = 'AGENT'
+INSURER = 'INSURER'
+MERCHANT = 'MERCHANT'
+
+PRINCIPAL_CACHE_PREFIX = 'principal'
+
+# User fields a cached principal keeps, see PrincipalSnapshot.
+SNAPSHOT_USER_FIELDS = ('id', 'is_active', 'is_agent', 'is_insurer', 'is_merchant')
+
+# Token claims naming the caller's role and the pk of its agent, insurer or merchant row.
+ROLE_CLAIMS = {AGENT: 'is_agent', INSURER: 'is_insurer', MERCHANT: 'is_merchant'}
+PROFILE_ID_CLAIMS = {AGENT: 'agent_id', INSURER: 'insurer_id', MERCHANT: 'merchant_id'}
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    The caller of a request: the user together with the agent, insurer or merchant row behind it. For an
+    agent, ``insurer`` is the insurer the agent is affiliated with.
+    """
+
+    user: CustomUser
+    role: str | None = None
+    agent: Agent | None = None
+    insurer: Insurer | None = None
+    merchant: Merchant | None = None
+
+    @property
+    def is_agent(self) -> bool:
+        return self.role == AGENT
+
+    @property
+    def is_insurer(self) -> bool:
+        return self.role == INSURER
+
+    @property
+    def is_merchant(self) -> bool:
+        return self.role == MERCHANT
+
+    @property
+    def insurer_id(self):
+        """Superpool id of the caller's insurer, used as the insurer tenant on Superpool."""
+        return self.insurer.insurer_id if self.insurer is not None else None
+
+    @property
+    def tenant_id(self):
+        """Superpool merchant tenant of the caller: the agent's own tenant, or the merchant's."""
+        if self.agent is not None:
+            return self.agent.tenant_id
+        if self.merchant is not None:
+            return self.merchant.tenant_id
+        return None
+
+    def get_agent(self) -> Agent:
+        if self.agent is None:
+            raise Http404('No Agent matches the given query.')
+        return self.agent
+
+    def get_insurer(self) -> Insurer:
+        if self.insurer is None:
+            raise Http404('No Insurer matches the given query.')
+        return self.insurer
+
+    def get_merchant(self) -> Merchant:
+        if self.merchant is None:
+            raise Http404('No Merchant matches the given query.')
+        return self.merchant
+
+
+@dataclass(frozen=True)
+class PrincipalSnapshot:
+    """
+    What the shared cache keeps of a principal: the ids and flags authentication and tenant scoping need.
+    The rest of the user row, password hash included, and the profile rows stay in the database.
+    """
+
+    user: tuple
+    role: str | None = None
+    profile_id: int | None = None
+    insurer_id: uuid.UUID | None = None
+    tenant_id: uuid.UUID | None = None
+
+    @classmethod
+    def of(cls, principal: Principal) -> 'PrincipalSnapshot':
+        user = tuple(getattr(principal.user, field) for field in SNAPSHOT_USER_FIELDS)
+        profile = {AGENT: principal.agent, INSURER: principal.insurer, MERCHANT: principal.merchant}.get(principal.role)
+        profile_id = profile.pk if profile is not None else None
+        return cls(user, principal.role, profile_id, principal.insurer_id, principal.tenant_id)
+
+
+class CachedPrincipal(Principal):
+    """
+    A principal restored from a ``PrincipalSnapshot``. The role and tenant ids come from the snapshot and the
+    user only has the snapshot's fields loaded, the others being deferred. The agent, insurer or merchant row
+    is loaded with one query the first time it is needed.
+    """
+
+    def __init__(self, snapshot: PrincipalSnapshot) -> None:
+        object.__setattr__(self, 'snapshot', snapshot)
+
+    @cached_property
+    def user(self) -> CustomUser:
+        return CustomUser.from_db(DEFAULT_DB_ALIAS, SNAPSHOT_USER_FIELDS, self.snapshot.user)
+
+    @property
+    def role(self) -> str | None:
+        return self.snapshot.role
+
+    @property
+    def agent(self) -> Agent | None:
+        return self._profile.agent
+
+    @property
+    def insurer(self) -> Insurer | None:
+        return self._profile.insurer
+
+    @property
+    def merchant(self) -> Merchant | None:
+        return self._profile.merchant
+
+    @property
+    def insurer_id(self):
+        return self.snapshot.insurer_id
+
+    @property
+    def tenant_id(self):
+        return self.snapshot.tenant_id
+
+    @cached_property
+    def _profile(self) -> Principal:
+        profile_id = self.snapshot.profile_id
+        if self.role == AGENT:
+            agent = Agent.objects.select_related('affiliated_company').filter(pk=profile_id).first()
+            return Principal(self.user, AGENT, agent=agent, insurer=agent.affiliated_company if agent else None)
+        if self.role == INSURER:
+            return Principal(self.user, INSURER, insurer=Insurer.objects.filter(pk=profile_id).first())
+        if self.role == MERCHANT:
+            return Principal(self.user, MERCHANT, merchant=Merchant.objects.filter(pk=profile_id).first())
+        return Principal(self.user)
+
+
+def resolve_principal(user: CustomUser) -> Principal:
+    """
+    Load the agent, insurer or merchant row for ``user`` with one query. An agent's insurer comes along
+    through ``select_related``.
+    """
+    if not user.is_authenticated:
+        return Principal(user=user)
+    if user.is_agent:
+        agent = Agent.objects.select_related('affiliated_company').filter(user=user).order_by('pk').first()
+        return Principal(user, AGENT, agent=agent, insurer=agent.affiliated_company if agent else None)
+    if user.is_insurer:
+        return Principal(user, INSURER, insurer=Insurer.objects.filter(user=user).order_by('pk').first())
+    if user.is_merchant:
+        return Principal(user, MERCHANT, merchant=Merchant.objects.filter(user=user).order_by('pk').first())
+    return Principal(user)
+
+
+def principal_claims(principal: Principal) -> dict:
+    """
+    The role flags and profile id to embed in the principal's tokens.
+    """
+    claims = {claim: principal.role == role for role, claim in ROLE_CLAIMS.items()}
+    profile = {AGENT: principal.agent, INSURER: principal.insurer, MERCHANT: principal.merchant}.get(principal.role)
+    if profile is not None:
+        claims[PROFILE_ID_CLAIMS[principal.role]] = profile.pk
+    return claims
+
+
+def resolve_principal_from_claims(user_id, claims) -> Principal | None:
+    """
+    Load the principal named by a token's role and profile id claims with one query, joining the user onto
+    the profile row rather than selecting it first. None when the token has no such claims or they no longer
+    match the user, in which case the caller falls back to ``resolve_principal``.
+    """
+    role = next((role for role, claim in ROLE_CLAIMS.items() if claims.get(claim)), None)
+    profile_id = claims.get(PROFILE_ID_CLAIMS[role]) if role is not None else None
+    if profile_id is None:
+        return None
+
+    if role == AGENT:
+        agents = Agent.objects.select_related('user', 'affiliated_company')
+        agent = agents.filter(pk=profile_id, user_id=user_id).first()
+        principal = Principal(agent.user, AGENT, agent=agent, insurer=agent.affiliated_company) if agent else None
+    elif role == INSURER:
+        insurer = Insurer.objects.select_related('user').filter(pk=profile_id, user_id=user_id).first()
+        principal = Principal(insurer.user, INSURER, insurer=insurer) if insurer else None
+    else:
+        merchant = Merchant.objects.select_related('user').filter(pk=profile_id, user_id=user_id).first()
+        principal = Principal(merchant.user, MERCHANT, merchant=merchant) if merchant else None
+
+    if principal is None or not getattr(principal.user, ROLE_CLAIMS[role]):
+        return None
+    return principal
+
+
+def get_principal(request) -> Principal:
+    """
+    The principal the authentication class attached to ``request``, or one resolved now for requests
+    authenticated some other way (sessions, ``force_authenticate`` in tests).
+    """
+    principal = getattr(request, 'principal', None)
+    if principal is None or principal.user.pk != request.user.pk:
+        principal = resolve_principal(request.user)
+        request.principal = principal
+    return principal
+
+
+async def aget_principal(request) -> Principal:
+    principal = getattr(request, 'principal', None)
+    if principal is not None and principal.user.pk == request.user.pk:
+        return principal
+    return await sync_to_async(get_principal)(request)
+
+
+def _version_key(user_id) -> str:
+    return f'{PRINCIPAL_CACHE_PREFIX}:version:{user_id}'
+
+
+def _token_key(jti: str) -> str:
+    return f'{PRINCIPAL_CACHE_PREFIX}:token:{jti}'
+
+
+def cached_principal(user_id, jti: str) -> tuple[Principal | None, str | None]:
+    """
+    The principal cached for token ``jti`` (None if the user or their profile row changed since it was
+    cached) and the user's current version, to cache a freshly resolved principal under.
+    """
+    entries = cache.get_many([_version_key(user_id), _token_key(jti)])
+    version = entries.get(_version_key(user_id))
+    cached = entries.get(_token_key(jti))
+    if cached is None or cached[0] != version:
+        return None, version
+    return CachedPrincipal(cached[1]), version
+
+
+def cache_principal(principal: Principal, jti: str, version: str | None, timeout: float) -> None:
+    """
+    Cache a snapshot of ``principal`` for token ``jti``, see ``PrincipalSnapshot``.
+    """
+    if timeout > 0:
+        cache.set(_token_key(jti), (version, PrincipalSnapshot.of(principal)), timeout)
+
+
+class LocalPrincipalCache:
+    """
+    In-process LRU of validated access tokens and their principals, keyed by the raw token, in front of the
+    shared cache. A hit skips signature verification and the shared cache round trip.
+
+    Entries live for at most ``ttl`` seconds, which bounds how long an invalidation made by another process
+    takes to reach this one; invalidations made in this process drop the user's entries straight away.
+    Cached principals are shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, clock=time.monotonic) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.generation = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, raw_token: bytes) -> tuple | None:
+        """
+        ``(validated_token, principal)`` cached for ``raw_token``, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(raw_token)
+            if entry is None:
+                return None
+            if entry[0] <= self.clock():
+                del self._entries[raw_token]
+                return None
+            self._entries.move_to_end(raw_token)
+            return entry[1], entry[2]
+
+    def set(self, raw_token: bytes, validated_token, principal: Principal, timeout: float, generation: int) -> None:
+        """
+        Cache ``principal`` for ``raw_token``, unless an invalidation happened since ``generation`` was read.
+        """
+        timeout = min(self.ttl, timeout)
+        if timeout <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[raw_token] = (self.clock() + timeout, validated_token, principal)
+            self._entries.move_to_end(raw_token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *user_ids) -> None:
+        user_ids = set(user_ids)
+        with self._lock:
+            self.generation += 1
+            for raw_token, (_, _, principal) in list(self._entries.items()):
+                if principal.user.pk in user_ids:
+                    del self._entries[raw_token]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+LOCAL_PRINCIPALS = LocalPrincipalCache(settings.PRINCIPAL_LOCAL_CACHE_MAX_ENTRIES, settings.PRINCIPAL_LOCAL_CACHE_TTL)
+
+
+def invalidate_principal(*user_ids) -> None:
+    """
+    Drop every cached principal of ``user_ids`` by moving each user to a new version, and evict them from
+    this process's local cache.
+    """
+    if user_ids:
+        version = uuid.uuid4().hex
+        cache.set_many({_version_key(user_id): version for user_id in user_ids}, None)
+        LOCAL_PRINCIPALS.invalidate(*user_ids)
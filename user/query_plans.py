@@ -0,0 +1,340 @@
+import re
+import uuid
+from datetime import timedelta
+from dataclasses import dataclass
+from collections.abc import Callable, Iterable
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.db.models import Q, QuerySet
+from django.contrib.auth.hashers import make_password
+
+from agents.models import Agent, AgentProfile, AgentPolicySale
+
+from insurer.models import Insurer, InvitationJob, InvitedAgents, InsurerProfile
+from insurer.invitations import chunked
+
+from merchants.models import Merchant
+from notifications.models import OutboundEmail
+from superpool_proxy.export import EXPORT_PAGE_SIZE
+from superpool_proxy.models import MirroredPolicy, MirrorSyncState
+
+from .models import CustomUser
+from .uniqueness import conflicts_query
+
+SEED_DOMAIN = 'explain.invalid'
+SEED_BATCH_SIZE = 10_000
+
+POSTGRES_SEQ_SCAN = re.compile(r'Seq Scan on "?(\w+)"?')
+SQLITE_SCAN = re.compile(r'\bSCAN "?(\w+)"?')
+
+
+@dataclass(frozen=True)
+class Sample:
+    """
+    Seeded rows whose values the query patterns look up, chosen from the middle of each table.
+    """
+
+    agent: Agent
+    insurer: Insurer
+    merchant: Merchant
+    invited_email: str
+    job: InvitationJob
+
+
+@dataclass(frozen=True)
+class QueryPattern:
+    name: str
+    build: Callable[[Sample], QuerySet]
+
+
+# Every query the views, sign in flows and workers run against a table that grows with usage. Lookups that
+# the ORM turns into exists() or get() are written with [:1] so they can be explained.
+QUERY_PATTERNS = [
+    QueryPattern('user by email', lambda s: CustomUser.objects.filter(email=s.agent.user.email)),
+    QueryPattern('user by id', lambda s: CustomUser.objects.filter(id=s.agent.user_id)),
+    QueryPattern(
+        'principal: agent by user',
+        lambda s: Agent.objects.select_related('affiliated_company').filter(user=s.agent.user_id).order_by('pk')[:1],
+    ),
+    QueryPattern(
+        'principal: insurer by user', lambda s: Insurer.objects.filter(user=s.insurer.user_id).order_by('pk')[:1]
+    ),
+    QueryPattern(
+        'principal: merchant by user', lambda s: Merchant.objects.filter(user=s.merchant.user_id).order_by('pk')[:1]
+    ),
+    QueryPattern(
+        'principal: agent from token claims',
+        lambda s: Agent.objects.select_related('user', 'affiliated_company').filter(
+            pk=s.agent.pk, user_id=s.agent.user_id
+        )[:1],
+    ),
+    QueryPattern(
+        'principal: insurer from token claims',
+        lambda s: Insurer.objects.select_related('user').filter(pk=s.insurer.pk, user_id=s.insurer.user_id)[:1],
+    ),
+    QueryPattern(
+        'principal: merchant from token claims',
+        lambda s: Merchant.objects.select_related('user').filter(pk=s.merchant.pk, user_id=s.merchant.user_id)[:1],
+    ),
+    QueryPattern(
+        'principal invalidation: agent users of an insurer',
+        lambda s: Agent.objects.filter(affiliated_company_id=s.insurer.pk).values_list('user_id', flat=True),
+    ),
+    QueryPattern(
+        'agent sign-up conflicts',
+        lambda s: conflicts_query(
+            {
+                'email': CustomUser.objects.filter(email=s.agent.user.email),
+                'home_address': Agent.objects.filter(home_address=s.agent.home_address),
+                'bvn': Agent.objects.filter(bvn=s.agent.bvn),
+                'bank_account': Agent.objects.filter(bank_account=s.agent.bank_account),
+            }
+        ),
+    ),
+    QueryPattern(
+        'insurer sign-up conflicts',
+        lambda s: conflicts_query(
+            {
+                'email': CustomUser.objects.filter(email=s.insurer.user.email),
+                'business_registration_number': Insurer.objects.filter(
+                    business_registration_number=s.insurer.business_registration_number
+                ),
+                'business_name': Insurer.objects.filter(business_name=s.insurer.business_name),
+            }
+        ),
+    ),
+    QueryPattern(
+        'insurer by invite id',
+        lambda s: Insurer.objects.filter(unyte_unique_insurer_id=s.insurer.unyte_unique_insurer_id),
+    ),
+    QueryPattern('insurer by superpool id', lambda s: Insurer.objects.filter(insurer_id=s.insurer.insurer_id)),
+    QueryPattern('merchant by tenant id', lambda s: Merchant.objects.filter(tenant_id=s.merchant.tenant_id)),
+    QueryPattern(
+        'agent sign-up: invite check',
+        lambda s: InvitedAgents.objects.filter(insurer=s.insurer, agent_email=s.invited_email).values('pk')[:1],
+    ),
+    QueryPattern(
+        'invitation job: invited emails',
+        lambda s: InvitedAgents.objects.filter(insurer=s.insurer).values_list('agent_email', flat=True),
+    ),
+    QueryPattern('insurer agents', lambda s: s.insurer.agent_set.all()),
+    QueryPattern('insurer profile', lambda s: InsurerProfile.objects.filter(insurer=s.insurer)),
+    QueryPattern('agent profile', lambda s: AgentProfile.objects.filter(agent=s.agent)),
+    QueryPattern(
+        'invitation job progress', lambda s: InvitationJob.objects.filter(pk=s.job.pk, insurer=s.job.insurer_id)
+    ),
+    QueryPattern(
+        'invitation worker: claim job',
+        lambda _: InvitationJob.objects.filter(
+            Q(status=InvitationJob.PENDING) | Q(status=InvitationJob.RUNNING, updated_at__lte=timezone.now()),
+            status__in=InvitationJob.OPEN_STATUSES,
+        ).order_by('created_at', 'id')[:1],
+    ),
+    QueryPattern(
+        'mail worker: claim batch',
+        lambda _: OutboundEmail.objects.filter(
+            status__in=(OutboundEmail.PENDING, OutboundEmail.SENDING), next_attempt_at__lte=timezone.now()
+        ).order_by('next_attempt_at', 'id')[:100],
+    ),
+    QueryPattern(
+        'reconciliation: agent sales of an insurer',
+        lambda s: AgentPolicySale.objects.filter(insurer=s.insurer).values(
+            'quote_code', 'merchant_code', 'superpool_policy_id', 'premium'
+        ),
+    ),
+    QueryPattern(
+        'mirror: sync state',
+        lambda s: MirrorSyncState.objects.filter(
+            scope='insurer', resource='policies', tenant_id=s.insurer.insurer_id
+        ).values('pk')[:1],
+    ),
+    QueryPattern(
+        'mirror: insurer policies',
+        lambda s: MirroredPolicy.objects.filter(insurer_id=s.insurer.insurer_id)
+        .order_by('-upstream_updated_at', '-id')
+        .values_list('payload', flat=True),
+    ),
+    QueryPattern(
+        'export: page of insurer policies',
+        lambda s: MirroredPolicy.objects.filter(insurer_id=s.insurer.insurer_id, superpool_id__gt='seed-policy-5')
+        .order_by('superpool_id')
+        .values_list('superpool_id', 'payload')[:EXPORT_PAGE_SIZE],
+    ),
+]
+
+
+def _bulk_create(model, objects: Iterable) -> None:
+    for chunk in chunked(objects, SEED_BATCH_SIZE):
+        model.objects.bulk_create(chunk)
+
+
+def _seed_users(kind: str, count: int) -> list[int]:
+    _bulk_create(
+        CustomUser,
+        (
+            CustomUser(
+                email=f'seed-{kind}-{i}@{SEED_DOMAIN}',
+                password=make_password(None),
+                is_agent=kind == 'agent',
+                is_insurer=kind == 'insurer',
+                is_merchant=kind == 'merchant',
+            )
+            for i in range(count)
+        ),
+    )
+    users = CustomUser.objects.filter(email__startswith=f'seed-{kind}-', email__endswith=f'@{SEED_DOMAIN}')
+    return list(users.order_by('id').values_list('id', flat=True))
+
+
+def seed(rows: int) -> Sample:
+    """
+    Fill the tables the query patterns read with synthetic rows: ``rows`` invitations, and the other
+    tables in proportion (one insurer per thousand rows, one agent per ten, one merchant per hundred, a
+    profile per insurer and agent, and a mirror sync state per insurer and resource).
+    """
+    insurers, agents, merchants = max(rows // 1000, 1), max(rows // 10, 1), max(rows // 100, 1)
+    now = timezone.now()
+
+    insurer_users = _seed_users('insurer', insurers)
+    _bulk_create(
+        Insurer,
+        (
+            Insurer(
+                user_id=user_id,
+                insurer_id=uuid.uuid4(),
+                business_name=f'Seed {i}',
+                admin_name='seed',
+                business_registration_number=f'SEED{i:08d}',
+                unyte_unique_insurer_id=f'Seed{i}+{i:04d}+{SEED_DOMAIN}',
+            )
+            for i, user_id in enumerate(insurer_users)
+        ),
+    )
+    insurer_ids = list(Insurer.objects.filter(user_id__in=insurer_users).order_by('id').values_list('id', flat=True))
+
+    agent_users = _seed_users('agent', agents)
+    _bulk_create(
+        Agent,
+        (
+            Agent(
+                user_id=user_id,
+                first_name='Seed',
+                middle_name='Seed',
+                home_address=f'{i} seed lane',
+                bvn=f'9{i:010d}',
+                bank_account=f'9{i:09d}',
+                tenant_id=uuid.uuid4(),
+                merchant_code=f'S{i % 10**9:09d}',
+                affiliated_company_id=insurer_ids[i % insurers],
+                unyte_unique_agent_id=f'Seed+{i}+{SEED_DOMAIN}',
+            )
+            for i, user_id in enumerate(agent_users)
+        ),
+    )
+    agent_ids = list(Agent.objects.filter(user_id__in=agent_users).order_by('id').values_list('id', flat=True))
+    _bulk_create(InsurerProfile, (InsurerProfile(insurer_id=insurer_id) for insurer_id in insurer_ids))
+    _bulk_create(AgentProfile, (AgentProfile(agent_id=agent_id) for agent_id in agent_ids))
+
+    merchant_users = _seed_users('merchant', merchants)
+    _bulk_create(
+        Merchant,
+        (
+            Merchant(user_id=user_id, name=f'Seed {i}', short_code=f'S{i:09d}')
+            for i, user_id in enumerate(merchant_users)
+        ),
+    )
+
+    _bulk_create(
+        InvitedAgents,
+        (
+            InvitedAgents(insurer_id=insurer_ids[i % insurers], agent_email=f'invite-{i}@{SEED_DOMAIN}')
+            for i in range(rows)
+        ),
+    )
+    _bulk_create(
+        InvitationJob,
+        (
+            InvitationJob(insurer_id=insurer_ids[i % insurers], status=InvitationJob.DONE, finished_at=now)
+            for i in range(max(rows // 100, 1))
+        ),
+    )
+    _bulk_create(
+        OutboundEmail,
+        (
+            OutboundEmail(subject='Seed', body='Seed', recipients=[f'seed@{SEED_DOMAIN}'], status=OutboundEmail.SENT)
+            for _ in range(rows // 10)
+        ),
+    )
+    _bulk_create(
+        AgentPolicySale,
+        (
+            AgentPolicySale(
+                agent_id=agent_ids[i % agents],
+                insurer_id=insurer_ids[i % agents % insurers],
+                product='Travel',
+                quote_code=f'seed-quote-{i}',
+                merchant_code='SEED',
+            )
+            for i in range(rows // 10)
+        ),
+    )
+    superpool_ids = list(Insurer.objects.filter(id__in=insurer_ids).values_list('insurer_id', flat=True))
+    _bulk_create(
+        MirrorSyncState,
+        (
+            MirrorSyncState(scope='insurer', resource=resource, tenant_id=tenant_id, high_water_mark=now)
+            for tenant_id in superpool_ids
+            for resource in ('policies', 'claims', 'products')
+        ),
+    )
+    _bulk_create(
+        MirroredPolicy,
+        (
+            MirroredPolicy(
+                superpool_id=f'seed-policy-{i}',
+                insurer_id=superpool_ids[i % insurers],
+                payload={},
+                upstream_updated_at=now - timedelta(seconds=i),
+            )
+            for i in range(rows // 10)
+        ),
+    )
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    insurer = Insurer.objects.select_related('user').get(id=insurer_ids[insurers // 2])
+    return Sample(
+        agent=Agent.objects.select_related('user').get(id=agent_ids[agents // 2]),
+        insurer=insurer,
+        merchant=Merchant.objects.get(user_id=merchant_users[merchants // 2]),
+        invited_email=f'invite-{insurer_ids.index(insurer.id)}@{SEED_DOMAIN}',
+        job=InvitationJob.objects.filter(insurer=insurer).first(),
+    )
+
+
+def explain(queryset: QuerySet) -> str:
+    # EXPLAIN ANALYZE runs the query; the other backends only show the plan.
+    if connection.vendor == 'postgresql':
+        # At any size a test can seed, Postgres rightly prefers reading a small table in full. With sequential
+        # scans priced out, one is only left in the plan when no index can serve the query.
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain(analyze=True)
+    return queryset.explain()
+
+
+def sequential_scans(plan: str) -> list[str]:
+    """
+    Tables ``plan`` reads in full rather than through an index.
+    """
+    if connection.vendor == 'postgresql':
+        return POSTGRES_SEQ_SCAN.findall(plan)
+    tables = set(connection.introspection.table_names())
+    return [
+        match.group(1)
+        for line in plan.splitlines()
+        if (match := SQLITE_SCAN.search(line)) and match.group(1) in tables and 'USING' not in line
+    ]
@@ -0,0 +1,37 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+
+from agents.models import Agent
+
+from insurer.models import Insurer
+
+from merchants.models import Merchant
+
+from .models import CustomUser
+from .principal import invalidate_principal
+
+# Insurer fields an affiliated agent's principal relies on.
+AGENT_VISIBLE_INSURER_FIELDS = frozenset({'business_name', 'insurer_id', 'unyte_unique_insurer_id'})
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_principal(instance, **kwargs):
+    invalidate_principal(instance.pk)
+
+
+@receiver(post_save, sender=Agent)
+@receiver(post_delete, sender=Agent)
+@receiver(post_save, sender=Merchant)
+@receiver(post_delete, sender=Merchant)
+def invalidate_profile_principal(instance, **kwargs):
+    invalidate_principal(instance.user_id)
+
+
+@receiver(post_save, sender=Insurer)
+@receiver(post_delete, sender=Insurer)
+def invalidate_insurer_principals(instance, update_fields=None, **kwargs):
+    invalidate_principal(instance.user_id)
+    if update_fields is None or AGENT_VISIBLE_INSURER_FIELDS.intersection(update_fields):
+        agent_user_ids = Agent.objects.filter(affiliated_company_id=instance.pk).values_list('user_id', flat=True)
+        invalidate_principal(*agent_user_ids)
@@ -0,0 +1,63 @@
+import uuid
+
+from rest_framework.test import APIClient
+
+from agents.models import Agent
+
+from insurer.models import Insurer
+
+from merchants.models import Merchant
+
+from .models import CustomUser
+from .tokens import PrincipalRefreshToken
+
+INSURER_ID = uuid.UUID('1b7c6a52-4a7c-4b8e-9c0b-3f1f3a0f6e11')
+
+
+def create_insurer(email: str = 'insurer@example.com', **fields) -> Insurer:
+    user = CustomUser.objects.create_user(email=email, password='password', is_insurer=True)  # noqa: S106
+    return Insurer.objects.create(
+        user=user,
+        insurer_id=fields.pop('insurer_id', INSURER_ID),
+        business_name=fields.pop('business_name', 'Unyte'),
+        admin_name='unyte_admin',
+        business_registration_number=fields.pop('business_registration_number', '12345678'),
+        unyte_unique_insurer_id=fields.pop('unyte_unique_insurer_id', 'Unyte+5678+unyte.com'),
+        **fields,
+    )
+
+
+def create_agent(insurer: Insurer, email: str = 'agent@example.com', **fields) -> Agent:
+    user = CustomUser.objects.create_user(email=email, password='password', is_agent=True)  # noqa: S106
+    return Agent.objects.create(
+        user=user,
+        affiliated_company=insurer,
+        first_name='John',
+        middle_name='Doe',
+        home_address=fields.pop('home_address', '10 john doe lane'),
+        bvn=fields.pop('bvn', '12345678901'),
+        bank_account=fields.pop('bank_account', '1234567890'),
+        merchant_code=fields.pop('merchant_code', 'MER-12345'),
+        unyte_unique_agent_id=fields.pop('unyte_unique_agent_id', f'John+{email}+unyte.com'),
+        **fields,
+    )
+
+
+def create_merchant(email: str = 'merchant@example.com', **fields) -> Merchant:
+    user = CustomUser.objects.create_user(email=email, password='password', is_merchant=True)  # noqa: S106
+    return Merchant.objects.create(
+        user=user,
+        name=fields.pop('name', 'Konga'),
+        short_code=fields.pop('short_code', 'KON-001'),
+        **fields,
+    )
+
+
+def jwt_client(user: CustomUser) -> APIClient:
+    """
+    An API client that authenticates with a real access token, issued the way sign in issues them, so requests
+    go through the authentication classes in settings rather than ``force_authenticate``.
+    """
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {PrincipalRefreshToken.for_user(user).access_token}')
+    return client
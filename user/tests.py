@@ -1 +1,336 @@
-# Create your tests here.
+import pickle
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from reconciliation_backend.replicas import ReplicaRouter
+from rest_framework_simplejwt.tokens import AccessToken
+
+from django.test import TestCase, SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.cache.backends.locmem import LocMemCache
+
+from rest_framework.test import APIClient
+
+from agents.models import Agent
+
+from insurer.models import Insurer
+
+from notifications.models import OutboundEmail
+
+from .otp import VALID, LOCKED, EXPIRED, INCORRECT, OTPService
+from .models import CustomUser
+from .tokens import PrincipalRefreshToken
+from .testing import jwt_client, create_agent, create_insurer, create_merchant
+from .principal import (
+    AGENT,
+    LOCAL_PRINCIPALS,
+    Principal,
+    LocalPrincipalCache,
+    cache_principal,
+    cached_principal,
+    resolve_principal,
+)
+from .query_plans import explain, sequential_scans
+
+
+class PrincipalTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        LOCAL_PRINCIPALS.clear()
+        self.insurer = create_insurer()
+        self.agent = create_agent(self.insurer)
+
+    def test_agent_and_insurer_are_resolved_with_one_query(self) -> None:
+        with self.assertNumQueries(1):
+            principal = resolve_principal(self.agent.user)
+
+        self.assertEqual(principal.role, AGENT)
+        self.assertEqual(principal.agent, self.agent)
+        self.assertEqual(principal.insurer_id, self.insurer.insurer_id)
+        self.assertEqual(str(principal.tenant_id), str(self.agent.tenant_id))
+
+    def test_principal_is_cached_for_the_token(self) -> None:
+        client = jwt_client(self.agent.user)
+        route = reverse('user:user_details_endpoint')
+
+        # The token's first request loads the agent named in its claims, with its user; the rest load nothing.
+        with self.assertNumQueries(1):
+            client.get(route)
+        with self.assertNumQueries(0):
+            response = client.get(route)
+        self.assertEqual(response.json()['email'], 'agent@example.com')
+
+        # Other processes find a snapshot of it in the shared cache, and only load the rows the view shows.
+        LOCAL_PRINCIPALS.clear()
+        with self.assertNumQueries(2):
+            response = client.get(route)
+        self.assertEqual(response.json()['email'], 'agent@example.com')
+
+    def test_shared_cache_keeps_ids_and_flags_only(self) -> None:
+        _, version = cached_principal(self.agent.user.pk, 'jti')
+        cache_principal(resolve_principal(self.agent.user), 'jti', version, 60)
+
+        stored = pickle.dumps(cache.get('principal:token:jti'))
+        self.assertNotIn(self.agent.user.password.encode(), stored)
+        self.assertNotIn(b'agent@example.com', stored)
+
+        principal, _ = cached_principal(self.agent.user.pk, 'jti')
+        with self.assertNumQueries(0):
+            self.assertTrue(principal.is_agent)
+            self.assertTrue(principal.user.is_active)
+            self.assertEqual(principal.user.pk, self.agent.user.pk)
+            self.assertEqual(principal.insurer_id, self.insurer.insurer_id)
+            self.assertEqual(str(principal.tenant_id), str(self.agent.tenant_id))
+        with self.assertNumQueries(1):
+            self.assertEqual(principal.get_agent(), self.agent)
+            self.assertEqual(principal.get_insurer(), self.insurer)
+
+    def test_token_without_claims_loads_the_user_first(self) -> None:
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.agent.user)}')
+        route = reverse('user:user_details_endpoint')
+
+        with self.assertNumQueries(2):
+            response = client.get(route)
+        self.assertEqual(response.json()['email'], 'agent@example.com')
+
+    def test_profile_changes_invalidate_the_cached_principal(self) -> None:
+        client = jwt_client(self.agent.user)
+        route = reverse('user:user_details_endpoint')
+        client.get(route)
+
+        self.agent.first_name = 'Jane'
+        self.agent.save()
+
+        with self.assertNumQueries(1):
+            response = client.get(route)
+        self.assertEqual(response.json()['first_name'], 'Jane')
+
+    def test_bulk_updates_invalidate_the_cached_principal(self) -> None:
+        client = jwt_client(self.agent.user)
+        route = reverse('user:user_details_endpoint')
+        client.get(route)
+
+        CustomUser.objects.filter(pk=self.agent.user.pk).update(is_active=False)
+
+        self.assertEqual(client.get(route).status_code, 401)
+
+    def test_insurer_bulk_updates_invalidate_its_agents(self) -> None:
+        _, version = cached_principal(self.agent.user.pk, 'jti')
+        cache_principal(resolve_principal(self.agent.user), 'jti', version, 60)
+
+        Insurer.objects.filter(pk=self.insurer.pk).update(business_name='Renamed Insurance')
+
+        self.assertEqual(cached_principal(self.agent.user.pk, 'jti')[0], None)
+
+    def test_deactivated_user_is_rejected(self) -> None:
+        client = jwt_client(self.agent.user)
+        route = reverse('user:user_details_endpoint')
+        client.get(route)
+
+        self.agent.user.is_active = False
+        self.agent.user.save()
+
+        self.assertEqual(client.get(route).status_code, 401)
+
+    def test_password_reset_revokes_tokens(self) -> None:
+        client = jwt_client(self.agent.user)
+        route = reverse('user:user_details_endpoint')
+        client.get(route)
+
+        self.agent.user.set_password('new-password')
+        self.agent.user.save()
+
+        self.assertEqual(client.get(route).status_code, 401)
+        self.assertEqual(jwt_client(self.agent.user).get(route).status_code, 200)
+
+
+class LocalPrincipalCacheTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.cache = LocalPrincipalCache(max_entries=2, ttl=30, clock=lambda: self.now)
+        self.principal = Principal(user=mock.Mock(pk=1))
+
+    def test_entries_expire_with_the_ttl_or_the_token(self) -> None:
+        self.cache.set(b'long', 'token', self.principal, 3600, self.cache.generation)
+        self.cache.set(b'short', 'token', self.principal, 10, self.cache.generation)
+
+        self.now = 10
+        self.assertIsNotNone(self.cache.get(b'long'))
+        self.assertIsNone(self.cache.get(b'short'))
+        self.now = 30
+        self.assertIsNone(self.cache.get(b'long'))
+
+    def test_least_recently_used_entry_is_evicted(self) -> None:
+        for raw_token in (b'a', b'b'):
+            self.cache.set(raw_token, 'token', self.principal, 60, self.cache.generation)
+        self.cache.get(b'a')
+        self.cache.set(b'c', 'token', self.principal, 60, self.cache.generation)
+
+        self.assertIsNone(self.cache.get(b'b'))
+        self.assertIsNotNone(self.cache.get(b'a'))
+
+    def test_invalidation_drops_the_user_and_races_with_set(self) -> None:
+        other = Principal(user=mock.Mock(pk=2))
+        self.cache.set(b'a', 'token', self.principal, 60, self.cache.generation)
+        self.cache.set(b'b', 'token', other, 60, self.cache.generation)
+        generation = self.cache.generation
+
+        self.cache.invalidate(1)
+        self.cache.set(b'c', 'token', self.principal, 60, generation)
+
+        self.assertIsNone(self.cache.get(b'a'))
+        self.assertIsNone(self.cache.get(b'c'))
+        self.assertIsNotNone(self.cache.get(b'b'))
+
+
+class UserEndpointQueryCountTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        LOCAL_PRINCIPALS.clear()
+        self.insurer = create_insurer()
+        self.agent = create_agent(self.insurer)
+        self.merchant = create_merchant()
+
+    def assertQueriesPerRequest(self, user, route: str, queries: int) -> None:  # noqa: N802
+        client = jwt_client(user)
+        client.get(route)
+        with self.assertNumQueries(queries):
+            response = client.get(route)
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_user_details(self) -> None:
+        route = reverse('user:user_details_endpoint')
+        for user in (self.agent.user, self.insurer.user, self.merchant.user):
+            self.assertQueriesPerRequest(user, route, 0)
+
+    def test_user_profile(self) -> None:
+        self.assertQueriesPerRequest(self.insurer.user, reverse('user:user_profile_endpoint'), 1)
+
+
+class OTPServiceTestCase(SimpleTestCase):
+    def setUp(self) -> None:
+        self.store = LocMemCache('otp-tests', {})
+        self.otp = OTPService(self.store, ttl=120, max_attempts=3)
+
+    def test_code_is_stored_hashed_and_used_once(self) -> None:
+        code = self.otp.issue(1)
+
+        self.assertEqual(len(code), 6)
+        self.assertNotIn(code, self.store.get('otp:code:1'))
+        self.assertEqual(self.otp.verify(2, code), EXPIRED)
+        self.assertEqual(self.otp.verify(1, code), VALID)
+        self.assertEqual(self.otp.verify(1, code), EXPIRED)
+
+    def test_code_is_dropped_after_too_many_attempts(self) -> None:
+        code = self.otp.issue(1)
+        wrong_code = '000000' if code != '000000' else '111111'
+
+        for _ in range(3):
+            self.assertEqual(self.otp.verify(1, wrong_code), INCORRECT)
+        self.assertEqual(self.otp.verify(1, code), LOCKED)
+        self.assertEqual(self.otp.verify(1, code), EXPIRED)
+
+        # A new code starts a new count.
+        self.assertEqual(self.otp.verify(1, self.otp.issue(1)), VALID)
+
+    def test_code_expires(self) -> None:
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=1000):
+            code = self.otp.issue(1)
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=1000 + 120):
+            self.assertEqual(self.otp.verify(1, code), EXPIRED)
+
+
+class SignInOTPTestCase(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.insurer = create_insurer()
+
+    def test_sign_in_otp_does_not_touch_the_insurer_row(self) -> None:
+        with mock.patch.object(Insurer, 'save', side_effect=AssertionError('the insurer row was written')):
+            response = self.client.post(
+                reverse('user:user_sign_in_endpoint'), {'email': 'insurer@example.com', 'password': 'password'}
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+
+        otp = OutboundEmail.objects.get(subject='Login OTP').body
+        route = reverse('user:verify_otp_endpoint')
+        response = self.client.post(route, {'email': 'insurer@example.com', 'otp': otp})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIn('access_token', response.json())
+
+        response = self.client.post(route, {'email': 'insurer@example.com', 'otp': otp})
+        self.assertEqual(response.json(), {'error': 'OTP has expired'})
+
+
+class ExplainQueriesTestCase(TestCase):
+    def test_every_query_pattern_uses_an_index(self) -> None:
+        stdout = StringIO()
+        call_command('explain_queries', rows=2000, stdout=stdout)
+
+        self.assertNotIn('SCAN', stdout.getvalue())
+        self.assertFalse(CustomUser.objects.exists())
+
+    def test_sequential_scans_are_reported(self) -> None:
+        plan = explain(Agent.objects.filter(first_name='John'))
+
+        self.assertEqual(sequential_scans(plan), ['agents_agent'])
+
+
+class ReplicaRoutingTestCase(TransactionTestCase):
+    """
+    Runs outside a test transaction, which the replica connection could not see into.
+    """
+
+    databases = {'default', 'replica'}
+
+    def setUp(self) -> None:
+        cache.clear()
+        LOCAL_PRINCIPALS.clear()
+        self.insurer = create_insurer()
+        self.route = reverse('user:user_profile_endpoint')
+
+    def test_marked_views_read_from_the_replica(self) -> None:
+        client = jwt_client(self.insurer.user)
+
+        # The caller and their profile.
+        with self.assertNumQueries(0), self.assertNumQueries(2, using='replica'):
+            response = client.get(self.route)
+        self.assertEqual(response.status_code, 200, response.content)
+
+        # Unmarked views read from the primary.
+        with self.assertNumQueries(0, using='replica'):
+            client.get(reverse('insurer:view-invitation-job', args=[1]))
+
+    def test_client_reads_its_own_writes(self) -> None:
+        client, other_client = jwt_client(self.insurer.user), jwt_client(self.insurer.user)
+        data = {'agents_list': [{'names': 'Agent', 'emails': 'agent@example.com'}]}
+        response = client.post(reverse('insurer:generate-signup-link-for-agent'), data, format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+
+        with self.assertNumQueries(0, using='replica'):
+            client.get(self.route)
+        with self.assertNumQueries(0):
+            other_client.get(self.route)
+
+        cache.clear()
+        with self.assertNumQueries(0):
+            client.get(self.route)
+
+    async def test_async_requests_are_routed(self) -> None:
+        aliases = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            aliases.append(db_for_read(router, model, **hints))
+            return aliases[-1]
+
+        token = (await sync_to_async(PrincipalRefreshToken.for_user)(self.insurer.user)).access_token
+        with mock.patch.object(ReplicaRouter, 'db_for_read', autospec=True, side_effect=record):
+            response = await self.async_client.get(self.route, headers={'Authorization': f'Bearer {token}'})
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(set(aliases), {'replica'})
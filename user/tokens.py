@@ -0,0 +1,18 @@
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import CustomUser
+from .principal import principal_claims, resolve_principal
+
+
+class PrincipalRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the user's role flags and profile id. Access tokens copy the claims, so
+    authentication can load the caller from its profile row without selecting the user first.
+    """
+
+    @classmethod
+    def for_user(cls, user: CustomUser) -> 'PrincipalRefreshToken':
+        token = super().for_user(user)
+        for claim, value in principal_claims(resolve_principal(user)).items():
+            token[claim] = value
+        return token
@@ -0,0 +1,32 @@
+from django.db.models import Value, QuerySet, CharField
+
+
+def conflicts_query(checks: dict[str, QuerySet]) -> QuerySet:
+    """
+    One UNION query yielding the name of every check in ``checks`` whose queryset matches a row.
+    """
+    arms = [
+        queryset.annotate(conflict=Value(name, output_field=CharField())).values_list('conflict', flat=True)
+        for name, queryset in checks.items()
+    ]
+    return arms[0].union(*arms[1:])
+
+
+def conflicting_fields(checks: dict[str, QuerySet]) -> list[str]:
+    """
+    The names in ``checks`` whose queryset matches at least one row, in ``checks`` order.
+
+    Every check becomes one arm of a single UNION query, so sign-up learns about all of its conflicts with
+    one round trip instead of an ``exists()`` per field.
+    """
+    if not checks:
+        return []
+    found = set(conflicts_query(checks))
+    return [name for name in checks if name in found]
+
+
+def conflict_error(conflicts: list[str], messages: dict[str, str]) -> dict:
+    """
+    The error body for sign-up conflicts: every message joined into ``error``, and the fields in ``conflicts``.
+    """
+    return {'error': ', '.join(messages[field] for field in conflicts), 'conflicts': conflicts}
@@ -1,7 +1,9 @@
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
+from reconciliation_backend.replicas import reads_from_replica
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth import authenticate
@@ -23,6 +25,7 @@ from user.merchant_utils.utils import (
 )
 
 from .models import CustomUser
+from .principal import get_principal
 from .serializer import (
     SignInSerializer,
     VerifyOTPSerializer,
@@ -290,23 +293,23 @@ def refresh_access_token(request):
     },
     tags=[SWAGGER_APP_TAG],
 )
+@reads_from_replica
 @api_view(['GET'])
 # @permission_classes([IsAuthenticated])
 def user_details(request: Request) -> Response:
-    user_id = request.user.id
-    user = get_object_or_404(CustomUser, pk=user_id)
+    if not request.user.is_authenticated:
+        raise Http404('No CustomUser matches the given query.')
+    principal = get_principal(request)
 
     try:
-        agent, insurer, merchant = user.is_agent, user.is_insurer, user.is_merchant
+        if principal.is_agent:
+            return agent_view_details(principal)
 
-        if agent:
-            return agent_view_details(user)
+        if principal.is_insurer:
+            return insurer_view_details(principal)
 
-        if insurer:
-            return insurer_view_details(user)
-
-        if merchant:
-            return merchant_view_details(user)
+        if principal.is_merchant:
+            return merchant_view_details(principal)
 
     except Exception as e:
         return Response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
@@ -324,22 +327,20 @@ def user_details(request: Request) -> Response:
     },
     tags=[SWAGGER_APP_TAG],
 )
+@reads_from_replica
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_profile(request: Request) -> Response:
-    user_id = request.user.id
-    user = get_object_or_404(CustomUser, pk=user_id)
+    principal = get_principal(request)
 
     try:
-        agent, insurer, merchant = user.is_agent, user.is_insurer, user.is_merchant
+        if principal.is_agent:
+            return agent_view_profile(principal)
 
-        if agent:
-            return agent_view_profile(user)
+        if principal.is_insurer:
+            return insurer_view_profile(principal)
 
-        if insurer:
-            return insurer_view_profile(user)
-
-        if merchant:
+        if principal.is_merchant:
             pass
 
     except Exception as e: